@@ -0,0 +1,350 @@
+"""
+Модуль batch_process.py
+
+Пакетная обработка архива видеозаписей без отображения.
+Файлы (и фрагменты длинных файлов по времени) распределяются по пулу
+процессов; в каждом процессе модели загружаются один раз. Результаты
+всех фрагментов объединяются в общий CSV, а по каждому файлу
+формируется отчёт о производительности.
+
+Пример:
+    py batch_process.py D:/archive --workers 32 --segment-minutes 10
+    py batch_process.py "D:/archive/2025-07-*.mp4" --frame-skip 2
+"""
+
+import os
+import csv
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from config import SAVE_DIR, BATCH_SHARD_DEDUP_SECONDS
+from stream_state import VIDEO_FILE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Модели и настройки процесса-обработчика (инициализируются один раз)
+_runtime = None
+_plate_detection_mode = "frame"
+_motion_gate = False
+
+
+def find_videos(inputs: List[str]) -> List[str]:
+    """
+    Собирает список видеофайлов по каталогам и glob-шаблонам.
+
+    Args:
+        inputs (list): Каталоги, файлы или glob-шаблоны.
+
+    Returns:
+        list: Отсортированные пути к видеофайлам без повторов.
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for path in Path(item).rglob("*"):
+                if path.suffix.lower() in VIDEO_FILE_EXTENSIONS:
+                    found.add(str(path))
+        else:
+            for path in glob.glob(item, recursive=True):
+                if path.lower().endswith(VIDEO_FILE_EXTENSIONS):
+                    found.add(path)
+    return sorted(found)
+
+
+def plan_shards(paths: List[str], segment_minutes: float) -> List[Tuple[str, int, int, float]]:
+    """
+    Делит файлы на фрагменты по времени.
+
+    Args:
+        paths (list): Пути к видеофайлам.
+        segment_minutes (float): Длительность фрагмента; 0 — файл целиком.
+
+    Returns:
+        list: Задания (путь, первый кадр, кадр после последнего, FPS).
+    """
+    shards = []
+    for path in paths:
+        cap = cv2.VideoCapture(path)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        cap.release()
+
+        if frame_count <= 0:
+            logger.warning(f"⚠️ Не удалось определить длину файла, обрабатывается целиком: {path}")
+            shards.append((path, 0, -1, fps))
+            continue
+
+        step = int(segment_minutes * 60 * fps) if segment_minutes > 0 else frame_count
+        step = max(step, 1)
+        for start in range(0, frame_count, step):
+            shards.append((path, start, min(start + step, frame_count), fps))
+    return shards
+
+
+def _init_worker(device: Optional[str], plate_detection_mode: str, threads: int,
+                 motion_gate: bool, backend_settings: Optional[Dict] = None) -> None:
+    """Инициализация процесса пула: ограничение потоков и загрузка моделей."""
+    global _runtime, _plate_detection_mode, _motion_gate
+
+    import torch
+    from model_runtime import ModelRuntime
+
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    _runtime = ModelRuntime(device, backend_settings)
+    _plate_detection_mode = plate_detection_mode
+    _motion_gate = motion_gate
+
+
+def _process_shard(path: str, start: int, end: int, fps: float, frame_skip: int) -> Dict:
+    """
+    Обрабатывает фрагмент файла в процессе пула.
+
+    Returns:
+        dict: rows — распознавания, stats — показатели производительности.
+    """
+    from stream_state import StreamState, parse_video_source
+    from frame_processor import process_batch
+    from motion_gate import MotionGate
+
+    source, label, _ = parse_video_source(path)
+    stream = StreamState(source, label, True,
+                         plate_validator=_runtime.plate_reader.is_license_plate,
+                         motion_gate=MotionGate() if _motion_gate else None)
+
+    cap = cv2.VideoCapture(path)
+    if start > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    rows, reported = [], {}
+    frame_idx, frames_read, frames_processed = start, 0, 0
+    started = time.perf_counter()
+
+    while end < 0 or frame_idx < end:
+        # Пропускаемые кадры не декодируются
+        if (frame_idx - start) % frame_skip != 0:
+            if not cap.grab():
+                break
+            frame_idx += 1
+            frames_read += 1
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        video_time = frame_idx / fps
+        packet = {"frame_id": frame_idx, "frame": frame,
+                  "timestamp": video_time, "stream": stream}
+        process_batch([packet], _runtime, _plate_detection_mode)
+
+        for sid, plate in packet["assignments"].items():
+            if reported.get(sid) != plate:
+                reported[sid] = plate
+                # SID уникален только внутри фрагмента: у каждого свой трекер
+                rows.append({"file": path, "shard": start, "frame": frame_idx,
+                             "video_time": round(video_time, 3),
+                             "plate": plate, "sid": sid})
+
+        frame_idx += 1
+        frames_read += 1
+        frames_processed += 1
+
+    cap.release()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "stats": {
+            "file": path,
+            "start_frame": start,
+            "frames_read": frames_read,
+            "frames_processed": frames_processed,
+            "seconds": elapsed,
+            "video_seconds": frames_read / fps if fps else 0.0,
+            "ocr_readings": stream.consensus.readings,
+            "ocr_skipped": stream.consensus.skipped,
+            # Кадры, не переданные детекторам фильтром движения (как lpr_frames_gated_total)
+            "gated_frames": stream.motion_gate.checked - stream.motion_gate.triggered
+            if stream.motion_gate else 0,
+        },
+    }
+
+
+def merge_shard_boundaries(rows: List[Dict],
+                           window: float = BATCH_SHARD_DEDUP_SECONDS) -> List[Dict]:
+    """
+    Убирает повторы проездов на стыке фрагментов: автомобиль, попавший
+    в два фрагмента, распознаётся трекером каждого из них.
+
+    Args:
+        rows (list): Распознавания, отсортированные по файлу и кадру.
+        window (float): Номер из другого фрагмента того же файла не позже
+                        window секунд видео считается тем же проездом.
+
+    Returns:
+        list: Распознавания без повторов на стыках.
+    """
+    merged = []
+    last_seen: Dict[Tuple[str, str], Tuple[int, float]] = {}
+    for row in rows:
+        key = (row["file"], row["plate"])
+        previous = last_seen.get(key)
+        last_seen[key] = (row["shard"], row["video_time"])
+        if previous is not None and previous[0] != row["shard"] \
+                and row["video_time"] - previous[1] <= window:
+            continue
+        merged.append(row)
+    return merged
+
+
+def write_reports(output_dir: str, rows: List[Dict], shard_stats: List[Dict],
+                  wall_time: float) -> None:
+    """
+    Сохраняет объединённые результаты и отчёт о производительности.
+
+    Args:
+        output_dir (str): Каталог результатов.
+        rows (list): Распознавания всех фрагментов.
+        shard_stats (list): Показатели всех фрагментов.
+        wall_time (float): Общее время обработки, сек.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    rows.sort(key=lambda r: (r["file"], r["frame"]))
+    rows = merge_shard_boundaries(rows)
+    with open(os.path.join(output_dir, "recognitions.csv"), "w",
+              newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(
+            f, fieldnames=["file", "shard", "frame", "video_time", "plate", "sid"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    per_file: Dict[str, Dict] = {}
+    for s in shard_stats:
+        agg = per_file.setdefault(s["file"], {
+            "file": s["file"], "shards": 0, "frames_read": 0, "frames_processed": 0,
+            "seconds": 0.0, "video_seconds": 0.0, "ocr_readings": 0, "ocr_skipped": 0,
+            "gated_frames": 0})
+        agg["shards"] += 1
+        for key in ("frames_read", "frames_processed", "seconds",
+                    "video_seconds", "ocr_readings", "ocr_skipped", "gated_frames"):
+            agg[key] += s[key]
+    for agg in per_file.values():
+        agg["fps"] = round(agg["frames_read"] / agg["seconds"], 2) if agg["seconds"] else 0.0
+        agg["realtime_factor"] = round(
+            agg["video_seconds"] / agg["seconds"], 2) if agg["seconds"] else 0.0
+        agg["seconds"] = round(agg["seconds"], 2)
+        agg["video_seconds"] = round(agg["video_seconds"], 2)
+
+    files = sorted(per_file.values(), key=lambda a: a["file"])
+    with open(os.path.join(output_dir, "throughput.csv"), "w",
+              newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=list(files[0].keys()) if files else ["file"])
+        writer.writeheader()
+        writer.writerows(files)
+
+    total_frames = sum(a["frames_read"] for a in files)
+    summary = {
+        "files": len(files),
+        "shards": len(shard_stats),
+        "recognitions": len(rows),
+        "frames_read": total_frames,
+        "wall_seconds": round(wall_time, 2),
+        "fps": round(total_frames / wall_time, 2) if wall_time else 0.0,
+        "per_file": files,
+    }
+    with open(os.path.join(output_dir, "throughput.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+
+def main() -> None:
+    from log_config import setup_logging
+
+    parser = argparse.ArgumentParser(
+        description="Пакетная обработка архива видеозаписей")
+    parser.add_argument("inputs", nargs="+",
+                        help="каталоги, файлы или glob-шаблоны (.avi/.mp4/.mkv)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="количество процессов (по умолчанию — число ядер)")
+    parser.add_argument("--threads-per-worker", type=int, default=1,
+                        help="потоков torch/OpenCV на процесс")
+    parser.add_argument("--segment-minutes", type=float, default=10.0,
+                        help="длительность фрагмента длинного файла; 0 — без разбиения")
+    parser.add_argument("--frame-skip", type=int, default=1,
+                        help="обрабатывать каждый N-й кадр")
+    parser.add_argument("--plate-detection-mode", choices=["frame", "roi"], default="frame")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="запускать детекторы только при движении в кадре")
+    parser.add_argument("--backend", choices=["torch", "onnx", "openvino"], default="torch",
+                        help="бэкенд инференса YOLO")
+    parser.add_argument("--int8", action="store_true",
+                        help="INT8-квантование экспорта (onnx/openvino)")
+    parser.add_argument("--device", default=None, help="cuda или cpu (по умолчанию — авто)")
+    parser.add_argument("--output", default=None,
+                        help="каталог результатов (по умолчанию results/batch_<дата-время>)")
+    args = parser.parse_args()
+
+    setup_logging()
+
+    paths = find_videos(args.inputs)
+    if not paths:
+        logger.error("❌ Видеофайлы не найдены")
+        return
+
+    # Экспорт выполняется один раз до запуска пула; процессы берут его из кэша
+    backend_settings = {"backend": args.backend, "int8": args.int8}
+    if args.backend != "torch":
+        from detector_backend import create_detector
+        from config import VEHICLE_MODEL_PATH, PLATE_MODEL_PATH, PLATE_ROI_IMGSZ
+        create_detector(VEHICLE_MODEL_PATH, backend_settings)
+        create_detector(PLATE_MODEL_PATH, backend_settings, extra_imgsz=(PLATE_ROI_IMGSZ,))
+
+    shards = plan_shards(paths, args.segment_minutes)
+    output_dir = args.output or os.path.join(
+        SAVE_DIR, f"batch_{datetime.now():%Y-%m-%d_%H-%M-%S}")
+    workers = max(min(args.workers, len(shards)), 1)
+    logger.info(f"🚀 Файлов: {len(paths)}, фрагментов: {len(shards)}, процессов: {workers}")
+
+    rows, shard_stats = [], []
+    started = time.perf_counter()
+
+    # spawn: CUDA и PaddleOCR небезопасны после fork
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.device, args.plate_detection_mode,
+                      args.threads_per_worker, args.motion_gate, backend_settings)) as pool:
+        futures = {pool.submit(_process_shard, path, start, end, fps, max(args.frame_skip, 1)): path
+                   for path, start, end, fps in shards}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                result = future.result()
+            except Exception:
+                logger.exception(f"❌ Ошибка обработки фрагмента {futures[future]}")
+                continue
+            rows.extend(result["rows"])
+            shard_stats.append(result["stats"])
+            s = result["stats"]
+            logger.info(f"✅ [{done}/{len(shards)}] {s['file']} @ {s['start_frame']}: "
+                        f"{s['frames_read']} кадров за {s['seconds']:.1f} с")
+
+    wall_time = time.perf_counter() - started
+    write_reports(output_dir, rows, shard_stats, wall_time)
+    logger.info(f"📁 Результаты: {output_dir} ({len(rows)} распознаваний, {wall_time:.1f} с)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,457 @@
+"""
+Бенчмарк стадий конвейера на синтетическом видео.
+
+Каждая стадия (add_timestamp, YOLO ТС, YOLO номеров, PlateRecognizer.recognize,
+assign_plates_to_vehicles, draw_text_cyrillic, log_detection,
+save_recognized_plate, video_writer.write) измеряется отдельно, а затем
+весь кадр целиком (process_batch + отрисовка + запись). Вместо весов
+используются облегчённые заменители моделей, поэтому бенчмарк работает
+на CPU без yolo_weights:
+
+- --models stub — модели возвращают разметку синтетической сцены
+  (измеряется обвязка вокруг моделей);
+- --models yaml — YOLO строится из архитектуры yolov8n.yaml без обученных
+  весов (реалистичная нагрузка на CPU, нужен ultralytics).
+
+Результаты сохраняются в JSON; --compare сравнивает их с прежним прогоном
+и завершается с кодом 1 при замедлении больше --tolerance.
+
+Запуск из корня проекта:
+    py benchmarks/bench_pipeline.py --width 1920 --height 1080 --vehicles 8 --frames 200
+    py benchmarks/bench_pipeline.py --output before.json
+    py benchmarks/bench_pipeline.py --compare before.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PLATE_TEXTS = ["А123ВС77", "К456МН197", "Е789ОР50", "Т321УХ99", "М654АВ750", "Р987СЕ78"]
+
+
+# ---------------- Синтетическая сцена ----------------
+
+def make_frames(width: int, height: int, vehicles: int, frames: int, seed: int = 0):
+    """
+    Синтетическое видео: серая дорога, автомобили-прямоугольники с номерами,
+    смещающиеся от кадра к кадру.
+
+    Returns:
+        tuple: (кадры, разметка {id(кадра): (bbox ТС (M, 4), bbox номеров (M, 4))}).
+    """
+    rng = np.random.default_rng(seed)
+    vw, vh = max(width // 8, 40), max(height // 8, 30)
+    starts = np.column_stack([rng.uniform(0, width - vw, vehicles),
+                              rng.uniform(0, height - vh, vehicles)])
+    speed = rng.uniform(-4, 4, (vehicles, 2))
+    colors = rng.integers(40, 220, (vehicles, 3))
+
+    result, truth = [], {}
+    for k in range(frames):
+        frame = np.full((height, width, 3), 90, dtype=np.uint8)
+        noise = rng.integers(0, 12, (height // 8, width // 8, 1), dtype=np.uint8)
+        frame += cv2.resize(noise, (width, height))[..., None]
+
+        pos = starts + speed * k
+        pos[:, 0] = np.clip(pos[:, 0], 0, width - vw)
+        pos[:, 1] = np.clip(pos[:, 1], 0, height - vh)
+        vboxes = np.column_stack([pos, pos + [vw, vh]]).astype(np.float32)
+
+        pw, ph = vw * 0.4, vh * 0.15
+        cx, by = (vboxes[:, 0] + vboxes[:, 2]) / 2, vboxes[:, 3] - vh * 0.1
+        pboxes = np.column_stack([cx - pw / 2, by - ph, cx + pw / 2, by]).astype(np.float32)
+
+        for i, ((x1, y1, x2, y2), (px1, py1, px2, py2)) in enumerate(zip(vboxes, pboxes)):
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)),
+                          colors[i].tolist(), -1)
+            cv2.rectangle(frame, (int(px1), int(py1)), (int(px2), int(py2)),
+                          (255, 255, 255), -1)
+            cv2.putText(frame, "A123BC77", (int(px1) + 2, int(py2) - 2),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.3, (0, 0, 0), 1)
+        result.append(frame)
+        truth[id(frame)] = (vboxes, pboxes)
+    return result, truth
+
+
+# ---------------- Заменители моделей ----------------
+
+class _Array:
+    """Минимальный аналог torch.Tensor: .cpu().numpy() и индексация."""
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+
+    def cpu(self) -> "_Array":
+        return self
+
+    def numpy(self) -> np.ndarray:
+        return self.data
+
+    def argmax(self) -> int:
+        return int(self.data.argmax())
+
+    def __getitem__(self, item) -> "_Array":
+        return _Array(self.data[item])
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+class _Boxes:
+    def __init__(self, xyxy: np.ndarray, cls: int):
+        self.xyxy = _Array(xyxy)
+        self.conf = _Array(np.full(len(xyxy), 0.9, dtype=np.float32))
+        self.cls = _Array(np.full(len(xyxy), cls, dtype=np.float32))
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+
+class _Result:
+    def __init__(self, boxes: _Boxes):
+        self.boxes = boxes
+
+
+class StubYOLO:
+    """
+    Заменитель YOLO: возвращает разметку синтетического кадра в формате
+    результатов ultralytics (boxes.xyxy / conf / cls).
+    """
+
+    def __init__(self, truth: Dict[int, tuple], which: int, cls: int = 2):
+        self.truth = truth
+        self.which = which
+        self.cls = cls
+
+    def __call__(self, frames: List[np.ndarray], **kwargs) -> List[_Result]:
+        empty = np.zeros((0, 4), dtype=np.float32)
+        return [_Result(_Boxes(self.truth[id(f)][self.which] if id(f) in self.truth else empty,
+                               self.cls))
+                for f in frames]
+
+
+class StubOCR:
+    """Заменитель PaddleOCR: ocr() возвращает номер из набора PLATE_TEXTS."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def ocr(self, img, det: bool = True, cls: bool = False):
+        self.calls += 1
+        if isinstance(img, list):
+            return [[(PLATE_TEXTS[(self.calls + i) % len(PLATE_TEXTS)], 0.95)
+                     for i in range(len(img))]]
+        return [[[None, (PLATE_TEXTS[self.calls % len(PLATE_TEXTS)], 0.95)]]]
+
+
+def load_models(kind: str, truth: Dict[int, tuple]):
+    """
+    Создаёт модели ТС и номеров.
+
+    Args:
+        kind (str): "stub" или "yaml".
+        truth (dict): Разметка синтетических кадров (для "stub").
+
+    Returns:
+        tuple: (модель ТС, модель номеров).
+    """
+    if kind == "yaml":
+        from ultralytics import YOLO
+        return YOLO("yolov8n.yaml"), YOLO("yolov8n.yaml")
+    return StubYOLO(truth, 0, cls=2), StubYOLO(truth, 1, cls=0)
+
+
+def make_runtime(vehicle_model, plate_model, plate_reader):
+    """ModelRuntime с подставленными моделями (без загрузки весов)."""
+    from model_runtime import ModelRuntime
+
+    runtime = ModelRuntime.__new__(ModelRuntime)
+    runtime.device = "cpu"
+    runtime.vehicle_model = vehicle_model
+    runtime.plate_model = plate_model
+    runtime.plate_reader = plate_reader
+    return runtime
+
+
+def make_plate_reader():
+    """PlateRecognizer с заменителем PaddleOCR."""
+    from license_plate_recognizer import PlateRecognizer
+    from plate_grammar import get_plate_grammar
+
+    reader = PlateRecognizer.__new__(PlateRecognizer)
+    reader.ocr = StubOCR()
+    reader.grammar = get_plate_grammar()
+    return reader
+
+
+# ---------------- Измерение ----------------
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Сводка по длительностям вызовов.
+
+    Returns:
+        dict: calls, mean_ms, p50_ms, p95_ms, max_ms, per_sec.
+    """
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "calls": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "max_ms": round(float(ms.max()), 4),
+        "per_sec": round(1000.0 / float(ms.mean()), 1) if ms.mean() > 0 else 0.0,
+    }
+
+
+def run_stage(name: str, calls: Callable[[], List[Callable[[], object]]],
+              warmup: int, results: Dict[str, Dict]) -> None:
+    """
+    Измеряет стадию; ошибка импорта или инициализации отмечает стадию
+    как пропущенную, не прерывая остальные.
+
+    Args:
+        name (str): Имя стадии в отчёте.
+        calls (Callable): Подготовка: возвращает список вызовов для измерения.
+        warmup (int): Количество вызовов прогрева (не учитываются).
+        results (dict): Отчёт, дополняемый результатом стадии.
+    """
+    try:
+        prepared = calls()
+    except Exception as e:
+        results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+        print(f"  {name:<26} пропущено ({results[name]['skipped']})")
+        return
+
+    for call in prepared[:warmup]:
+        call()
+
+    samples = []
+    for call in prepared[warmup:] or prepared:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+
+    results[name] = summarize(samples)
+    s = results[name]
+    print(f"  {name:<26} {s['mean_ms']:9.3f} мс  p95 {s['p95_ms']:9.3f} мс  "
+          f"({s['calls']} вызовов)")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline_path: str, tolerance: float) -> bool:
+    """
+    Сравнивает средние длительности стадий с прежним прогоном.
+
+    Returns:
+        bool: True, если ни одна стадия не замедлилась больше tolerance.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    ok = True
+    print(f"\nСравнение с {baseline_path} ({baseline['meta'].get('commit')}):")
+    for name, stats in current["stages"].items():
+        old = baseline["stages"].get(name, {})
+        if "mean_ms" not in stats or "mean_ms" not in old or old["mean_ms"] <= 0:
+            continue
+        ratio = stats["mean_ms"] / old["mean_ms"]
+        flag = ""
+        if ratio > 1.0 + tolerance:
+            flag, ok = "  ⚠️ замедление", False
+        print(f"  {name:<26} {old['mean_ms']:9.3f} → {stats['mean_ms']:9.3f} мс "
+              f"({ratio:5.2f}×){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--vehicles", type=int, default=8, help="автомобилей в кадре")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--models", choices=["stub", "yaml"], default="stub")
+    parser.add_argument("--output", default=None, help="путь к JSON с результатами")
+    parser.add_argument("--compare", default=None, help="JSON прежнего прогона")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="допустимое замедление при сравнении (доля)")
+    args = parser.parse_args()
+
+    # Журнал модулей проекта не должен влиять на измерения
+    logging.basicConfig(level=logging.WARNING)
+
+    tmp = tempfile.mkdtemp(prefix="lpr_bench_")
+    frames, truth = make_frames(args.width, args.height, args.vehicles, args.frames)
+    n = len(frames)
+    results: Dict[str, Dict] = {}
+
+    print(f"{args.width}×{args.height}, {args.vehicles} ТС, {n} кадров, модели: {args.models}")
+
+    def stage_timestamp():
+        from add_timestamp import add_timestamp
+        copies = [f.copy() for f in frames]
+        return [lambda f=f: add_timestamp(f) for f in copies]
+
+    models = {}
+
+    def runtime():
+        if "runtime" not in models:
+            vehicle_model, plate_model = load_models(args.models, truth)
+            models["runtime"] = make_runtime(vehicle_model, plate_model, None)
+        return models["runtime"]
+
+    def stage_vehicle_yolo():
+        rt = runtime()
+        return [lambda f=f: rt.detect_vehicles([f]) for f in frames]
+
+    def stage_plate_yolo():
+        rt = runtime()
+        return [lambda f=f: rt.detect_plates([f]) for f in frames]
+
+    def crops():
+        out = []
+        for f in frames:
+            for x1, y1, x2, y2 in truth[id(f)][1].astype(int):
+                out.append(f[y1:y2, x1:x2])
+        return out
+
+    def stage_recognize():
+        reader = make_plate_reader()
+        return [lambda c=c: reader.recognize(c) for c in crops()]
+
+    def stage_assign():
+        from plate_assignment import assign_plates_to_vehicles
+        calls = []
+        for f in frames:
+            vboxes, pboxes = truth[id(f)]
+            tracks = [(box, None, 0.9, 2, sid + 1) for sid, box in enumerate(vboxes)]
+            texts = [PLATE_TEXTS[i % len(PLATE_TEXTS)] + str(i) for i in range(len(pboxes))]
+            calls.append(lambda p=pboxes, t=texts, tr=tracks: assign_plates_to_vehicles(p, t, tr))
+        return calls
+
+    def stage_draw_text():
+        reader = make_plate_reader()
+        calls = []
+        for f in [f.copy() for f in frames]:
+            for i, (x1, y1, x2, y2) in enumerate(truth[id(frames[0])][0].astype(int)):
+                calls.append(lambda f=f, i=i, x=x2, y=y2: reader.draw_text_cyrillic(
+                    f, PLATE_TEXTS[i % len(PLATE_TEXTS)], (x - 140, y - 40)))
+        return calls
+
+    def stage_log_detection():
+        import logger as detection_logger
+        detection_logger.SAVE_DIR = tmp
+        return [lambda f=f: detection_logger.log_detection(f, "plate") for f in frames[:min(n, 50)]]
+
+    def stage_save_plate():
+        import plate_store
+        import save_recognized_plate as srp
+        plate_store._store = plate_store.PlateStore(db_path=os.path.join(tmp, "plates.db"))
+        return [lambda i=i: srp.save_recognized_plate(f"А{i:03d}ВС77", i, "bench")
+                for i in range(n * args.vehicles)]
+
+    def stage_video_write():
+        import video_writer
+        video_writer.SAVE_DIR = tmp
+        writer = video_writer.create_video_writer(frames[0].shape, "bench")
+        models["writer"] = writer
+        return [lambda f=f: writer.write(f) for f in frames]
+
+    def stage_end_to_end():
+        from frame_processor import process_batch
+        from stream_state import StreamState
+        from overlay_renderer import get_overlay_renderer
+
+        rt = runtime()
+        rt.plate_reader = make_plate_reader()
+        stream = StreamState("bench", "bench", True,
+                             plate_validator=rt.plate_reader.is_license_plate)
+        overlay = get_overlay_renderer()
+        writer = models.get("writer")
+
+        def frame_call(k: int, frame: np.ndarray) -> None:
+            frame = frame.copy()
+            packet = {"frame_id": k, "frame": frame, "timestamp": k / 25.0, "stream": stream}
+            process_batch([packet], rt)
+            for sid, (x1, y1, x2, y2), _ in packet["labels"]:
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            overlay.draw_labels(frame, [(plate, (x2 - 140, y2 - 40))
+                                        for _, (_, _, x2, y2), plate in packet["labels"]])
+            if writer is not None:
+                writer.write(frame)
+
+        return [lambda k=k, f=f: frame_call(k, f) for k, f in enumerate(frames)]
+
+    stages = [
+        ("add_timestamp", stage_timestamp),
+        ("vehicle_yolo", stage_vehicle_yolo),
+        ("plate_yolo", stage_plate_yolo),
+        ("recognize", stage_recognize),
+        ("assign_plates_to_vehicles", stage_assign),
+        ("draw_text_cyrillic", stage_draw_text),
+        ("log_detection", stage_log_detection),
+        ("save_recognized_plate", stage_save_plate),
+        ("video_writer.write", stage_video_write),
+        ("end_to_end", stage_end_to_end),
+    ]
+    for name, prepare in stages:
+        run_stage(name, prepare, args.warmup, results)
+
+    if "writer" in models:
+        models["writer"].release()
+    import plate_store
+    if plate_store._store is not None:
+        plate_store._store.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "args": vars(args),
+        },
+        "stages": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n📁 Результаты: {args.output}")
+
+    if args.compare and not compare(report, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
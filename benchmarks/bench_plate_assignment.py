@@ -0,0 +1,98 @@
+"""
+Микро-бенчмарк привязки номеров к автомобилям.
+
+Сравнивает векторизованное оптимальное сопоставление
+(plate_assignment.match_plates_to_tracks) с прежним жадным
+вложенным циклом на плотной сцене (по умолчанию 200 номеров × 200 треков).
+
+Запуск из корня проекта:
+    py benchmarks/bench_plate_assignment.py --plates 200 --tracks 200
+"""
+
+import os
+import sys
+import math
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plate_assignment import match_plates_to_tracks, box_center, center_distance  # noqa: E402
+
+
+def greedy_match(plate_boxes, tracks):
+    """Прежний алгоритм: жадный перебор номеров × треков в порядке номеров."""
+    matches, used_sids = {}, set()
+    for i, plate_box in enumerate(plate_boxes):
+        plate_center = box_center(plate_box)
+        best_dist, best_sid, best_vbox = float("inf"), None, None
+        for track in tracks:
+            vehicle_box, sid = track[0], int(track[4])
+            if sid in used_sids:
+                continue
+            dist = center_distance(plate_center, box_center(vehicle_box))
+            diag = math.hypot(vehicle_box[2] - vehicle_box[0],
+                              vehicle_box[3] - vehicle_box[1])
+            if dist < best_dist and dist < 5.0 * diag:
+                best_dist, best_sid, best_vbox = dist, sid, vehicle_box
+        if best_sid is not None:
+            vx1, vy1, vx2, vy2 = best_vbox
+            if vx1 <= plate_center[0] <= vx2 and vy1 <= plate_center[1] <= vy2:
+                matches[best_sid] = i
+                used_sids.add(best_sid)
+    return matches
+
+
+def parking_lot(n_tracks, n_plates, seed=0):
+    """Синтетическая парковка: сетка автомобилей с перекрытием и номер у каждого."""
+    rng = np.random.default_rng(seed)
+    cols = int(math.ceil(math.sqrt(n_tracks)))
+    tracks, plates = [], []
+    for k in range(n_tracks):
+        x, y = (k % cols) * 90.0, (k // cols) * 70.0
+        box = np.array([x, y, x + 120.0, y + 90.0]) + rng.normal(0, 3, 4)
+        tracks.append((box, None, 0.9, 2, k + 1))
+    for k in range(n_plates):
+        x1, y1, x2, y2 = tracks[k % n_tracks][0]
+        cx, cy = (x1 + x2) / 2 + rng.normal(0, 5), y2 - 15 + rng.normal(0, 3)
+        plates.append((cx - 20, cy - 6, cx + 20, cy + 6))
+    return np.array(plates), tracks
+
+
+def bench(func, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plates", type=int, default=200)
+    parser.add_argument("--tracks", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    plates, tracks = parking_lot(args.tracks, args.plates)
+
+    t_greedy, greedy = bench(greedy_match, plates, tracks, repeat=args.repeat)
+    t_vector, optimal = bench(match_plates_to_tracks, plates, tracks, repeat=args.repeat)
+
+    # Номер k принадлежит треку k + 1 по построению сцены
+    def correct(matches):
+        return sum(1 for sid, i in matches.items() if sid == (i % args.tracks) + 1)
+
+    print(f"{args.plates} номеров × {args.tracks} треков")
+    print(f"  жадный цикл:         {t_greedy * 1e3:8.2f} мс, "
+          f"верно {correct(greedy)}/{len(greedy)}")
+    print(f"  векторизованный:     {t_vector * 1e3:8.2f} мс, "
+          f"верно {correct(optimal)}/{len(optimal)}")
+    print(f"  ускорение:           {t_greedy / t_vector:8.1f}×")
+
+
+if __name__ == "__main__":
+    main()
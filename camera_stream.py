@@ -1,5 +1,386 @@
+"""
+Модуль camera_stream.py
+
+Источник кадров для потока захвата. CaptureSource разделяет получение
+кадра (grab) и его декодирование в BGR (retrieve), поэтому кадры,
+отброшенные frame_skip, не преобразуются и не копируются. Переподключение
+к живому источнику выполняется в фоне с экспоненциальной задержкой, а
+время кадра берётся из меток времени потока (pts), привязанных к часам
+системы. Декодирование — OpenCV (FFmpeg) или, при установленном PyAV,
+многопоточным декодером FFmpeg.
+"""
+
+import os
+import time
+import importlib.util
+import logging
+import threading
+from typing import Any, Dict, Optional
+
 import cv2
-from config import RTSP_URL
+import numpy as np
+
+from config import RTSP_URL, CAPTURE_BACKOFF_INITIAL, CAPTURE_BACKOFF_MAX, \
+    CAPTURE_OPEN_TIMEOUT, CAPTURE_READ_TIMEOUT, CAPTURE_CLOCK_TOLERANCE, RTSP_LOW_LATENCY_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_BACKENDS = ("opencv", "pyav")
+
+# Параметры FFmpeg для OpenCV задаются переменной окружения, общей для процесса
+_ffmpeg_env_lock = threading.Lock()
+
+
+def _is_network(source: Any) -> bool:
+    return isinstance(source, str) and source.lower().startswith(("rtsp://", "rtmp://", "http://", "https://"))
+
+
+class _OpenCVBackend:
+    """Декодирование через cv2.VideoCapture (FFmpeg для файлов и RTSP)."""
+
+    def __init__(self, source: Any, is_file_source: bool, ffmpeg_options: Dict[str, str],
+                 open_timeout: float, read_timeout: float):
+        if isinstance(source, str):
+            with _ffmpeg_env_lock:
+                if ffmpeg_options and _is_network(source):
+                    os.environ["OPENCV_FFMPEG_CAPTURE_OPTIONS"] = "|".join(
+                        f"{k};{v}" for k, v in ffmpeg_options.items())
+                else:
+                    os.environ.pop("OPENCV_FFMPEG_CAPTURE_OPTIONS", None)
+                self.cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG, [
+                    cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout * 1000),
+                    cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout * 1000)])
+        else:
+            # Веб-камера: системный бэкенд (V4L2, DirectShow, MSMF)
+            self.cap = cv2.VideoCapture(source)
+        if not is_file_source:
+            # Не копим кадры в буфере драйвера: нужен самый свежий
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+
+    def is_opened(self) -> bool:
+        return self.cap.isOpened()
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        ok, frame = self.cap.retrieve()
+        return frame if ok else None
+
+    def pts(self) -> Optional[float]:
+        msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        return msec / 1000.0 if msec and msec > 0 else None
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class _PyAVBackend:
+    """Многопоточное декодирование FFmpeg через PyAV (файлы и сетевые потоки)."""
+
+    def __init__(self, source: Any, is_file_source: bool, ffmpeg_options: Dict[str, str],
+                 open_timeout: float, read_timeout: float, decode_threads: int = 0):
+        import av
+
+        self._errors = (StopIteration, av.error.FFmpegError, OSError)
+        self.container = None
+        self._frame = None
+        try:
+            self.container = av.open(str(source),
+                                     options=ffmpeg_options if _is_network(source) else {},
+                                     timeout=(open_timeout, read_timeout))
+            stream = self.container.streams.video[0]
+            # Кадровая и срезовая многопоточность декодера
+            stream.thread_type = "AUTO"
+            stream.codec_context.thread_count = int(decode_threads)
+            self.fps = float(stream.average_rate or 0.0)
+            self._frames = self.container.decode(stream)
+        except self._errors as e:
+            logger.debug(f"PyAV: не удалось открыть {source}: {e}")
+            if self.container is not None:
+                self.container.close()
+            self.container = None
+            self.fps = 0.0
+
+    def is_opened(self) -> bool:
+        return self.container is not None
+
+    def grab(self) -> bool:
+        try:
+            self._frame = next(self._frames)
+            return True
+        except self._errors:
+            self._frame = None
+            return False
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        # Преобразование цвета (sws_scale) — только для обрабатываемых кадров
+        return self._frame.to_ndarray(format="bgr24") if self._frame is not None else None
+
+    def pts(self) -> Optional[float]:
+        return self._frame.time if self._frame is not None else None
+
+    def release(self) -> None:
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+class CaptureSource:
+    """
+    Источник кадров с раздельными grab()/retrieve(), фоновым
+    переподключением и временем кадров по меткам потока.
+    """
+
+    def __init__(self,
+                 source: Any,
+                 is_file_source: bool,
+                 backend: str = "opencv",
+                 ffmpeg_options: Optional[Dict[str, str]] = None,
+                 decode_threads: int = 0,
+                 open_timeout: float = CAPTURE_OPEN_TIMEOUT,
+                 read_timeout: float = CAPTURE_READ_TIMEOUT,
+                 backoff_initial: float = CAPTURE_BACKOFF_INITIAL,
+                 backoff_max: float = CAPTURE_BACKOFF_MAX):
+        """
+        Args:
+            source (Any): Индекс камеры, RTSP URL или путь к видеофайлу.
+            is_file_source (bool): Источник — видеофайл (без переподключения,
+                                   время кадра — момент чтения).
+            backend (str): "opencv" или "pyav" (веб-камеры — всегда OpenCV).
+            ffmpeg_options (dict | None): Параметры FFmpeg для сетевых потоков
+                                          (rtsp_transport, fflags, max_delay, ...).
+            decode_threads (int): Потоков декодера PyAV (0 — автоматически).
+            open_timeout (float): Таймаут подключения, сек.
+            read_timeout (float): Таймаут чтения кадра, сек.
+            backoff_initial (float): Первая пауза перед переподключением, сек.
+            backoff_max (float): Максимальная пауза перед переподключением, сек.
+        """
+        if backend not in CAPTURE_BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд захвата: {backend} (допустимо: {CAPTURE_BACKENDS})")
+        if backend == "pyav" and not isinstance(source, str):
+            logger.info("ℹ️ Веб-камера читается через OpenCV")
+            backend = "opencv"
+
+        self.source = source
+        self.is_file_source = is_file_source
+        self.backend = backend
+        self.ffmpeg_options = dict(ffmpeg_options or {})
+        self.decode_threads = decode_threads
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._backend = None
+        self._connected = threading.Event()
+        self._closed = threading.Event()
+        self._reconnector: Optional[threading.Thread] = None
+
+        # Привязка меток времени потока к часам системы
+        self._anchor_pts: Optional[float] = None
+        self._anchor_wall = 0.0
+
+        self.fps = 0.0
+        self.timestamp = 0.0
+        self.grabbed = 0
+        self.retrieved = 0
+        self.reconnects = 0
+
+    def _open_backend(self):
+        if self.backend == "pyav":
+            backend = _PyAVBackend(self.source, self.is_file_source, self.ffmpeg_options,
+                                   self.open_timeout, self.read_timeout, self.decode_threads)
+        else:
+            backend = _OpenCVBackend(self.source, self.is_file_source, self.ffmpeg_options,
+                                     self.open_timeout, self.read_timeout)
+        if not backend.is_opened():
+            backend.release()
+            return None
+        return backend
+
+    def _attach(self, backend, reconnected: bool = False) -> None:
+        with self._lock:
+            self._backend = backend
+            self._anchor_pts = None
+            if backend.fps > 0:
+                self.fps = backend.fps
+            if reconnected:
+                # Поток переподключения завершается вместе с подключением:
+                # обрыв сразу после него запустит новый
+                self._reconnector = None
+            self._connected.set()
+
+    def open(self) -> bool:
+        """
+        Подключается к источнику. При неудаче живой источник продолжает
+        подключаться в фоне.
+
+        Returns:
+            bool: True, если источник открыт сразу.
+        """
+        backend = self._open_backend()
+        if backend is not None:
+            self._attach(backend)
+            return True
+        if not self.is_file_source:
+            self._start_reconnect()
+        return False
+
+    def _start_reconnect(self) -> None:
+        with self._lock:
+            if self._closed.is_set() or (self._reconnector is not None and self._reconnector.is_alive()):
+                return
+            self._reconnector = threading.Thread(
+                target=self._reconnect_loop, name=f"reconnect:{self.source}", daemon=True)
+            self._reconnector.start()
+
+    def _reconnect_loop(self) -> None:
+        delay = self.backoff_initial
+        while not self._closed.wait(delay):
+            logger.warning(f"🔁 Повторное подключение к потоку {self.source}...")
+            try:
+                backend = self._open_backend()
+            except Exception:
+                logger.exception(f"❌ Ошибка подключения к {self.source}")
+                backend = None
+            if backend is not None:
+                if self._closed.is_set():
+                    backend.release()
+                    return
+                logger.info(f"✅ Поток {self.source} снова доступен")
+                self._attach(backend, reconnected=True)
+                return
+            delay = min(delay * 2, self.backoff_max)
+
+    def _disconnect(self) -> None:
+        with self._lock:
+            backend, self._backend = self._backend, None
+            self.reconnects += 1
+            self._connected.clear()
+        if backend is not None:
+            backend.release()
+        self._start_reconnect()
+
+    def _stamp(self, pts: Optional[float]) -> float:
+        now = time.time()
+        if self.is_file_source or pts is None:
+            return now
+        # Интервалы между кадрами — по меткам потока; привязка к часам
+        # обновляется при разрыве меток или накоплении расхождения
+        if self._anchor_pts is None or abs(self._anchor_wall + pts - self._anchor_pts - now) \
+                > CAPTURE_CLOCK_TOLERANCE:
+            self._anchor_pts, self._anchor_wall = pts, now
+        return min(self._anchor_wall + pts - self._anchor_pts, now)
+
+    def grab(self) -> bool:
+        """
+        Получает следующий кадр без преобразования в BGR.
+
+        Returns:
+            bool: False при конце файла или обрыве потока (переподключение
+                  запускается в фоне; см. wait_connected).
+        """
+        backend = self._backend
+        if backend is None:
+            return False
+        if not backend.grab():
+            if not self.is_file_source:
+                self._disconnect()
+            return False
+        self.grabbed += 1
+        self.timestamp = self._stamp(backend.pts())
+        return True
+
+    def retrieve(self) -> Optional[np.ndarray]:
+        """
+        Декодирует последний полученный кадр в BGR.
+
+        Returns:
+            np.ndarray | None: Кадр или None при ошибке.
+        """
+        backend = self._backend
+        frame = backend.retrieve() if backend is not None else None
+        if frame is not None:
+            self.retrieved += 1
+        return frame
+
+    def read(self):
+        """
+        grab() и retrieve() одним вызовом (как cv2.VideoCapture.read).
+
+        Returns:
+            tuple: (успех, кадр).
+        """
+        if not self.grab():
+            return False, None
+        frame = self.retrieve()
+        return frame is not None, frame
+
+    def wait_connected(self, timeout: float) -> bool:
+        """
+        Ожидает подключения после обрыва.
+
+        Args:
+            timeout (float): Максимальное время ожидания, сек.
+
+        Returns:
+            bool: True, если источник подключён.
+        """
+        return self._connected.wait(timeout)
+
+    def release(self) -> None:
+        """Закрывает источник и останавливает фоновое переподключение."""
+        self._closed.set()
+        with self._lock:
+            backend, self._backend = self._backend, None
+        self._connected.clear()
+        if backend is not None:
+            backend.release()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика источника.
+
+        Returns:
+            dict: grabbed — получено кадров, retrieved — декодировано в BGR,
+                  reconnects — обрывов потока.
+        """
+        return {"grabbed": self.grabbed, "retrieved": self.retrieved,
+                "reconnects": self.reconnects}
+
+
+def create_capture_source(source: Any, is_file_source: bool,
+                          settings: Optional[Dict]) -> CaptureSource:
+    """
+    Создаёт источник кадров по разделу "capture" config.json.
+
+    Args:
+        source (Any): Индекс камеры, RTSP URL или путь к видеофайлу.
+        is_file_source (bool): Источник — видеофайл.
+        settings (dict | None): {"backend": "opencv" | "pyav", "low_latency": bool,
+                                 "rtsp_transport": "tcp" | "udp", "decode_threads": int,
+                                 "open_timeout": сек, "read_timeout": сек}.
+
+    Returns:
+        CaptureSource: Источник кадров (ещё не открыт).
+    """
+    settings = settings or {}
+    options = {"rtsp_transport": settings.get("rtsp_transport", "tcp")}
+    if settings.get("low_latency", True):
+        options.update(RTSP_LOW_LATENCY_OPTIONS)
+
+    backend = settings.get("backend", "opencv")
+    if backend == "pyav" and importlib.util.find_spec("av") is None:
+        logger.warning("⚠️ PyAV не установлен (pip install av), используется OpenCV")
+        backend = "opencv"
+
+    return CaptureSource(source, is_file_source, backend=backend, ffmpeg_options=options,
+                         decode_threads=int(settings.get("decode_threads", 0)),
+                         open_timeout=float(settings.get("open_timeout", CAPTURE_OPEN_TIMEOUT)),
+                         read_timeout=float(settings.get("read_timeout", CAPTURE_READ_TIMEOUT)))
 
 
 def get_camera_stream() -> cv2.VideoCapture:
@@ -0,0 +1,278 @@
+"""
+Модуль clip_recorder.py
+
+Запись коротких клипов по событиям вместо непрерывной записи.
+Для каждого потока в памяти хранится кольцевой буфер последних кадров
+в виде JPEG (в десятки раз компактнее BGR-кадров). Когда номер SID
+фиксируется согласованием прочтений, сохраняется клип: pre_seconds до события
+из буфера и post_seconds после него. Кодирование и запись выполняются
+фоновыми потоками, поэтому затраты растут с трафиком, а не со временем работы.
+"""
+
+import os
+import queue
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from config import SAVE_DIR, CLIP_PRE_SECONDS, CLIP_POST_SECONDS, CLIP_JPEG_QUALITY, \
+    CLIP_MAX_WIDTH, CLIP_QUEUE_SIZE
+from metrics import CLIPS_WRITTEN
+
+logger = logging.getLogger(__name__)
+
+# Кадр буфера: (время захвата, JPEG)
+BufferedFrame = Tuple[float, bytes]
+
+
+class _Clip:
+    """Собираемый клип потока: кадры до события и после него."""
+
+    def __init__(self, label: str, sid: int, plate: str, event_time: float,
+                 frames: List[BufferedFrame], post_seconds: float):
+        self.label = label
+        self.events = [(sid, plate)]
+        self.event_time = event_time
+        self.end_time = event_time + post_seconds
+        self.frames = frames
+
+
+class ClipRecorder:
+    """
+    Кольцевые буферы кадров по потокам и запись клипов по событиям.
+    """
+
+    def __init__(self,
+                 pre_seconds: float = CLIP_PRE_SECONDS,
+                 post_seconds: float = CLIP_POST_SECONDS,
+                 jpeg_quality: int = CLIP_JPEG_QUALITY,
+                 max_width: int = CLIP_MAX_WIDTH,
+                 queue_size: int = CLIP_QUEUE_SIZE):
+        """
+        Args:
+            pre_seconds (float): Длительность клипа до события, сек.
+            post_seconds (float): Длительность клипа после события, сек.
+            jpeg_quality (int): Качество JPEG кадров буфера (0–100).
+            max_width (int): Кадры шире уменьшаются до этой ширины, px.
+            queue_size (int): Ёмкость очереди кадров на кодирование.
+        """
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+
+        # Кадры кодируются в JPEG в отдельном потоке; клипы пишутся в другом
+        self._frames: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._clips: queue.Queue = queue.Queue()
+
+        self._buffers: Dict[str, Deque[BufferedFrame]] = {}
+        self._active: Dict[str, _Clip] = {}
+        # (метка потока, SID) треков, по фиксации номера которых клип уже сохранён
+        self._emitted: Set[Tuple[str, int]] = set()
+        self._lock = threading.Lock()
+
+        self.dropped = 0
+        self.clips = 0
+        self.buffered_bytes = 0
+
+        self._encoder = threading.Thread(target=self._encode_loop, name="clip-encoder", daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, name="clip-writer", daemon=True)
+        self._encoder.start()
+        self._writer.start()
+
+    def submit(self, frame: np.ndarray, stream_label: str, timestamp: float,
+               locked: Dict[int, str]) -> bool:
+        """
+        Передаёт кадр в буфер; фиксация номера SID запускает запись клипа.
+
+        Кадр не копируется: после передачи его нельзя изменять.
+
+        Args:
+            frame (np.ndarray): Кадр с отрисовкой.
+            stream_label (str): Метка источника.
+            timestamp (float): Время захвата кадра.
+            locked (dict): {SID: зафиксированный номер} видимых треков кадра.
+
+        Returns:
+            bool: False, если очередь переполнена и кадр отброшен.
+        """
+        events = []
+        with self._lock:
+            for sid, plate in locked.items():
+                key = (stream_label, sid)
+                if key not in self._emitted:
+                    self._emitted.add(key)
+                    events.append((sid, plate))
+
+        try:
+            self._frames.put_nowait((frame, stream_label, timestamp, events))
+            return True
+        except queue.Full:
+            # Событие не потеряно: оно повторится на следующем кадре с треком
+            with self._lock:
+                self.dropped += 1
+                for sid, _ in events:
+                    self._emitted.discard((stream_label, sid))
+            return False
+
+    def forget(self, stream_label: str, sids) -> None:
+        """
+        Забывает треки с истёкшим SID_TTL.
+
+        Args:
+            stream_label (str): Метка источника.
+            sids (Iterable[int]): Удалённые SID.
+        """
+        with self._lock:
+            for sid in sids:
+                self._emitted.discard((stream_label, sid))
+
+    def _encode(self, frame: np.ndarray) -> Optional[bytes]:
+        h, w = frame.shape[:2]
+        if w > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(h * self.max_width / w)),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return buffer.tobytes() if ok else None
+
+    def _ingest(self, frame: np.ndarray, label: str, timestamp: float,
+                events: List[Tuple[int, str]]) -> None:
+        jpeg = self._encode(frame)
+        if jpeg is None:
+            return
+        item = (timestamp, jpeg)
+
+        buffer = self._buffers.setdefault(label, deque())
+        buffer.append(item)
+        self.buffered_bytes += len(jpeg)
+        while buffer and timestamp - buffer[0][0] > self.pre_seconds:
+            self.buffered_bytes -= len(buffer.popleft()[1])
+
+        clip = self._active.get(label)
+        if clip is not None:
+            clip.frames.append(item)
+
+        for sid, plate in events:
+            if clip is not None:
+                # Событие во время записи клипа продлевает его
+                clip.events.append((sid, plate))
+                clip.end_time = max(clip.end_time, timestamp + self.post_seconds)
+            else:
+                clip = _Clip(label, sid, plate, timestamp, list(buffer), self.post_seconds)
+                self._active[label] = clip
+
+        if clip is not None and timestamp >= clip.end_time:
+            del self._active[label]
+            self._clips.put(clip)
+
+    def _encode_loop(self) -> None:
+        while True:
+            item = self._frames.get()
+            if item is None:
+                break
+            try:
+                self._ingest(*item)
+            except Exception:
+                logger.exception("❌ Ошибка буферизации кадра клипа")
+
+        # Остановка: незавершённые клипы сохраняются как есть
+        for clip in self._active.values():
+            self._clips.put(clip)
+        self._active.clear()
+        self._clips.put(None)
+
+    def _write_loop(self) -> None:
+        while True:
+            clip = self._clips.get()
+            if clip is None:
+                break
+            try:
+                self._write(clip)
+            except Exception:
+                logger.exception("❌ Ошибка записи клипа")
+
+    def _write(self, clip: _Clip) -> None:
+        if not clip.frames:
+            return
+        first = cv2.imdecode(np.frombuffer(clip.frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        h, w = first.shape[:2]
+
+        # Частота кадров клипа — фактическая частота кадров в буфере
+        span = clip.frames[-1][0] - clip.frames[0][0]
+        fps = (len(clip.frames) - 1) / span if span > 0 else 1.0
+        fps = min(max(fps, 1.0), 60.0)
+
+        event_dt = datetime.fromtimestamp(clip.event_time)
+        date_dir = Path(f"{SAVE_DIR}/clips/{event_dt:%Y-%m-%d}")
+        os.makedirs(date_dir, exist_ok=True)
+        sid, plate = clip.events[0]
+        path = date_dir / f"{event_dt:%Y-%m-%d_%H-%M-%S}_{clip.label}_sid{sid}_{plate}.avi"
+
+        # VideoWriter не открывает пути с кириллицей в Windows: пишем во временный
+        # файл с латинским именем и переименовываем
+        tmp_path = date_dir / f"{event_dt:%Y-%m-%d_%H-%M-%S}_sid{sid}.part.avi"
+        writer = cv2.VideoWriter(str(tmp_path), cv2.VideoWriter_fourcc(*"XVID"), fps, (w, h))
+        try:
+            writer.write(first)
+            for _, jpeg in clip.frames[1:]:
+                frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None and frame.shape[:2] == (h, w):
+                    writer.write(frame)
+        finally:
+            writer.release()
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self.clips += 1
+        CLIPS_WRITTEN.labels(clip.label).inc()
+        plates = ", ".join(p for _, p in clip.events)
+        logger.info(f"🎬 Клип [{clip.label}] {plates}: {len(clip.frames)} кадров | Сохранено: {path}")
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        Сохраняет незавершённые клипы и останавливает потоки.
+
+        Args:
+            timeout (float): Максимальное время ожидания каждого потока, сек.
+        """
+        self._frames.put(None)
+        self._encoder.join(timeout)
+        self._writer.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика записи клипов.
+
+        Returns:
+            dict: clips — сохранено, active — записывается, dropped — кадров
+                  отброшено при переполнении, buffer_kb — объём буферов.
+        """
+        with self._lock:
+            return {
+                "clips": self.clips,
+                "active": len(self._active),
+                "dropped": self.dropped,
+                "buffer_kb": self.buffered_bytes // 1024,
+            }
+
+
+def create_clip_recorder(settings: Optional[Dict]) -> Optional[ClipRecorder]:
+    """
+    Создаёт запись клипов по разделу "event_clips" config.json.
+
+    Args:
+        settings (dict | None): {"enabled": bool, "pre_seconds": сек, "post_seconds": сек}.
+
+    Returns:
+        ClipRecorder | None: Запись клипов или None, если она выключена.
+    """
+    if not settings or not settings.get("enabled", False):
+        return None
+    return ClipRecorder(pre_seconds=float(settings.get("pre_seconds", CLIP_PRE_SECONDS)),
+                        post_seconds=float(settings.get("post_seconds", CLIP_POST_SECONDS)))
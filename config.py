@@ -9,10 +9,13 @@ import os
 
 # Путь к конфигурационному файлу
 CONFIG_PATH = "config.json"
+CONFIG_POLL_INTERVAL = 1.0  # сек - период проверки изменений config.json
 
 # Путь к .pt модели YOLO
 VEHICLE_MODEL_PATH = "./yolo_weights/yolov8s.pt"
 PLATE_MODEL_PATH = "./yolo_weights/yolov8_plate.pt"
+# Кэш моделей, экспортированных для ONNX Runtime / OpenVINO
+EXPORT_DIR = "./yolo_weights/exported"
 
 # Путь к шрифтам (кириллица)
 FONT_PATH = "./fonts/AutoNumber_Regular.ttf"
@@ -20,6 +23,15 @@ FONT_PATH = "./fonts/AutoNumber_Regular.ttf"
 # RTSP URL для подключения к IP-камере
 RTSP_URL: str | None = os.getenv("RTSP_URL")
 
+# Захват кадров (раздел "capture" в config.json)
+CAPTURE_BACKOFF_INITIAL = 0.5  # сек - первая пауза перед переподключением
+CAPTURE_BACKOFF_MAX = 30.0  # сек - максимальная пауза (удваивается после каждой неудачи)
+CAPTURE_OPEN_TIMEOUT = 10.0  # сек - таймаут подключения к потоку
+CAPTURE_READ_TIMEOUT = 5.0  # сек - таймаут чтения кадра (обрыв без закрытия соединения)
+CAPTURE_CLOCK_TOLERANCE = 1.0  # сек - расхождение меток потока и часов для перепривязки
+# Параметры FFmpeg для минимальной задержки RTSP
+RTSP_LOW_LATENCY_OPTIONS = {"fflags": "nobuffer", "flags": "low_delay", "max_delay": "500000"}
+
 # Целевые классы объектов, распознаваемых моделью
 TARGET_CLASSES: dict[int, str] = {
     2: 'car',
@@ -36,3 +48,93 @@ PLATE_LOG_INTERVAL = 60  # сек - повторно сохранить номе
 PLATE_HOLD_TIME = 2.0  # сек – сохранить номер за SID, если он не менялся
 
 SID_TTL = 3.0  # сек - SID «живёт» без bbox‑а
+
+# Пакетная обработка: номер из соседнего фрагмента файла в пределах окна — тот же проезд
+BATCH_SHARD_DEDUP_SECONDS = 10.0  # сек видео
+
+# Глубина очередей конвейера (захват → инференс → вывод)
+CAPTURE_QUEUE_SIZE = 4
+RESULT_QUEUE_SIZE = 4
+
+QUEUE_STATS_INTERVAL = 10.0  # сек - период вывода статистики очередей в лог
+
+# Пакетное распознавание номеров (только модель распознавания PaddleOCR)
+OCR_REC_BATCH_SIZE = 16
+OCR_REC_IMAGE_SHAPE = (3, 48, 320)  # C, H, W входа модели распознавания
+
+# Согласование прочтений номера по SID: после фиксации OCR для трека не выполняется
+PLATE_LOCK_MIN_READS = 3  # минимум прочтений
+PLATE_LOCK_RATIO = 0.8  # минимальная доля голосов за символ в каждой позиции
+
+# Декодирование номеров по грамматике (plate_grammar.py)
+PLATE_OCR_TOPK = 3  # альтернатив OCR для каждого символа
+PLATE_BEAM_WIDTH = 32  # гипотез после каждого символа
+PLATE_CONFUSION_PENALTY = 0.3  # множитель вероятности замены О/0, В/8, V→У, ...
+PLATE_SKIP_PENALTY = 0.05  # множитель вероятности пропуска лишнего символа
+PLATE_TWO_LINE_ASPECT = 2.2  # номера с отношением ширины к высоте меньше — двухстрочные
+
+# Режим "roi": детекция номеров на вырезанных bbox'ах ТС вместо всего кадра
+PLATE_ROI_IMGSZ = 320  # размер входа детектора номеров для ROI
+PLATE_ROI_MARGIN = 0.05  # расширение bbox ТС (доля размера) перед вырезанием
+
+# Прогрев моделей при запуске
+RUNTIME_WARMUP_SHAPE = (720, 1280, 3)  # H, W, C пустого кадра
+
+# Журнал распознанных номеров (SQLite, WAL)
+PLATE_DB_PATH = f"{SAVE_DIR}/recognized_plates.db"
+PLATE_EXPORT_PATH = f"{SAVE_DIR}/recognized_plates_export.xlsx"  # выгрузка в Excel по запросу
+PLATE_STORE_BATCH_SIZE = 256  # максимальный размер пакета вставки
+PLATE_STORE_FLUSH_INTERVAL = 1.0  # сек - максимальная задержка записи
+PLATE_STORE_QUEUE_SIZE = 10000
+PLATE_SEARCH_LIMIT = 100  # записей в ответе поиска по умолчанию
+
+# Проверка номеров по спискам (раздел "watchlists" в config.json)
+WATCHLIST_MAX_EDITS = 1  # правок (вставка, удаление, замена) при поиске совпадений
+WATCHLIST_CONFUSION_COST = 0.25  # стоимость замены внутри группы путаницы OCR (О/0, В/8, ...)
+WATCHLIST_RELOAD_INTERVAL = 10.0  # сек - период проверки изменений файлов списков
+WATCHLIST_ALERT_HISTORY = 200  # последних срабатываний для веб-интерфейса
+
+# Асинхронное сохранение снимков (один снимок на событие трека)
+SNAPSHOT_WORKERS = 2  # потоков кодирования/записи JPEG
+SNAPSHOT_QUEUE_SIZE = 32
+SNAPSHOT_JPEG_QUALITY = 90
+
+OVERLAY_CACHE_SIZE = 256  # подписей номеров в кэше отрисовки
+
+# Живой просмотр (MJPEG) в веб-интерфейсе
+PREVIEW_MAX_WIDTH = 960  # px - кадр уменьшается до этой ширины
+PREVIEW_JPEG_QUALITY = 70
+PREVIEW_MAX_FPS = 10.0
+
+# Фильтр движения перед детекторами (раздел "motion_gate" в config.json)
+MOTION_GATE_WIDTH = 160  # px - ширина уменьшенного кадра
+MOTION_PIXEL_THRESHOLD = 25  # порог изменения яркости пикселя
+MOTION_MIN_AREA = 0.002  # минимальная доля изменившихся пикселей зоны
+MOTION_HOLD_TIME = 1.0  # сек - детекторы остаются включены после движения
+
+# Адаптивный шаг кадров живых источников (раздел "adaptive_stride" в config.json)
+STRIDE_TARGET_LATENCY = 0.5  # сек - целевая задержка от захвата до результата
+STRIDE_CPU_BUDGET = 0.9  # доля времени потока инференса на все камеры
+STRIDE_MIN = 1
+STRIDE_MAX = 15
+STRIDE_IDLE = 5  # шаг при отсутствии живых треков (пустая сцена)
+STRIDE_EMA_ALPHA = 0.2  # сглаживание измерений
+STRIDE_ACTIVE_WEIGHT = 0.5  # прибавка к доле бюджета за каждый живой трек (до 4)
+
+# Отрисовка треков на кадрах без инференса (раздел "track_overlay" в config.json)
+TRACK_FLOW_WIDTH = 320  # px - ширина уменьшенного кадра для оптического потока
+TRACK_FLOW_GRID = 5  # сетка точек внутри бокса (5 × 5)
+TRACK_FLOW_MIN_POINTS = 4  # меньше отслеженных точек — перенос по скорости
+TRACK_OVERLAY_MAX_AGE = 1.0  # сек - трек без подтверждения детектором не рисуется
+
+# Асинхронная запись видео сегментами
+VIDEO_RECORDER_QUEUE_SIZE = 64  # кадров в очереди записи
+VIDEO_FPS_WARMUP = 2.0  # сек - измерение частоты кадров живого источника
+VIDEO_DEFAULT_FPS = 25.0  # если частоту кадров определить не удалось
+
+# Клипы по событиям (раздел "event_clips" в config.json)
+CLIP_PRE_SECONDS = 5.0  # сек до подтверждения номера
+CLIP_POST_SECONDS = 5.0  # сек после подтверждения номера
+CLIP_JPEG_QUALITY = 80  # качество кадров кольцевого буфера
+CLIP_MAX_WIDTH = 1280  # px - кадры буфера уменьшаются до этой ширины
+CLIP_QUEUE_SIZE = 64
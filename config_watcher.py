@@ -0,0 +1,198 @@
+"""
+Модуль config_watcher.py
+
+Отслеживание изменений config.json во время работы конвейера.
+Фоновый поток опрашивает время изменения файла; веб-интерфейс в том же
+процессе (web_server) сообщает о сохранении настроек напрямую через
+notify(), без ожидания очередного опроса. При изменении файл
+перечитывается, и подписчикам передаётся новый конфиг вместе с
+набором изменившихся ключей верхнего уровня.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from config import CONFIG_PATH, CONFIG_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Подписчик: (новый конфиг, изменившиеся ключи)
+ConfigCallback = Callable[[Dict, Set[str]], None]
+
+
+def diff_config(old: Dict, new: Dict) -> Set[str]:
+    """
+    Ключи верхнего уровня, значения которых различаются.
+
+    Args:
+        old (dict): Прежний конфиг.
+        new (dict): Новый конфиг.
+
+    Returns:
+        set: Добавленные, удалённые и изменённые ключи.
+    """
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+
+class ConfigWatcher:
+    """
+    Фоновое отслеживание config.json и рассылка изменений подписчикам.
+    """
+
+    def __init__(self, path: str = CONFIG_PATH, interval: float = CONFIG_POLL_INTERVAL):
+        """
+        Args:
+            path (str): Путь к config.json.
+            interval (float): Период опроса файла, сек.
+        """
+        self.path = path
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        self._callbacks: Dict[str, ConfigCallback] = {}
+        self._config: Dict = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.reloads = 0
+        self.errors = 0
+
+        # Исходное состояние — конфиг, с которым запущено приложение
+        self._config = self._read() or {}
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read(self) -> Optional[Dict]:
+        stamp = self._file_stamp()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cfg = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # Файл мог быть прочитан во время записи стороннего редактора
+            return None
+        self._stamp = stamp
+        return cfg if isinstance(cfg, dict) else None
+
+    @property
+    def config(self) -> Dict:
+        """Последний успешно прочитанный конфиг."""
+        with self._lock:
+            return dict(self._config)
+
+    def subscribe(self, key: str, callback: Optional[ConfigCallback]) -> None:
+        """
+        Регистрирует (заменяет или удаляет при callback=None) подписчика.
+
+        Args:
+            key (str): Имя подписчика (повторная регистрация заменяет прежнего,
+                       например при перезапуске конвейера).
+            callback (Callable | None): Функция (конфиг, изменившиеся ключи).
+        """
+        with self._lock:
+            if callback is None:
+                self._callbacks.pop(key, None)
+            else:
+                self._callbacks[key] = callback
+
+    def check(self) -> Set[str]:
+        """
+        Перечитывает файл, если он изменился, и уведомляет подписчиков.
+
+        Returns:
+            set: Изменившиеся ключи (пустое множество, если изменений нет).
+        """
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return set()
+
+        new = self._read()
+        if new is None:
+            # Повторная попытка — при следующем изменении файла (время или размер)
+            self._stamp = stamp
+            self.errors += 1
+            logger.warning(f"⚠️ Не удалось прочитать {self.path}, изменения не применены")
+            return set()
+
+        with self._lock:
+            changed = diff_config(self._config, new)
+            if not changed:
+                return set()
+            self._config = new
+            callbacks = list(self._callbacks.items())
+        self.reloads += 1
+        logger.info(f"🔄 Изменены настройки: {', '.join(sorted(changed))}")
+
+        for key, callback in callbacks:
+            try:
+                callback(dict(new), changed)
+            except Exception:
+                logger.exception(f"❌ Ошибка применения настроек ({key})")
+        return changed
+
+    def notify(self) -> None:
+        """
+        Сообщает о сохранении config.json (веб-интерфейс в том же процессе):
+        изменения применяются без ожидания очередного опроса.
+        """
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.check()
+            except Exception:
+                logger.exception("❌ Ошибка отслеживания config.json")
+
+    def start(self) -> None:
+        """Запускает фоновый опрос файла (повторный вызов ничего не делает)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        """
+        Останавливает фоновый опрос.
+
+        Args:
+            timeout (float): Максимальное время ожидания потока, сек.
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+_watcher: Optional[ConfigWatcher] = None
+_watcher_lock = threading.Lock()
+
+
+def get_config_watcher() -> ConfigWatcher:
+    """
+    Общее для процесса отслеживание config.json (создаётся при первом обращении).
+
+    Returns:
+        ConfigWatcher: Отслеживание конфига.
+    """
+    global _watcher
+    if _watcher is None:
+        with _watcher_lock:
+            if _watcher is None:
+                _watcher = ConfigWatcher()
+    return _watcher
@@ -0,0 +1,313 @@
+"""
+Модуль detector_backend.py
+
+Подключаемый бэкенд инференса YOLO: PyTorch (по умолчанию), ONNX Runtime
+или OpenVINO для CPU. Экспортированные модели (статическая или
+динамическая форма входа, FP32 или INT8) кэшируются в EXPORT_DIR и
+используются повторно после перезапуска, пока не изменится исходный .pt.
+Инференс и постобработка выполняются ultralytics, поэтому результаты
+имеют тот же формат (results.boxes), что и при работе с .pt.
+
+Проверка совпадения с PyTorch:
+    py detector_backend.py --backend onnx --image "assets/2025-07-19_07-59-17_Х402ТЕ750.jpg"
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from ultralytics import YOLO
+
+from config import EXPORT_DIR, VEHICLE_MODEL_PATH, PLATE_MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def _fingerprint(weights_path: str) -> str:
+    """Хэш исходных весов: экспорт повторяется только при их изменении."""
+    h = hashlib.sha256()
+    with open(weights_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _artifact_name(weights_path: str, backend: str, imgsz: int,
+                   dynamic: bool, int8: bool) -> str:
+    shape = "dynamic" if dynamic else "static"
+    precision = "int8" if int8 else "fp32"
+    return f"{Path(weights_path).stem}_{backend}_{imgsz}_{shape}_{precision}"
+
+
+def _quantize_onnx(src: str, dst: str) -> None:
+    """
+    INT8-квантование весов ONNX-модели (динамическое, без калибровочных данных).
+    """
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(src, dst, weight_type=QuantType.QUInt8)
+
+
+def export_model(weights_path: str,
+                 backend: str,
+                 imgsz: int = 640,
+                 dynamic: bool = False,
+                 int8: bool = False,
+                 calibration_data: Optional[str] = None,
+                 export_dir: str = EXPORT_DIR) -> str:
+    """
+    Экспортирует модель YOLO для ONNX Runtime или OpenVINO либо берёт
+    готовый экспорт из кэша.
+
+    Args:
+        weights_path (str): Путь к .pt.
+        backend (str): "onnx" или "openvino".
+        imgsz (int): Размер входа модели.
+        dynamic (bool): Динамическая форма входа (пакет и размер); иначе — статическая.
+        int8 (bool): INT8-квантование.
+        calibration_data (str | None): YAML датасета для калибровки INT8 в OpenVINO.
+        export_dir (str): Каталог кэша экспортированных моделей.
+
+    Returns:
+        str: Путь к .onnx или к каталогу модели OpenVINO.
+    """
+    name = _artifact_name(weights_path, backend, imgsz, dynamic, int8)
+    target_dir = Path(export_dir) / name
+    meta_path = target_dir / "export.json"
+    fingerprint = _fingerprint(weights_path)
+
+    if meta_path.exists():
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") == fingerprint and os.path.exists(meta.get("path", "")):
+            logger.info(f"📦 Экспорт из кэша: {meta['path']}")
+            return meta["path"]
+
+    logger.info(f"🔧 Экспорт {weights_path} → {backend} ({name})...")
+    if target_dir.exists():
+        shutil.rmtree(target_dir)
+    target_dir.mkdir(parents=True)
+
+    model = YOLO(weights_path)
+    if backend == "onnx":
+        exported = model.export(format="onnx", imgsz=imgsz, dynamic=dynamic,
+                                simplify=True, device="cpu")
+        path = str(target_dir / f"{Path(weights_path).stem}.onnx")
+        if int8:
+            _quantize_onnx(exported, path)
+            os.remove(exported)
+        else:
+            shutil.move(exported, path)
+    elif backend == "openvino":
+        kwargs: Dict[str, Any] = {"format": "openvino", "imgsz": imgsz,
+                                  "dynamic": dynamic, "int8": int8, "device": "cpu"}
+        if int8 and calibration_data:
+            kwargs["data"] = calibration_data
+        exported = model.export(**kwargs)
+        path = str(target_dir / Path(exported).name)
+        shutil.move(exported, path)
+    else:
+        raise ValueError(f"Неизвестный бэкенд экспорта: {backend}")
+
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"source": weights_path, "fingerprint": fingerprint, "path": path,
+                   "backend": backend, "imgsz": imgsz, "dynamic": dynamic, "int8": int8},
+                  f, indent=2, ensure_ascii=False)
+    logger.info(f"✅ Модель экспортирована: {path}")
+    return path
+
+
+class Detector:
+    """
+    Детектор YOLO с выбранным бэкендом; вызывается так же, как модель ultralytics.
+
+    Экспорт со статической формой принимает только один кадр фиксированного
+    размера, поэтому пакет разбивается на отдельные вызовы. Для каждого
+    размера из extra_imgsz (например, PLATE_ROI_IMGSZ) экспортируется
+    отдельная модель; прочие запрошенные imgsz заменяются размером основного
+    экспорта (с предупреждением).
+    """
+
+    def __init__(self,
+                 weights_path: str,
+                 backend: str = "torch",
+                 imgsz: int = 640,
+                 dynamic: bool = False,
+                 int8: bool = False,
+                 calibration_data: Optional[str] = None,
+                 export_dir: str = EXPORT_DIR,
+                 extra_imgsz: Sequence[int] = ()):
+        """
+        Args:
+            weights_path (str): Путь к .pt.
+            backend (str): "torch", "onnx" или "openvino".
+            imgsz (int): Размер входа экспортированной модели.
+            dynamic (bool): Динамическая форма входа экспорта.
+            int8 (bool): INT8-квантование экспорта.
+            calibration_data (str | None): YAML датасета для калибровки INT8 (OpenVINO).
+            export_dir (str): Каталог кэша экспортированных моделей.
+            extra_imgsz (Sequence): Дополнительные размеры входа, с которыми
+                                    вызывается модель (для статического экспорта).
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный бэкенд детектора: {backend} (допустимо: {BACKENDS})")
+
+        self.backend = backend
+        self.imgsz = imgsz
+        self.static = backend != "torch" and not dynamic
+        # {imgsz: модель} статических экспортов дополнительных размеров
+        self._sized: Dict[int, Any] = {}
+        self._warned_sizes = set()
+
+        if backend == "torch":
+            self.path = weights_path
+            self.model = YOLO(weights_path)
+        else:
+            self.path = export_model(weights_path, backend, imgsz, dynamic, int8,
+                                     calibration_data, export_dir)
+            self.model = YOLO(self.path, task="detect")
+            if self.static:
+                for size in extra_imgsz:
+                    if int(size) != imgsz:
+                        path = export_model(weights_path, backend, int(size), dynamic, int8,
+                                            calibration_data, export_dir)
+                        self._sized[int(size)] = YOLO(path, task="detect")
+
+    def __call__(self, frames: List[np.ndarray], **kwargs) -> list:
+        """
+        Инференс пакета кадров.
+
+        Args:
+            frames (list): Кадры BGR.
+            **kwargs: Параметры predict ultralytics (device, imgsz, verbose, ...).
+
+        Returns:
+            list: Results ultralytics для каждого кадра.
+        """
+        if self.backend == "torch":
+            return self.model(frames, **kwargs)
+
+        # Экспортированные модели работают на CPU
+        kwargs["device"] = "cpu"
+        if not self.static:
+            return self.model(frames, **kwargs)
+
+        requested = int(kwargs.get("imgsz") or self.imgsz)
+        model = self._sized.get(requested, self.model)
+        if model is self.model and requested != self.imgsz and requested not in self._warned_sizes:
+            self._warned_sizes.add(requested)
+            logger.warning(f"⚠️ Статический экспорт {Path(self.path).name}: imgsz={requested} "
+                           f"заменён на {self.imgsz} (нет экспорта этого размера)")
+        kwargs["imgsz"] = requested if requested in self._sized else self.imgsz
+        results = []
+        for frame in frames:
+            results.extend(model(frame, **kwargs))
+        return results
+
+
+def create_detector(weights_path: str, settings: Optional[Dict],
+                    extra_imgsz: Sequence[int] = ()) -> Detector:
+    """
+    Создаёт детектор по разделу "detector_backend" config.json.
+
+    Args:
+        weights_path (str): Путь к .pt.
+        settings (dict | None): {"backend": "torch" | "onnx" | "openvino", "imgsz": int,
+                                 "dynamic": bool, "int8": bool, "calibration_data": str}.
+        extra_imgsz (Sequence): Дополнительные размеры входа (статический экспорт).
+
+    Returns:
+        Detector: Детектор.
+    """
+    settings = settings or {}
+    return Detector(weights_path,
+                    backend=settings.get("backend", "torch"),
+                    imgsz=int(settings.get("imgsz", 640)),
+                    dynamic=bool(settings.get("dynamic", False)),
+                    int8=bool(settings.get("int8", False)),
+                    calibration_data=settings.get("calibration_data"),
+                    extra_imgsz=extra_imgsz)
+
+
+def _box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def compare_detections(reference, candidate, iou_threshold: float = 0.9) -> Dict[str, float]:
+    """
+    Сравнивает детекции двух бэкендов на одном кадре.
+
+    Args:
+        reference: Results ultralytics эталона (PyTorch).
+        candidate: Results ultralytics проверяемого бэкенда.
+        iou_threshold (float): Минимальный IoU совпадающих bbox'ов.
+
+    Returns:
+        dict: reference, candidate — число bbox'ов, matched — совпавших
+              (тот же класс, IoU >= порога), mean_iou, max_conf_diff.
+    """
+    ra, ca = reference.boxes, candidate.boxes
+    rb, cb = ra.xyxy.cpu().numpy(), ca.xyxy.cpu().numpy()
+    stats = {"reference": len(rb), "candidate": len(cb), "matched": 0,
+             "mean_iou": 0.0, "max_conf_diff": 0.0}
+    if len(rb) == 0 or len(cb) == 0:
+        return stats
+
+    iou = _box_iou(rb, cb)
+    same_class = ra.cls.cpu().numpy()[:, None] == ca.cls.cpu().numpy()[None, :]
+    iou = np.where(same_class, iou, 0.0)
+    best = iou.argmax(axis=1)
+    best_iou = iou[np.arange(len(rb)), best]
+    matched = best_iou >= iou_threshold
+
+    conf_diff = np.abs(ra.conf.cpu().numpy() - ca.conf.cpu().numpy()[best])[matched]
+    stats.update(matched=int(matched.sum()),
+                 mean_iou=round(float(best_iou[matched].mean()), 4) if matched.any() else 0.0,
+                 max_conf_diff=round(float(conf_diff.max()), 4) if matched.any() else 0.0)
+    return stats
+
+
+def main() -> None:
+    import cv2
+    from log_config import setup_logging
+
+    parser = argparse.ArgumentParser(
+        description="Экспорт моделей YOLO и проверка совпадения с PyTorch")
+    parser.add_argument("--backend", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--dynamic", action="store_true")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--calibration-data", default=None)
+    parser.add_argument("--image", action="append", default=[],
+                        help="изображение для сравнения с PyTorch (можно несколько)")
+    args = parser.parse_args()
+
+    setup_logging()
+    for weights in (VEHICLE_MODEL_PATH, PLATE_MODEL_PATH):
+        detector = Detector(weights, args.backend, args.imgsz, args.dynamic,
+                            args.int8, args.calibration_data)
+        reference = YOLO(weights)
+        for image_path in args.image:
+            frame = cv2.imread(image_path)
+            ref = reference(frame, imgsz=args.imgsz, device="cpu", verbose=False)[0]
+            cand = detector([frame], verbose=False)[0]
+            print(f"{Path(weights).name} / {image_path}: {compare_detections(ref, cand)}")
+
+
+if __name__ == "__main__":
+    main()
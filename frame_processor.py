@@ -0,0 +1,235 @@
+"""
+Модуль frame_processor.py
+
+Стадия инференса конвейера: детекция и трекинг ТС, детекция
+и распознавание номеров, привязка номеров к SID. Используется
+как живым конвейером (main.py), так и пакетной обработкой архива
+(batch_process.py).
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+from supervision import Detections
+
+from model_runtime import ModelRuntime
+from stream_state import StreamState
+from plate_assignment import match_plates_to_tracks
+from metrics import STAGE_SECONDS, FRAMES_PROCESSED, FRAMES_GATED, FRAMES_PREDICTED, OCR_CROPS, OCR_BATCHES, \
+    PLATES_ASSIGNED
+
+
+def detect_plates_in_tracks(packets: List[dict], frame_tracks: list,
+                            runtime: ModelRuntime) -> Tuple[list, List[Dict[int, int]]]:
+    """
+    Режим "roi": детекция номеров только внутри bbox'ов треков.
+
+    Треки с зафиксированным номером в детектор не передаются,
+    но считаются привязанными к своему номеру.
+
+    Args:
+        packets (list): Пакеты текущего такта.
+        frame_tracks (list): Треки ByteTrack для каждого пакета.
+        runtime (ModelRuntime): Общие модели.
+
+    Returns:
+        tuple: (bbox'ы номеров для каждого кадра, соответствия {SID: индекс номера}).
+    """
+    frames, vehicle_boxes, frame_sids = [], [], []
+    for packet, tracks in zip(packets, frame_tracks):
+        stream: StreamState = packet["stream"]
+        unlocked = np.array([not stream.consensus.is_locked(int(sid))
+                             for sid in tracks.tracker_id], dtype=bool)
+        sids = [int(sid) for sid in tracks.tracker_id[unlocked]]
+        boxes = tracks.xyxy[unlocked].reshape(-1, 4)
+        frames.append(packet["frame"])
+        vehicle_boxes.append(boxes)
+        frame_sids.append(sids)
+
+    plates = runtime.detect_plates_in_vehicles(frames, vehicle_boxes)
+
+    plate_boxes_batch, frame_matches = [], []
+    for packet, tracks, sids, frame_plates in zip(packets, frame_tracks, frame_sids, plates):
+        stream = packet["stream"]
+        plate_boxes, plate_matches = [], {}
+        for sid, box in zip(sids, frame_plates):
+            if box is not None:
+                plate_matches[sid] = len(plate_boxes)
+                plate_boxes.append(box)
+        # Зафиксированные треки привязаны к номеру без повторной детекции
+        for sid in tracks.tracker_id:
+            if stream.consensus.is_locked(int(sid)):
+                plate_matches[int(sid)] = -1
+        plate_boxes_batch.append(plate_boxes)
+        frame_matches.append(plate_matches)
+
+    return plate_boxes_batch, frame_matches
+
+
+def process_batch(packets: List[dict], runtime: ModelRuntime,
+                  plate_detection_mode: str = "frame") -> List[dict]:
+    """
+    Стадия инференса: детекция ТС и номеров одним пакетом для кадров всех
+    потоков, затем трекинг, распознавание и привязка номеров к SID
+    в состоянии каждого потока.
+
+    Номера треков с уже зафиксированным прочтением повторно не распознаются.
+    Кадры с флагом "predicted" (пропущенные шагом кадров) в детекторы не
+    передаются: боксы треков переносятся на них с последнего обработанного кадра.
+
+    Args:
+        packets (list): Пакеты от потоков захвата (frame_id, frame, timestamp, stream).
+        runtime (ModelRuntime): Общие модели.
+        plate_detection_mode (str): "frame" — детекция номеров по всему кадру,
+                                    "roi" — внутри bbox'ов треков.
+
+    Returns:
+        list: Пакеты для стадии вывода с добавленными полями
+              labels [(sid, bbox, plate)] и assignments {SID: plate_text}.
+    """
+    # Фильтр движения: статичные кадры без живых треков не идут в детекторы
+    active = []
+    for packet in packets:
+        stream: StreamState = packet["stream"]
+        if packet.get("predicted"):
+            process_predicted(packet)
+            continue
+        gate = stream.motion_gate
+        if gate is None or gate.check(packet["frame"], bool(stream.sid_last_seen),
+                                      packet["timestamp"]):
+            active.append(packet)
+        else:
+            FRAMES_GATED.labels(stream.label).inc()
+            process_idle(packet)
+
+    if active:
+        infer_batch(active, runtime, plate_detection_mode)
+    return packets
+
+
+def process_idle(packet: dict) -> dict:
+    """
+    Обработка кадра без движения: детекторы не запускаются, трекер получает
+    пустые детекции (потерянные треки стареют как обычно), SID истекают
+    по SID_TTL.
+
+    Args:
+        packet (dict): Пакет от потока захвата.
+
+    Returns:
+        dict: Пакет с пустыми labels и assignments.
+    """
+    stream: StreamState = packet["stream"]
+    stream.update_tracks(Detections.empty())
+    if stream.propagator is not None:
+        stream.propagator.observe(packet["frame"], [], packet["timestamp"])
+
+    packet["labels"] = []
+    packet["assignments"] = {}
+    packet["locked"] = {}
+    packet["expired"] = stream.expire(packet["timestamp"])
+    return packet
+
+
+def process_predicted(packet: dict) -> dict:
+    """
+    Обработка кадра, пропущенного шагом кадров: детекторы и трекер не
+    запускаются, боксы видимых треков переносятся с последнего
+    обработанного кадра (оптический поток или постоянная скорость).
+
+    Args:
+        packet (dict): Пакет от потока захвата.
+
+    Returns:
+        dict: Пакет с перенесёнными labels и пустыми assignments.
+    """
+    stream: StreamState = packet["stream"]
+    labels = []
+    if stream.propagator is not None:
+        with STAGE_SECONDS.labels("track_propagation").time():
+            labels = stream.propagator.predict(packet["frame"], packet["timestamp"])
+        FRAMES_PREDICTED.labels(stream.label).inc()
+
+    packet["labels"] = labels
+    packet["assignments"] = {}
+    packet["locked"] = stream.locked_plates(labels)
+    packet["expired"] = []
+    return packet
+
+
+def infer_batch(packets: List[dict], runtime: ModelRuntime,
+                plate_detection_mode: str = "frame") -> List[dict]:
+    """
+    Детекция, трекинг и распознавание номеров для кадров, прошедших фильтр движения.
+
+    Args:
+        packets (list): Пакеты от потоков захвата.
+        runtime (ModelRuntime): Общие модели.
+        plate_detection_mode (str): "frame" или "roi".
+
+    Returns:
+        list: Те же пакеты с заполненными labels, assignments, locked, expired.
+    """
+    frames = [p["frame"] for p in packets]
+
+    with STAGE_SECONDS.labels("vehicle_detection").time():
+        vehicle_detections = runtime.detect_vehicles(frames)
+    with STAGE_SECONDS.labels("tracking").time():
+        frame_tracks = [p["stream"].update_tracks(d)
+                        for p, d in zip(packets, vehicle_detections)]
+
+    with STAGE_SECONDS.labels("plate_detection").time():
+        if plate_detection_mode == "roi":
+            plate_boxes_batch, frame_matches = detect_plates_in_tracks(
+                packets, frame_tracks, runtime)
+        else:
+            # Детекция номеров по всему кадру и геометрическая привязка к SID
+            plate_boxes_batch = runtime.detect_plates(frames)
+            frame_matches = [match_plates_to_tracks(plate_boxes, tracks)
+                             for plate_boxes, tracks in zip(plate_boxes_batch, frame_tracks)]
+
+    crops, owners = [], []
+    for packet, plate_boxes, plate_matches in zip(
+            packets, plate_boxes_batch, frame_matches):
+        stream: StreamState = packet["stream"]
+        frame = packet["frame"]
+
+        for sid, i in plate_matches.items():
+            if stream.consensus.is_locked(sid):
+                stream.consensus.skipped += 1
+                continue
+            b = plate_boxes[i]
+            crops.append(frame[int(b[1]):int(b[3]), int(b[0]):int(b[2])])
+            owners.append((stream, sid))
+
+    # Распознаём номера всех потоков за один проход
+    if crops:
+        OCR_BATCHES.inc()
+        OCR_CROPS.inc(len(crops))
+    with STAGE_SECONDS.labels("ocr").time():
+        readings = runtime.recognize_plates(crops)
+    for (stream, sid), (text, confidences) in zip(owners, readings):
+        stream.consensus.add_reading(sid, text, confidences)
+
+    for packet, tracks, plate_matches in zip(packets, frame_tracks, frame_matches):
+        stream = packet["stream"]
+        current_time = packet["timestamp"]
+
+        plate_assignments = stream.resolve_assignments(plate_matches)
+        stream.apply_assignments(plate_assignments, current_time)
+
+        packet["labels"] = stream.collect_labels(tracks, current_time)
+        packet["assignments"] = plate_assignments
+        packet["locked"] = stream.locked_plates(packet["labels"])
+        if stream.propagator is not None:
+            # Кадр ещё не изменён отрисовкой: опорный для следующих пропущенных кадров
+            stream.propagator.observe(packet["frame"], packet["labels"], current_time)
+
+        # Удаление устаревших SID
+        packet["expired"] = stream.expire(current_time)
+
+        FRAMES_PROCESSED.labels(stream.label).inc()
+        if plate_assignments:
+            PLATES_ASSIGNED.labels(stream.label).inc(len(plate_assignments))
+
+    return packets
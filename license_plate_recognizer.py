@@ -1,11 +1,13 @@
-import re
+import math
 from paddleocr import PaddleOCR
 import numpy as np
 import cv2
-from typing import Union
-from PIL import ImageFont, ImageDraw, Image
+from typing import List, Tuple, Union
 
-from config import FONT_PATH
+from overlay_renderer import get_overlay_renderer
+from plate_text import normalize_plate_text
+from plate_grammar import get_plate_grammar
+from config import OCR_REC_BATCH_SIZE, OCR_REC_IMAGE_SHAPE, PLATE_OCR_TOPK, PLATE_TWO_LINE_ASPECT
 
 
 class PlateRecognizer:
@@ -24,57 +26,14 @@ class PlateRecognizer:
             gpu_mem=4000,
             gpu_id=0
         )
-
-    def correct_plate_number(self, plate: str) -> str:
-        """
-        Корректирует возможные ошибки OCR, заменяя букву 'O' на цифру '0' в позициях, где должны быть цифры.
-
-        Args:
-            plate (str): Распознанная строка номера.
-
-        Returns:
-            str: Скорректированная строка номера.
-        """
-        plate = plate.strip()
-
-        # Приводим к верхнему регистру и разбиваем на символы
-        plate = list(plate.upper())
-
-        # Индексы предполагаемых цифровых позиций (по ГОСТу): 2,3,4,7,8,9
-        target_positions_number = [1, 2, 3, 6, 7, 8]
-        target_positions_liter = [0, 4, 5]
-
-        for pos in target_positions_liter:
-            if pos < len(plate):
-                char = plate[pos]
-                # Заменяем 'V' на 'Y'
-                if char in ('V'):
-                    replacements = {'V': 'Y'}
-                    plate[pos] = replacements[char]
-
-        for pos in target_positions_number:
-            if pos < len(plate):
-                char = plate[pos]
-                # Заменяем 'O' (английскую) на '0', 'I' -> '1'
-                if char in ('O', 'I'):
-                    replacements = {'O': '0', 'I': '1'}
-                    plate[pos] = replacements[char]
-
-        return ''.join(plate)
+        # Таблица форматов номеров компилируется один раз на процесс
+        self.grammar = get_plate_grammar()
 
     def normalize_plate_text(self, text):
-        LATIN_TO_CYRILLIC = {
-            "A": "А", "B": "В", "E": "Е", "K": "К", "M": "М",
-            "H": "Н", "O": "О", "P": "Р", "C": "С", "T": "Т",
-            "Y": "У", "X": "Х",
-            "a": "А", "b": "В", "e": "Е", "k": "К", "m": "М",
-            "h": "Н", "o": "О", "p": "Р", "c": "С", "t": "Т",
-            "y": "У", "x": "Х"
-        }
+        # Таблица замены строится один раз при импорте plate_text
+        return normalize_plate_text(text)
 
-        return "".join(LATIN_TO_CYRILLIC.get(c, c) for c in text)
-
-    def is_license_plate(self, text: str) -> bool:
+    def is_license_plate(self, text: str) -> Tuple[bool, str]:
         """
         Проверяет, соответствует ли строка формату российского номерного знака.
 
@@ -82,17 +41,10 @@ class PlateRecognizer:
             text (str): Строка, которую нужно проверить.
 
         Returns:
-            bool: True, если строка соответствует формату номера, иначе False.
+            tuple: (подходит ли под формат, номер кириллицей без разделителей).
         """
-        LICENSE_PATTERN = re.compile(
-            r"^[А-Я]{1}\d{3}[А-Я]{2}\d{2,3}$", re.IGNORECASE)
-
-        # Удаляем пробелы и применяем регулярное выражение для шаблона номера
-        text = text.upper().replace(" ", "").replace("-", "")
-        plate_text = self.normalize_plate_text(text)
-        is_valid = bool(LICENSE_PATTERN.match(plate_text))
-
-        return is_valid, plate_text
+        # Все форматы ГОСТ (обычные, такси, прицепы, мотоциклы, транзитные, полиция)
+        return self.grammar.validate(text)
 
     def draw_text_cyrillic(self, img_bgr,
                            text,
@@ -101,33 +53,26 @@ class PlateRecognizer:
                            text_color=(0, 0, 0),
                            bg_color=(255, 255, 255),
                            padding=4):
-        img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-        img_pil = Image.fromarray(img_rgb)
-        draw = ImageDraw.Draw(img_pil)
-
-        try:
-            font = ImageFont.truetype(FONT_PATH, font_size)
-        except:
-            font = ImageFont.load_default()
-
-        # Размер текста
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-
-        x, y = position
-        box_x1 = x - padding
-        box_y1 = y - padding
-        box_x2 = x + text_width + padding
-        box_y2 = y + text_height + padding
+        """
+        Рисует текст кириллицей на белой подложке.
 
-        # Рисуем белый прямоугольник
-        draw.rectangle([(box_x1, box_y1), (box_x2, box_y2)], fill=bg_color)
+        Подпись растеризуется один раз и берётся из кэша OverlayRenderer,
+        кадр изменяется на месте без преобразования в PIL.
 
-        # Рисуем текст
-        draw.text((x, y), text, font=font, fill=text_color)
+        Args:
+            img_bgr (np.ndarray): BGR-кадр.
+            text (str): Текст подписи.
+            position (tuple): Левый верхний угол текста (x, y).
+            font_size (int): Размер шрифта.
+            text_color (tuple): Цвет текста (RGB).
+            bg_color (tuple): Цвет подложки (RGB).
+            padding (int): Отступ подложки вокруг текста, px.
 
-        return cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+        Returns:
+            np.ndarray: Кадр с подписью.
+        """
+        return get_overlay_renderer().draw_text(
+            img_bgr, text, position, font_size, text_color, bg_color, padding)
 
     # def preprocess_roi(self, roi):
         # # Увеличение контраста
@@ -187,11 +132,177 @@ class PlateRecognizer:
         # Проверяем, есть ли результат и текст
         if result and result[0]:
             # Извлекаем текст из результата OCR
-            plate_raw = result[0][0][1][0]
-            plate = self.correct_plate_number(plate_raw)
-
-            valid, normalized_plate = self.is_license_plate(plate)
-            if valid:
-                return normalized_plate
+            plate_raw, score = result[0][0][1]
+            reading = self.grammar.decode_text(plate_raw, [float(score)] * len(plate_raw))
+            if reading is not None:
+                return reading.plate
 
         return ""
+
+    def _prepare_rec_batch(self, crops: List[np.ndarray]) -> np.ndarray:
+        """
+        Приводит вырезанные номера к входу модели распознавания:
+        масштабирование по высоте с сохранением пропорций, нормализация
+        и дополнение нулями до общей ширины пакета.
+
+        Args:
+            crops (list): BGR-изображения номеров.
+
+        Returns:
+            np.ndarray: Тензор (N, 3, H, W) float32.
+        """
+        c, h, w = OCR_REC_IMAGE_SHAPE
+        max_wh_ratio = max([w / h] + [crop.shape[1] / crop.shape[0]
+                                      for crop in crops])
+        batch_w = int(h * max_wh_ratio)
+
+        batch = np.zeros((len(crops), c, h, batch_w), dtype=np.float32)
+        for i, crop in enumerate(crops):
+            resized_w = min(batch_w, int(
+                math.ceil(h * crop.shape[1] / crop.shape[0])))
+            resized = cv2.resize(crop, (resized_w, h)).astype(np.float32)
+            resized = (resized.transpose((2, 0, 1)) / 255 - 0.5) / 0.5
+            batch[i, :, :, :resized_w] = resized
+        return batch
+
+    def _run_recognizer(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Прогоняет пакет через модель распознавания PaddleOCR (без детекции текста).
+
+        Args:
+            batch (np.ndarray): Тензор (N, 3, H, W).
+
+        Returns:
+            np.ndarray: Вероятности символов (N, T, C).
+        """
+        rec = self.ocr.text_recognizer
+        if getattr(rec, "use_onnx", False):
+            outputs = rec.predictor.run(
+                rec.output_tensors, {rec.input_tensor.name: batch})
+        else:
+            rec.input_tensor.copy_from_cpu(batch)
+            rec.predictor.run()
+            outputs = [t.copy_to_cpu() for t in rec.output_tensors]
+        return outputs[0]
+
+    def _ctc_decode(self, probs: np.ndarray) -> List[List[Tuple[str, float]]]:
+        """
+        Жадное CTC-декодирование с альтернативами для каждого символа.
+
+        Args:
+            probs (np.ndarray): Вероятности (T, C) одного изображения.
+
+        Returns:
+            list: Для каждого прочитанного символа до PLATE_OCR_TOPK вариантов
+                  [(символ, вероятность)], лучший — первым (вероятности взяты
+                  в самом уверенном кадре отрезка символа).
+        """
+        characters = self.ocr.text_recognizer.postprocess_op.character
+        best = probs.argmax(axis=1)
+        best_probs = probs.max(axis=1)
+
+        segments = []  # [(номер кадра с максимальной уверенностью)]
+        prev = 0
+        for t, idx in enumerate(best):
+            if idx != 0 and idx != prev:
+                segments.append(t)
+            elif idx != 0 and best_probs[t] > best_probs[segments[-1]]:
+                # Повтор символа: берём самый уверенный кадр отрезка
+                segments[-1] = t
+            prev = idx
+
+        alternatives = []
+        for t in segments:
+            # Пустой символ CTC (индекс 0) в альтернативы не входит
+            top = np.argsort(probs[t, 1:])[::-1][:PLATE_OCR_TOPK] + 1
+            alternatives.append([(characters[i], float(probs[t, i])) for i in top])
+        return alternatives
+
+    def _recognize_raw(self, crops: List[np.ndarray]) -> List[List[List[Tuple[str, float]]]]:
+        """
+        Распознаёт сырой текст пакетов вырезанных номеров.
+
+        Args:
+            crops (list): BGR-изображения номеров.
+
+        Returns:
+            list: Для каждого изображения альтернативы каждого символа
+                  [[(символ, вероятность)]].
+        """
+        if not hasattr(self.ocr, "text_recognizer"):
+            # Резервный путь: штатный вызов PaddleOCR без детекции текста
+            result = self.ocr.ocr(crops, det=False, cls=False)
+            return [[[(ch, float(score))] for ch in text]
+                    for text, score in result[0]]
+
+        # Сортировка по соотношению сторон уменьшает дополнение в пакете
+        order = sorted(range(len(crops)),
+                       key=lambda i: crops[i].shape[1] / crops[i].shape[0])
+        raw: List[List[List[Tuple[str, float]]]] = [[] for _ in crops]
+        for start in range(0, len(order), OCR_REC_BATCH_SIZE):
+            chunk = order[start:start + OCR_REC_BATCH_SIZE]
+            probs = self._run_recognizer(
+                self._prepare_rec_batch([crops[i] for i in chunk]))
+            for i, p in zip(chunk, probs):
+                raw[i] = self._ctc_decode(p)
+        return raw
+
+    @staticmethod
+    def _unfold_two_line(crop: np.ndarray) -> np.ndarray:
+        """
+        Двухстрочный номер (мотоциклы, тракторы, квадратные рамки)
+        разворачивается в одну строку: верхняя половина, затем нижняя.
+
+        Args:
+            crop (np.ndarray): BGR-изображение номера.
+
+        Returns:
+            np.ndarray: Однострочное изображение.
+        """
+        h = crop.shape[0]
+        if crop.shape[1] / h >= PLATE_TWO_LINE_ASPECT or h < 4:
+            return crop
+        return np.hstack([crop[:h // 2], crop[h - h // 2:]])
+
+    def recognize_batch(self, crops: List[np.ndarray]) -> List[Tuple[str, List[float]]]:
+        """
+        Пакетное распознавание номеров на уже вырезанных областях.
+
+        Этап детекции текста пропускается: все изображения масштабируются
+        и дополняются до общего размера и распознаются одним пакетом.
+
+        Args:
+            crops (list): BGR-изображения номерных знаков.
+
+        Returns:
+            list: Для каждого изображения (номер, уверенность каждого символа);
+                  пустая строка и пустой список, если номер не распознан.
+        """
+        results: List[Tuple[str, List[float]]] = [("", [])] * len(crops)
+
+        valid = []
+        for i, crop in enumerate(crops):
+            if crop is None or crop.size == 0 or min(crop.shape[:2]) < 2:
+                continue
+            if crop.ndim == 2:
+                crop = cv2.cvtColor(crop, cv2.COLOR_GRAY2BGR)
+            valid.append((i, self._unfold_two_line(crop)))
+
+        if not valid:
+            return results
+
+        raw = self._recognize_raw([crop for _, crop in valid])
+
+        for (i, _), alternatives in zip(valid, raw):
+            # Удаляем пробелы, дефисы и прочие разделители вместе с их уверенностью
+            alternatives = [options for options in alternatives
+                            if options and options[0][0].isalnum()]
+            if not alternatives:
+                continue
+
+            # Лучший номер по грамматике с учётом альтернатив каждого символа
+            reading = self.grammar.decode(alternatives)
+            if reading is not None:
+                results[i] = (reading.plate, reading.confidences)
+
+        return results
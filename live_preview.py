@@ -0,0 +1,178 @@
+"""
+Модуль live_preview.py
+
+Живой просмотр обработанного видео через веб-интерфейс (MJPEG).
+Кадры уменьшаются и кодируются в JPEG только пока подключён хотя бы один
+зритель; каждый зритель получает последний готовый кадр, поэтому
+медленные клиенты пропускают кадры и не тормозят конвейер.
+"""
+
+import time
+import asyncio
+import threading
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import PREVIEW_MAX_WIDTH, PREVIEW_JPEG_QUALITY, PREVIEW_MAX_FPS
+
+BOUNDARY = "frame"
+
+
+class PreviewHub:
+    """
+    Точка обмена кадрами между стадией вывода конвейера и веб-клиентами.
+    """
+
+    def __init__(self,
+                 max_width: int = PREVIEW_MAX_WIDTH,
+                 jpeg_quality: int = PREVIEW_JPEG_QUALITY,
+                 max_fps: float = PREVIEW_MAX_FPS):
+        """
+        Args:
+            max_width (int): Максимальная ширина кадра предпросмотра, px.
+            jpeg_quality (int): Качество JPEG (0–100).
+            max_fps (float): Максимальная частота кадров предпросмотра.
+        """
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+
+        self._lock = threading.Lock()
+        self._streams: List[str] = []
+        self._clients: Dict[str, int] = {}
+        # {метка потока: (номер кадра, JPEG)}
+        self._latest: Dict[str, Tuple[int, bytes]] = {}
+        self._last_publish: Dict[str, float] = {}
+
+        self.encoded = 0
+
+    def register_stream(self, label: str) -> None:
+        """
+        Объявляет поток, доступный для просмотра.
+
+        Args:
+            label (str): Метка источника.
+        """
+        with self._lock:
+            if label not in self._streams:
+                self._streams.append(label)
+
+    def streams(self) -> List[str]:
+        """Метки потоков, доступных для просмотра."""
+        with self._lock:
+            return list(self._streams)
+
+    def has_clients(self, label: str) -> bool:
+        """
+        Есть ли зрители у потока.
+
+        Args:
+            label (str): Метка источника.
+
+        Returns:
+            bool: True, если подключён хотя бы один клиент.
+        """
+        return self._clients.get(label, 0) > 0
+
+    def publish(self, label: str, frame: np.ndarray) -> None:
+        """
+        Передаёт обработанный кадр зрителям (без зрителей — ничего не делает).
+
+        Args:
+            label (str): Метка источника.
+            frame (np.ndarray): BGR-кадр с отрисовкой.
+        """
+        if not self.has_clients(label):
+            return
+
+        now = time.monotonic()
+        if now - self._last_publish.get(label, 0.0) < self.min_interval:
+            return
+        self._last_publish[label] = now
+
+        h, w = frame.shape[:2]
+        if w > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(h * self.max_width / w)),
+                               interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(
+            ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+
+        with self._lock:
+            seq = self._latest.get(label, (0, b""))[0] + 1
+            self._latest[label] = (seq, buffer.tobytes())
+            self.encoded += 1
+
+    def latest(self, label: str) -> Optional[Tuple[int, bytes]]:
+        """
+        Последний закодированный кадр потока.
+
+        Returns:
+            tuple | None: (номер кадра, JPEG).
+        """
+        with self._lock:
+            return self._latest.get(label)
+
+    def _connect(self, label: str) -> None:
+        with self._lock:
+            self._clients[label] = self._clients.get(label, 0) + 1
+
+    def _disconnect(self, label: str) -> None:
+        with self._lock:
+            self._clients[label] = max(self._clients.get(label, 0) - 1, 0)
+            if self._clients[label] == 0:
+                self._latest.pop(label, None)
+
+    async def mjpeg(self, label: str) -> AsyncIterator[bytes]:
+        """
+        Поток multipart/x-mixed-replace для одного клиента.
+
+        Клиент всегда получает самый свежий кадр; промежуточные кадры
+        пропускаются, если клиент не успевает их принять.
+
+        Args:
+            label (str): Метка источника.
+
+        Yields:
+            bytes: Части MJPEG-потока.
+        """
+        self._connect(label)
+        last_seq = 0
+        try:
+            while True:
+                item = self.latest(label)
+                if item is None or item[0] == last_seq:
+                    await asyncio.sleep(self.min_interval or 0.04)
+                    continue
+                last_seq, jpeg = item
+                yield (f"--{BOUNDARY}\r\n"
+                       f"Content-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(jpeg)}\r\n\r\n").encode() + jpeg + b"\r\n"
+        finally:
+            self._disconnect(label)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Статистика предпросмотра.
+
+        Returns:
+            dict: clients — зрителей по потокам, encoded — закодировано кадров.
+        """
+        with self._lock:
+            return {"clients": dict(self._clients), "encoded": self.encoded}
+
+
+_hub = PreviewHub()
+
+
+def get_preview_hub() -> PreviewHub:
+    """
+    Общая для процесса точка обмена кадрами предпросмотра.
+
+    Returns:
+        PreviewHub: Точка обмена кадрами.
+    """
+    return _hub
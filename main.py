@@ -1,24 +1,35 @@
 import cv2
+import numpy as np
 import time
-import pandas as pd
 import json
 import logging
-import torch
-from datetime import datetime
-from pathlib import Path
-from collections import defaultdict
-from ultralytics import YOLO
-from supervision import Detections, ByteTrack
-
-from logger import log_detection
+import threading
+from typing import List
+
 from log_config import setup_logging
-from video_writer import create_video_writer
+from video_recorder import SegmentedRecorder
+from clip_recorder import create_clip_recorder
+from camera_stream import create_capture_source
 from add_timestamp import add_timestamp
-from license_plate_recognizer import PlateRecognizer
-from plate_assignment import assign_plates_to_vehicles
+from model_runtime import ModelRuntime, get_model_runtime
+from stream_state import StreamState, parse_video_source
+from frame_processor import process_batch
+from motion_gate import create_motion_gate
+from track_propagator import create_track_propagator
+from stride_controller import create_stride_budget, create_stride_controller
 from save_recognized_plate import save_recognized_plate
-
-from config import VEHICLE_MODEL_PATH, PLATE_MODEL_PATH, TARGET_CLASSES, CONFIDENCE_THRESHOLD, PLATE_LOG_INTERVAL, PLATE_HOLD_TIME, SID_TTL
+from watchlist import get_watchlist_matcher
+from plate_store import get_plate_store
+from snapshot_saver import SnapshotSaver
+from overlay_renderer import OverlayRenderer, get_overlay_renderer
+from live_preview import get_preview_hub
+from pipeline import FrameQueue, BatchStageThread, CaptureThread, Pipeline
+from config_watcher import get_config_watcher
+from metrics import get_registry, STAGE_SECONDS, FRAME_LATENCY_SECONDS, FRAMES_CAPTURED, \
+    CAPTURE_RECONNECTS, QUEUE_DEPTH, QUEUE_DROPPED, QUEUE_PUT, SNAPSHOTS, PLATE_STORE_ROWS, \
+    FRAME_STRIDE, STARTUP_SECONDS
+
+from config import CAPTURE_QUEUE_SIZE, RESULT_QUEUE_SIZE, QUEUE_STATS_INTERVAL
 
 # ---------------- CONFIG ----------------
 with open("config.json", "r", encoding="utf-8") as f:
@@ -29,18 +40,35 @@ recording_interval_minutes = max(
     int(cfg.get("recording_interval_minutes", 60)), 1)
 recording_interval_seconds = recording_interval_minutes * 60
 frame_skip = cfg.get("frame_skip", 5)
-device = "cuda" if torch.cuda.is_available() else "cpu"
-video_source = cfg.get("video_source", "0")
-video_source = 0 if video_source == "0" else video_source
-source_label = "webcam" if str(video_source) == "0" else "ipcam" if str(
-    video_source).startswith("rtsp") else Path(str(video_source)).stem
-
-stable_boxes = {}
-sid_last_seen = {}
-plate_by_sid = defaultdict(lambda: "")
-plate_to_sid = {}
-sid_last_plate_time = defaultdict(lambda: 0)
-plate_last_log = defaultdict(lambda: 0)  # {plate_number: timestamp}
+# Без окна OpenCV (серверы без дисплея); просмотр — через веб-интерфейс
+headless = cfg.get("headless", False)
+web_server = cfg.get("web_server", False)
+web_port = int(cfg.get("web_port", 8000))
+# Фильтр движения перед детекторами: {"enabled", "method", "masks"}
+motion_gate_settings = cfg.get("motion_gate")
+# Адаптивный шаг обработки живых источников: {"enabled", "target_latency", "cpu_budget", ...}
+adaptive_stride_settings = cfg.get("adaptive_stride")
+# Отрисовка треков на пропущенных кадрах: {"enabled", "method": "flow" | "motion", "width", "max_age"}
+track_overlay_settings = cfg.get("track_overlay")
+# Клипы по событиям вместо (или вместе с) непрерывной записью: {"enabled", "pre_seconds", "post_seconds"}
+event_clips_settings = cfg.get("event_clips")
+# Проверка номеров по спискам: {"enabled", "lists": {имя: путь}, "max_edits", "max_cost"}
+watchlist_settings = cfg.get("watchlists")
+# Захват кадров: {"backend": "opencv" | "pyav", "low_latency", "rtsp_transport", "decode_threads"}
+capture_settings = cfg.get("capture")
+# Бэкенд YOLO: {"backend": "torch" | "onnx" | "openvino", "imgsz", "dynamic", "int8"}
+detector_backend_settings = cfg.get("detector_backend")
+# "frame" — детекция номеров по всему кадру; "roi" — внутри bbox'ов ТС
+plate_detection_mode = cfg.get("plate_detection_mode", "frame")
+
+# Многокамерный режим: список источников; иначе — единственный video_source
+video_sources = cfg.get("video_sources") or [cfg.get("video_source", "0")]
+
+WINDOW_NAME = "License Plate Recognition System RUS"
+
+# Ключи config.json, которые требуют перезапуска приложения (остальные
+# применяются на лету или перезапуском потоков без выгрузки моделей)
+RESTART_KEYS = {"headless", "web_server", "web_port", "detector_backend"}
 
 
 setup_logging()
@@ -48,177 +76,420 @@ logger = logging.getLogger(__name__)
 logger.info("🚀 Приложение запущено")
 
 
-def main():
-    cap = cv2.VideoCapture(video_source)
-    vehicle_model = YOLO(VEHICLE_MODEL_PATH)
-    plate_model = YOLO(PLATE_MODEL_PATH)
-    plate_reader = PlateRecognizer()
-    tracker = ByteTrack()
-
-    cv2.namedWindow("License Plate Recognition System RUS",
-                    cv2.WND_PROP_FULLSCREEN)
-    cv2.setWindowProperty("License Plate Recognition System RUS",
-                          cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
-
-    logging.info("Система запущена")
-
-    if not cap.isOpened():
-        logging.warning("❌ Не удалось открыть источник видео")
-        exit()
+def apply_config(new_cfg: dict, changed: set) -> bool:
+    """
+    Применяет изменённый config.json к настройкам модуля.
+
+    Args:
+        new_cfg (dict): Новый конфиг.
+        changed (set): Изменившиеся ключи верхнего уровня.
+
+    Returns:
+        bool: True, если изменились источники, захват, адаптивный шаг или отрисовка
+              треков на пропущенных кадрах и потоки
+              конвейера нужно пересоздать (модели остаются загруженными).
+    """
+    global cfg, save_video, recording_interval_seconds, frame_skip, motion_gate_settings, \
+        adaptive_stride_settings, event_clips_settings, plate_detection_mode, video_sources, \
+        capture_settings, watchlist_settings, track_overlay_settings
+
+    cfg = new_cfg
+    if "log_level" in changed:
+        level = str(new_cfg.get("log_level", "INFO")).upper()
+        logging.getLogger().setLevel(getattr(logging, level, logging.INFO))
+        logger.info(f"📝 Уровень логирования: {level}")
+
+    save_video = new_cfg.get("save_video", False)
+    recording_interval_seconds = max(
+        int(new_cfg.get("recording_interval_minutes", 60)), 1) * 60
+    frame_skip = new_cfg.get("frame_skip", 5)
+    motion_gate_settings = new_cfg.get("motion_gate")
+    adaptive_stride_settings = new_cfg.get("adaptive_stride")
+    capture_settings = new_cfg.get("capture")
+    track_overlay_settings = new_cfg.get("track_overlay")
+    event_clips_settings = new_cfg.get("event_clips")
+    plate_detection_mode = new_cfg.get("plate_detection_mode", "frame")
+    watchlist_settings = new_cfg.get("watchlists")
+    if "watchlists" in changed:
+        # Списки перестраиваются в фоне, проверки продолжаются по прежнему индексу
+        get_watchlist_matcher().configure(watchlist_settings)
+
+    new_sources = new_cfg.get("video_sources") or [new_cfg.get("video_source", "0")]
+    reload_streams = new_sources != video_sources or bool(
+        changed & {"adaptive_stride", "capture", "track_overlay"})
+    video_sources = new_sources
+
+    ignored = changed & RESTART_KEYS
+    if ignored:
+        logger.warning(
+            f"⚠️ Настройки {', '.join(sorted(ignored))} вступят в силу после перезапуска приложения")
+    return reload_streams
+
+
+def create_streams(sources: list, runtime: ModelRuntime) -> List[StreamState]:
+    """
+    Создаёт состояние для каждого источника видео.
+
+    Args:
+        sources (list): Значения источников из config.json.
+        runtime (ModelRuntime): Общие модели (проверка формата номеров).
+
+    Returns:
+        list: Объекты StreamState с уникальными метками.
+    """
+    streams = []
+    used_labels = set()
+    for value in sources:
+        source, label, is_file = parse_video_source(value)
+        unique_label, n = label, 1
+        while unique_label in used_labels:
+            n += 1
+            unique_label = f"{label}{n}"
+        used_labels.add(unique_label)
+        streams.append(StreamState(
+            source, unique_label, is_file,
+            plate_validator=runtime.plate_reader.is_license_plate,
+            motion_gate=create_motion_gate(motion_gate_settings, unique_label),
+            propagator=create_track_propagator(track_overlay_settings)))
+    return streams
+
+
+def render_frame(packet: dict, overlay: OverlayRenderer, snapshot_saver: SnapshotSaver) -> np.ndarray:
+    """
+    Стадия вывода: отрисовка результатов, сохранение номеров и снимков.
+
+    Args:
+        packet (dict): Пакет от стадии инференса.
+        overlay (OverlayRenderer): Отрисовка номеров кириллицей.
+        snapshot_saver (SnapshotSaver): Асинхронное сохранение снимков.
+
+    Returns:
+        np.ndarray: Кадр с отрисованными результатами.
+    """
+    frame = packet["frame"]
+    stream: StreamState = packet["stream"]
+
+    # В журнал и проверку по спискам — только зафиксированные номера:
+    # отдельное прочтение до фиксации может быть ошибочным
+    watchlist = get_watchlist_matcher()
+    for locked_sid, plate_text in packet["locked"].items():
+        save_recognized_plate(plate_text, locked_sid, stream.source)
+        watchlist.check(plate_text, stream.label, locked_sid, packet["timestamp"])
+    watchlist.forget(stream.label, packet["expired"])
+
+    for sid, (vx1, vy1, vx2, vy2), _ in packet["labels"]:
+        cv2.rectangle(frame, (vx1, vy1), (vx2, vy2), (255, 0, 255), 2)
+        cv2.putText(frame, f"SID {sid}", (vx1, vy1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
+
+    # Номера — готовыми спрайтами из кэша за один проход
+    overlay.draw_labels(frame, [(last_plate, (vx2 - 140, vy2 - 40))
+                                for _, (_, _, vx2, vy2), last_plate in packet["labels"]])
+
+    if packet.get("predicted"):
+        # Боксы перенесены без детекторов: снимки берутся с обработанных кадров
+        return frame
+
+    # Снимки — после завершения отрисовки: кадр больше не изменяется
+    for sid, _, last_plate in packet["labels"]:
+        snapshot_saver.submit(
+            frame, stream.label, sid, last_plate,
+            SnapshotSaver.plate_score(last_plate, sid in packet["locked"]))
+    snapshot_saver.forget(stream.label, packet["expired"])
+
+    return frame
+
+
+def collect_pipeline_metrics(pipeline: Pipeline, capture_threads: List[CaptureThread],
+                             snapshot_saver: SnapshotSaver, stride_budget=None) -> None:
+    """
+    Переносит счётчики конвейера в метрики (вызывается при запросе /metrics).
+
+    Args:
+        pipeline (Pipeline): Текущий конвейер.
+        capture_threads (list): Потоки захвата.
+        snapshot_saver (SnapshotSaver): Сохранение снимков.
+        stride_budget (StrideBudget | None): Адаптивный шаг кадров.
+    """
+    for name, stats in pipeline.queue_stats().items():
+        QUEUE_DEPTH.labels(name).set(stats["depth"])
+        QUEUE_DROPPED.labels(name).set(stats["dropped"])
+        QUEUE_PUT.labels(name).set(stats["put"])
+    for t in capture_threads:
+        FRAMES_CAPTURED.labels(t.stream.label).set(t.frame_count)
+        CAPTURE_RECONNECTS.labels(t.stream.label).set(t.reconnects)
+    for result, value in snapshot_saver.stats().items():
+        SNAPSHOTS.labels(result).set(value)
+    for result, value in get_plate_store().stats().items():
+        PLATE_STORE_ROWS.labels(result).set(value)
+    if stride_budget is not None:
+        for label, stats in stride_budget.stats().items():
+            FRAME_STRIDE.labels(label).set(stats["stride"])
 
-    logger.info(f"📡 Источник: {video_source}")
-    logger.info(f"🧠 Устройство: {device.upper()}")
 
-    is_file_source = isinstance(
-        video_source, str) and video_source.lower().endswith((".avi", ".mp4", ".mkv"))
+def main():
+    # Модели загружаются один раз на процесс: после обрыва потока или ошибки
+    # пересоздаются только захват и трекеры
+    runtime = get_model_runtime(detector_backend_settings, warmup_batch=len(video_sources))
+    while run_streams(runtime):
+        logger.info("♻️ Источники изменены: перезапуск потоков без выгрузки моделей")
+
+
+def run_streams(runtime: ModelRuntime) -> bool:
+    """
+    Обрабатывает текущие источники до остановки или смены источников.
+
+    Args:
+        runtime (ModelRuntime): Загруженные модели (переиспользуются между запусками).
+
+    Returns:
+        bool: True, если в config.json изменились источники и потоки нужно
+              пересоздать с теми же моделями.
+    """
+    streams = create_streams(video_sources, runtime)
+
+    captures = {}
+    for stream in streams:
+        capture = create_capture_source(stream.source, stream.is_file_source, capture_settings)
+        captures[stream.label] = capture
+        if capture.open():
+            continue
+        logging.warning(
+            f"❌ Не удалось открыть источник видео: {stream.source}")
+        if stream.is_file_source:
+            for c in captures.values():
+                c.release()
+            exit()
+        # Камера недоступна: подключение продолжается в фоне
+        logger.info(f"⏳ Ожидание подключения к {stream.source}")
+
+    preview_hub = get_preview_hub()
+    for stream in streams:
+        preview_hub.register_stream(stream.label)
+
+    # Одна камера — полноэкранное окно; несколько — окно на каждый поток
+    window_names = {}
+    for stream in streams:
+        name = WINDOW_NAME if len(streams) == 1 else f"{WINDOW_NAME} [{stream.label}]"
+        window_names[stream.label] = name
+        if not headless:
+            cv2.namedWindow(name, cv2.WND_PROP_FULLSCREEN if len(
+                streams) == 1 else cv2.WINDOW_NORMAL)
+    if len(streams) == 1 and not headless:
+        cv2.setWindowProperty(WINDOW_NAME,
+                              cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
 
-    current_time = time.time()
-    timestamp = int(time.time())
-    log_ts = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
+    logging.info("Система запущена")
 
-    # Инициализация записи видео
-    if save_video:
-        ret, frame = cap.read()
-        if not ret:
-            logging.error("❌ Не удалось получить первый кадр")
+    for stream in streams:
+        logger.info(f"📡 Источник: {stream.source}")
+    logger.info(f"🧠 Устройство: {runtime.device.upper()}, "
+                f"бэкенд YOLO: {runtime.vehicle_model.backend}")
+
+    # Пропущенные кадры идут через конвейер только для отрисовки треков
+    propagate = any(stream.propagator is not None for stream in streams)
+
+    # Живой источник: выбрасываем устаревшие кадры (сначала — без инференса);
+    # файл: ждём инференс
+    stop_event = threading.Event()
+    capture_queues = [
+        FrameQueue(f"capture:{stream.label}", CAPTURE_QUEUE_SIZE,
+                   drop_oldest=not stream.is_file_source,
+                   droppable=lambda packet: packet["predicted"])
+        for stream in streams]
+    result_queue = FrameQueue("result", RESULT_QUEUE_SIZE * len(streams))
+
+    # Видеофайлы обрабатываются со статическим frame_skip: для них важна
+    # пропускная способность, а не задержка
+    stride_budget = create_stride_budget(adaptive_stride_settings)
+    capture_threads = [
+        CaptureThread(captures[stream.label], q, stop_event, stream.is_file_source, frame_skip,
+                      prepare=add_timestamp, stream=stream,
+                      stride_controller=None if stream.is_file_source else
+                      create_stride_controller(adaptive_stride_settings, stride_budget, stream.label),
+                      propagate=propagate, name=f"capture:{stream.label}")
+        for stream, q in zip(streams, capture_queues)]
+
+    def infer(packets: List[dict]) -> List[dict]:
+        started = time.perf_counter()
+        process_batch(packets, runtime, plate_detection_mode)
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels("inference_batch").observe(elapsed)
+        if stride_budget is not None:
+            # Шаг подбирается по кадрам, прошедшим детекторы
+            stride_budget.observe_batch(
+                [p for p in packets if not p.get("predicted")], elapsed)
+        return packets
+
+    pipeline = Pipeline(
+        threads=capture_threads + [
+            BatchStageThread("inference", infer,
+                             capture_queues, result_queue, stop_event),
+        ],
+        queues=capture_queues + [result_queue],
+        stop_event=stop_event)
+    pipeline.start()
+    started = time.perf_counter()
+    first_frame = True
+
+    snapshot_saver = SnapshotSaver()
+    overlay = get_overlay_renderer()
+    get_registry().set_collector("pipeline", lambda: collect_pipeline_metrics(
+        pipeline, capture_threads, snapshot_saver, stride_budget))
+    recorders = {}
+    clip_recorder = create_clip_recorder(event_clips_settings)
+    # Потоки, сохраняющие клипы прежнего рекордера после смены раздела event_clips
+    clip_closers: List[threading.Thread] = []
+    capture_by_label = {t.stream.label: t for t in capture_threads}
+    last_stats_time = time.time()
+
+    reload_streams = threading.Event()
+    reload_clips = threading.Event()
+
+    def on_config_change(new_cfg: dict, changed: set) -> None:
+        # Вызывается потоком отслеживания config.json
+        if apply_config(new_cfg, changed):
+            reload_streams.set()
             return
-
-        video_writer = create_video_writer(frame.shape, source_label)
-        start_record_time = current_time
-
-    frame_count = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            if is_file_source:
-                logger.info("✅ Обработка файла завершена.")
-                break  # Завершаем цикл для файлов
-            else:
-                logger.warning("🔁 Повторное подключение к потоку...")
-                time.sleep(1)
-                cap.release()
-                cap = cv2.VideoCapture(video_source)
+        for t in capture_threads:
+            t.frame_skip = max(int(frame_skip), 1)
+        if "event_clips" in changed:
+            reload_clips.set()
+        if "motion_gate" in changed:
+            for s in streams:
+                s.motion_gate = create_motion_gate(motion_gate_settings, s.label)
+        for recorder in list(recorders.values()):
+            recorder.segment_seconds = recording_interval_seconds
+
+    get_config_watcher().subscribe("pipeline", on_config_change)
+
+    try:
+        while not reload_streams.is_set():
+            packet = result_queue.get(timeout=0.5)
+            if packet is None:
+                pipeline.raise_if_failed()
+                if result_queue.closed:
+                    break
                 continue
 
-        # Добавление даты и времени
-        frame = add_timestamp(frame)
-
-        frame_count += 1
-        if frame_count % frame_skip != 0:
-            continue
-
-        vehicle_results = vehicle_model(frame, device=device)[0]
-        mask = [int(c) in TARGET_CLASSES for c in vehicle_results.boxes.cls]
-        detections = Detections(
-            xyxy=vehicle_results.boxes.xyxy.cpu().numpy()[mask],
-            confidence=vehicle_results.boxes.conf.cpu().numpy()[mask],
-            class_id=vehicle_results.boxes.cls.cpu().numpy()[mask].astype(int))
-
-        tracks = tracker.update_with_detections(detections)
-
-        # Детекция номеров по всему кадру
-        plate_results = plate_model(frame, device=device)[0]
-        plate_boxes = plate_results.boxes.xyxy.cpu().numpy()
-        plate_crops = [frame[int(b[1]):int(b[3]), int(b[0]):int(b[2])]
-                       for b in plate_boxes]
-        plate_texts = [plate_reader.recognize(crop) for crop in plate_crops]
-
-        plate_assignments = assign_plates_to_vehicles(
-            plate_boxes, plate_texts, tracks)
-
-        for track in tracks:
-            bbox, conf, sid = track[0], track[2], int(track[4])
-
-            if conf < CONFIDENCE_THRESHOLD:
+            if first_frame:
+                first_frame = False
+                elapsed = time.perf_counter() - started
+                STARTUP_SECONDS.labels("first_frame").set(elapsed)
+                logger.info(f"⏱ Первый кадр обработан через {elapsed:.1f} с после запуска потоков")
+
+            stream: StreamState = packet["stream"]
+            with STAGE_SECONDS.labels("render").time():
+                frame = render_frame(packet, overlay, snapshot_saver)
+            current_time = packet["timestamp"]
+
+            if save_video:
+                recorder = recorders.get(stream.label)
+                if recorder is None:
+                    # Файл: частота исходного видео с учётом frame_skip (все кадры
+                    # при отрисовке треков); живой источник: измеряется по времени захвата
+                    source_fps = capture_by_label[stream.label].source_fps
+                    recorder = SegmentedRecorder(
+                        stream.label, recording_interval_seconds,
+                        fps=source_fps / (1 if propagate else max(int(frame_skip), 1))
+                        if stream.is_file_source and source_fps > 0 else None,
+                        pace=not stream.is_file_source)
+                    recorders[stream.label] = recorder
+
+                # Запись и смена сегментов — в потоке записи
+                with STAGE_SECONDS.labels("video_write").time():
+                    recorder.write(frame, current_time)
+            elif recorders:
+                # Запись выключена в настройках: закрываем текущие сегменты
+                for recorder in recorders.values():
+                    recorder.close()
+                recorders.clear()
+
+            if reload_clips.is_set():
+                # Изменён раздел event_clips: незавершённые клипы прежнего рекордера
+                # сохраняются в фоне, отрисовка не ждёт кодирования и записи
+                reload_clips.clear()
+                if clip_recorder is not None:
+                    closer = threading.Thread(target=clip_recorder.close, name="clip-close", daemon=True)
+                    closer.start()
+                    clip_closers.append(closer)
+                clip_recorder = create_clip_recorder(event_clips_settings)
+
+            if clip_recorder is not None:
+                clip_recorder.submit(frame, stream.label, current_time, packet["locked"])
+                clip_recorder.forget(stream.label, packet["expired"])
+
+            FRAME_LATENCY_SECONDS.labels(stream.label).observe(time.time() - current_time)
+
+            if current_time - last_stats_time >= QUEUE_STATS_INTERVAL:
+                last_stats_time = current_time
+                logger.debug(f"📊 Очереди конвейера: {pipeline.queue_stats()}")
+                for s in streams:
+                    logger.debug(
+                        f"🔤 OCR [{s.label}]: {s.consensus.stats()}")
+                    if s.motion_gate is not None:
+                        logger.debug(
+                            f"🌙 Фильтр движения [{s.label}]: {s.motion_gate.stats()}")
+                    if s.propagator is not None:
+                        logger.debug(
+                            f"🎯 Перенос треков [{s.label}]: {s.propagator.stats()}")
+                logger.debug(f"🖼 Снимки: {snapshot_saver.stats()}")
+                if clip_recorder is not None:
+                    logger.debug(f"🎬 Клипы: {clip_recorder.stats()}")
+                for label, recorder in recorders.items():
+                    logger.debug(f"🎞 Запись [{label}]: {recorder.stats()}")
+                if stride_budget is not None:
+                    logger.debug(f"⏩ Шаг кадров: {stride_budget.stats()}")
+
+            # Кодируется только при подключённых зрителях
+            preview_hub.publish(stream.label, frame)
+
+            if headless:
                 continue
-                
-            vx1, vy1, vx2, vy2 = map(int, bbox.tolist())
-
-            stable_boxes[sid] = bbox
-            sid_last_seen[sid] = current_time
-
-            plate_text = ""
-
-            for assigned_sid, plate_text in plate_assignments.items():
-                # Сохраняем распознанные номера в Excel
-                save_recognized_plate(plate_text, assigned_sid, video_source)
-                if plate_text:
-                    last_plate = plate_by_sid.get(assigned_sid)
-                    if plate_text != last_plate:
-                        plate_by_sid[assigned_sid] = plate_text
-                        sid_last_plate_time[assigned_sid] = current_time
-                        last_time = plate_last_log.get(plate_text, 0)
-                        if timestamp - last_time >= PLATE_LOG_INTERVAL:
-                            # обновить время записи
-                            plate_last_log[plate_text] = timestamp
-
-                elif assigned_sid in plate_by_sid:
-                    # проверка: если номер старый, и SID не менялся долго → сохранить
-                    if current_time - sid_last_plate_time.get(assigned_sid, 0) <= PLATE_HOLD_TIME:
-                        continue  # удерживаем прежний номер
-                    else:
-                        plate_by_sid.pop(assigned_sid, None)
-
-                else:
-                    plate_text = ""
-                    plate_by_sid[assigned_sid] = plate_text
-
-            last_plate = plate_by_sid.get(sid, "")
-            if last_plate:
-                frame = plate_reader.draw_text_cyrillic(
-                    frame, last_plate, (vx2 - 140, vy2 - 40))
-
-            cv2.rectangle(frame, (vx1, vy1), (vx2, vy2), (255, 0, 255), 2)
-            cv2.putText(frame, f"SID {sid}", (vx1, vy1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 255), 2)
-
-            log_detection(frame, last_plate)
-       
-        if save_video:
-            # Запись обработанного кадра
-            video_writer.write(frame)
-
-            # Перезапуск записи по времени
-            if current_time - start_record_time > recording_interval_seconds:
-                video_writer.release()
-                video_writer = create_video_writer(frame.shape, source_label)
-                start_record_time = time.time()
-
-        # Удаление устаревших SID
-        expired_sids = [sid for sid, last_seen in sid_last_seen.items()
-                        if current_time - last_seen > SID_TTL]
-        for sid in expired_sids:
-            stable_boxes.pop(sid, None)
-            sid_last_seen.pop(sid, None)
-            if sid in plate_by_sid:
-                old_plate = plate_by_sid[sid]
-                if old_plate in plate_to_sid:
-                    del plate_to_sid[old_plate]
-                del plate_by_sid[sid]
-
-        cv2.imshow("License Plate Recognition System RUS", frame)
-
-        key = cv2.waitKey(1) & 0xFF
-        if key in [ord('q'), 27]:  # Остановка по клавишам "q" или "Esc"
-            logger.info("🛠 Принудительная остановка пользователем")
-            break
 
-    cap.release()
-    video_writer.release()
-    cv2.destroyAllWindows()
-    logger.info("🛑 Захват остановлен. Окна закрыты")
+            cv2.imshow(window_names[stream.label], frame)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key in [ord('q'), 27]:  # Остановка по клавишам "q" или "Esc"
+                logger.info("🛠 Принудительная остановка пользователем")
+                break
+    finally:
+        get_config_watcher().subscribe("pipeline", None)
+        get_registry().set_collector("pipeline", None)
+        pipeline.stop()
+        for recorder in recorders.values():
+            recorder.close()
+        if clip_recorder is not None:
+            clip_recorder.close()
+        for closer in clip_closers:
+            closer.join()
+        get_plate_store().flush()
+        snapshot_saver.close()
+        if not headless:
+            cv2.destroyAllWindows()
+        logger.info("🛑 Захват остановлен. Окна закрыты")
+
+    pipeline.raise_if_failed()
+    return reload_streams.is_set()
 
 
 if __name__ == "__main__":
 
-    is_file_source = isinstance(
-        video_source, str) and video_source.lower().endswith((".avi", ".mp4", ".mkv"))
+    # Изменения config.json (в том числе из веб-интерфейса) применяются без перезапуска
+    get_config_watcher().start()
+    get_watchlist_matcher().configure(watchlist_settings)
+
+    if web_server:
+        # Веб-интерфейс в процессе конвейера: настройки и живой просмотр
+        from web_interface import start_in_background
+        start_in_background(port=web_port)
+        logger.info(f"🌐 Веб-интерфейс: http://localhost:{web_port}/preview")
 
     while True:
         try:
             main()
-            if is_file_source:
+            # Источники могли измениться во время работы
+            if all(parse_video_source(value)[2] for value in video_sources):
 
                 logger.info("✅ Обработка видеофайла завершена")
                 break
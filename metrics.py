@@ -0,0 +1,296 @@
+"""
+Модуль metrics.py
+
+Лёгкие метрики конвейера в текстовом формате Prometheus (без внешних
+зависимостей): счётчики, показатели и гистограммы с метками.
+Горячий путь только увеличивает числа под коротким замком; состояние
+очередей, потоков захвата и фоновых писателей снимается при запросе
+/metrics функциями-сборщиками.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Границы гистограмм длительностей, сек
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Value:
+    """Значение счётчика или показателя для одного набора меток."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = float(value)
+
+
+class _HistogramValue:
+    """Гистограмма для одного набора меток."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Измеряет длительность блока with."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Metric:
+    """
+    Семейство метрик одного имени (counter, gauge или histogram) с метками.
+    """
+
+    def __init__(self, name: str, help_text: str, kind: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Args:
+            name (str): Имя метрики (lpr_...).
+            help_text (str): Описание для # HELP.
+            kind (str): "counter", "gauge" или "histogram".
+            labelnames (Sequence): Имена меток.
+            buckets (Sequence): Границы гистограммы.
+        """
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """
+        Значение для набора меток (создаётся при первом обращении).
+
+        Returns:
+            _Value | _HistogramValue: Объект с inc()/set() или observe()/time().
+        """
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = _HistogramValue(self.buckets) if self.kind == "histogram" else _Value()
+                    self._children[key] = child
+        return child
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Увеличивает метрику без меток."""
+        self.labels().inc(amount)
+
+    def set(self, value: float) -> None:
+        """Устанавливает метрику без меток."""
+        self.labels().set(value)
+
+    def observe(self, value: float) -> None:
+        """Добавляет наблюдение в гистограмму без меток."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Измеряет длительность блока with (гистограмма без меток)."""
+        return self.labels().time()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            if self.kind != "histogram":
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} "
+                             f"{_format_value(child.value)}")
+                continue
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(child.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} "
+                         f"{_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} "
+                         f"{cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик процесса и функций-сборщиков, вызываемых перед выдачей.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: Dict[str, Callable[[], None]] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._add(Metric(name, help_text, "counter", labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Metric:
+        return self._add(Metric(name, help_text, "gauge", labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Metric:
+        return self._add(Metric(name, help_text, "histogram", labelnames, buckets))
+
+    def set_collector(self, key: str, func: Optional[Callable[[], None]]) -> None:
+        """
+        Регистрирует (или заменяет, или удаляет при func=None) сборщик,
+        обновляющий показатели перед выдачей метрик.
+
+        Args:
+            key (str): Имя сборщика (повторная регистрация заменяет прежний,
+                       например при перезапуске конвейера).
+            func (Callable | None): Функция без аргументов.
+        """
+        with self._lock:
+            if func is None:
+                self._collectors.pop(key, None)
+            else:
+                self._collectors[key] = func
+
+    def render(self) -> str:
+        """
+        Метрики в текстовом формате Prometheus.
+
+        Returns:
+            str: Тело ответа /metrics.
+        """
+        with self._lock:
+            collectors = list(self._collectors.values())
+            metrics = list(self._metrics.values())
+        for collect in collectors:
+            try:
+                collect()
+            except Exception:
+                # Ошибка сборщика не должна ломать выдачу остальных метрик
+                COLLECTOR_ERRORS.inc()
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ---------------- Горячий путь ----------------
+STAGE_SECONDS = REGISTRY.histogram(
+    "lpr_stage_seconds", "Длительность стадии обработки", ["stage"])
+FRAME_LATENCY_SECONDS = REGISTRY.histogram(
+    "lpr_frame_latency_seconds", "Задержка от захвата кадра до вывода", ["stream"])
+FRAMES_PROCESSED = REGISTRY.counter(
+    "lpr_frames_processed_total", "Кадров прошло инференс", ["stream"])
+FRAMES_GATED = REGISTRY.counter(
+    "lpr_frames_gated_total", "Кадров без движения (детекторы не запускались)", ["stream"])
+FRAMES_PREDICTED = REGISTRY.counter(
+    "lpr_frames_predicted_total", "Кадров с перенесёнными боксами треков (без инференса)", ["stream"])
+OCR_CROPS = REGISTRY.counter(
+    "lpr_ocr_crops_total", "Номеров отправлено в OCR")
+OCR_BATCHES = REGISTRY.counter(
+    "lpr_ocr_batches_total", "Пакетных вызовов OCR")
+PLATES_ASSIGNED = REGISTRY.counter(
+    "lpr_plates_assigned_total", "Номеров привязано к трекам", ["stream"])
+
+WATCHLIST_MATCH_SECONDS = REGISTRY.histogram(
+    "lpr_watchlist_match_seconds", "Проверка номера по спискам",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01))
+WATCHLIST_ALERTS = REGISTRY.counter(
+    "lpr_watchlist_alerts_total", "Срабатываний проверки по спискам", ["list"])
+WATCHLIST_ENTRIES = REGISTRY.gauge(
+    "lpr_watchlist_entries", "Записей в списке номеров", ["list"])
+
+# ---------------- Фоновые писатели ----------------
+SNAPSHOT_WRITE_SECONDS = REGISTRY.histogram(
+    "lpr_snapshot_write_seconds", "Кодирование и запись снимка")
+PLATE_STORE_WRITE_SECONDS = REGISTRY.histogram(
+    "lpr_plate_store_write_seconds", "Запись пакета в журнал SQLite")
+CLIPS_WRITTEN = REGISTRY.counter(
+    "lpr_clips_total", "Сохранено клипов по событиям", ["stream"])
+EXCEL_EXPORT_SECONDS = REGISTRY.histogram(
+    "lpr_excel_export_seconds", "Выгрузка журнала в Excel",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+# ---------------- Запуск ----------------
+STARTUP_SECONDS = REGISTRY.gauge(
+    "lpr_startup_seconds", "Загрузка и прогрев моделей, время до первого кадра", ["phase"])
+
+# ---------------- Снимаются сборщиками ----------------
+FRAMES_CAPTURED = REGISTRY.counter(
+    "lpr_frames_captured_total", "Кадров прочитано из источника", ["stream"])
+CAPTURE_RECONNECTS = REGISTRY.counter(
+    "lpr_capture_reconnects_total", "Переподключений к источнику", ["stream"])
+QUEUE_DEPTH = REGISTRY.gauge(
+    "lpr_queue_depth", "Текущая глубина очереди конвейера", ["queue"])
+QUEUE_DROPPED = REGISTRY.counter(
+    "lpr_queue_dropped_total", "Кадров выброшено при переполнении очереди", ["queue"])
+QUEUE_PUT = REGISTRY.counter(
+    "lpr_queue_put_total", "Элементов помещено в очередь", ["queue"])
+SNAPSHOTS = REGISTRY.counter(
+    "lpr_snapshots_total", "Снимки по исходу", ["result"])
+PLATE_STORE_ROWS = REGISTRY.counter(
+    "lpr_plate_store_rows_total", "Записи журнала номеров по исходу", ["result"])
+FRAME_STRIDE = REGISTRY.gauge(
+    "lpr_frame_stride", "Текущий шаг обработки кадров", ["stream"])
+COLLECTOR_ERRORS = REGISTRY.counter(
+    "lpr_metrics_collector_errors_total", "Ошибок сборщиков метрик")
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Общий для процесса реестр метрик.
+
+    Returns:
+        MetricsRegistry: Реестр метрик.
+    """
+    return REGISTRY
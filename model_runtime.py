@@ -0,0 +1,203 @@
+"""
+Модуль model_runtime.py
+
+Общий набор моделей (YOLO для ТС, YOLO для номеров, PaddleOCR),
+загружаемый один раз на процесс и используемый всеми видеопотоками.
+Модели переживают перезапуски потоков и переподключения к камерам:
+заново создаются только захват и трекеры.
+"""
+
+import time
+import logging
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+from supervision import Detections
+
+from license_plate_recognizer import PlateRecognizer
+from detector_backend import create_detector
+from config import VEHICLE_MODEL_PATH, PLATE_MODEL_PATH, TARGET_CLASSES
+from config import PLATE_ROI_IMGSZ, PLATE_ROI_MARGIN, RUNTIME_WARMUP_SHAPE
+from metrics import STARTUP_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRuntime:
+    """
+    Единственная копия моделей с пакетным инференсом по кадрам
+    нескольких потоков.
+    """
+
+    def __init__(self, device: str | None = None, backend_settings: dict | None = None):
+        """
+        Args:
+            device (str | None): "cuda" или "cpu"; по умолчанию выбирается автоматически.
+            backend_settings (dict | None): Раздел "detector_backend" config.json
+                (PyTorch, ONNX Runtime или OpenVINO для моделей YOLO).
+        """
+        started = time.perf_counter()
+        self.device = device or (
+            "cuda" if torch.cuda.is_available() else "cpu")
+        self.vehicle_model = create_detector(VEHICLE_MODEL_PATH, backend_settings)
+        # Режим "roi" вызывает детектор номеров с уменьшенным входом: для
+        # статического экспорта нужна отдельная модель этого размера
+        self.plate_model = create_detector(PLATE_MODEL_PATH, backend_settings,
+                                           extra_imgsz=(PLATE_ROI_IMGSZ,))
+        self.plate_reader = PlateRecognizer()
+
+        self.load_seconds = time.perf_counter() - started
+        self.warmup_seconds = 0.0
+        STARTUP_SECONDS.labels("load").set(self.load_seconds)
+        logger.info(f"🧠 Модели загружены за {self.load_seconds:.1f} с")
+
+    def warmup(self, batch_size: int = 1,
+               frame_shape: Tuple[int, int, int] = RUNTIME_WARMUP_SHAPE) -> float:
+        """
+        Пробный прогон всех моделей на пустых кадрах: инициализация CUDA,
+        ONNX Runtime / OpenVINO и PaddleOCR выполняется до первого кадра
+        с камеры, а не во время обработки.
+
+        Args:
+            batch_size (int): Число кадров в пакете (по числу потоков).
+            frame_shape (tuple): Размер пустого кадра (H, W, C).
+
+        Returns:
+            float: Длительность прогрева, сек.
+        """
+        started = time.perf_counter()
+        h, w = frame_shape[:2]
+        frames = [np.zeros(frame_shape, dtype=np.uint8)] * max(int(batch_size), 1)
+        self.detect_vehicles(frames)
+        self.detect_plates(frames)
+        self.detect_plates_in_vehicles(
+            frames, [np.array([[w // 4, h // 4, w * 3 // 4, h * 3 // 4]], dtype=np.float32)
+                     for _ in frames])
+        self.recognize_plates([np.zeros((48, 160, 3), dtype=np.uint8)])
+
+        self.warmup_seconds = time.perf_counter() - started
+        STARTUP_SECONDS.labels("warmup").set(self.warmup_seconds)
+        logger.info(f"🔥 Прогрев моделей: {self.warmup_seconds:.1f} с")
+        return self.warmup_seconds
+
+    def detect_vehicles(self, frames: List[np.ndarray]) -> List[Detections]:
+        """
+        Детекция транспортных средств одним вызовом модели для всех кадров.
+
+        Args:
+            frames (list): Кадры (по одному от каждого потока).
+
+        Returns:
+            list: Detections целевых классов для каждого кадра.
+        """
+        results = self.vehicle_model(frames, device=self.device, verbose=False)
+        detections = []
+        for vehicle_results in results:
+            mask = [int(c) in TARGET_CLASSES for c in vehicle_results.boxes.cls]
+            detections.append(Detections(
+                xyxy=vehicle_results.boxes.xyxy.cpu().numpy()[mask],
+                confidence=vehicle_results.boxes.conf.cpu().numpy()[mask],
+                class_id=vehicle_results.boxes.cls.cpu().numpy()[mask].astype(int)))
+        return detections
+
+    def detect_plates(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Детекция номерных знаков одним вызовом модели для всех кадров.
+
+        Args:
+            frames (list): Кадры (по одному от каждого потока).
+
+        Returns:
+            list: Массивы bbox номеров (N, 4) в формате xyxy для каждого кадра.
+        """
+        results = self.plate_model(frames, device=self.device, verbose=False)
+        return [r.boxes.xyxy.cpu().numpy() for r in results]
+
+    def detect_plates_in_vehicles(self,
+                                  frames: List[np.ndarray],
+                                  vehicle_boxes: List[np.ndarray]) -> List[List[Optional[np.ndarray]]]:
+        """
+        Детекция номеров внутри bbox'ов транспортных средств.
+
+        Области ТС всех кадров вырезаются и передаются детектору номеров
+        одним пакетом с уменьшенным размером входа. Для каждого ТС
+        выбирается номер с максимальной уверенностью, поэтому привязка
+        номера к SID получается по построению.
+
+        Args:
+            frames (list): Кадры потоков.
+            vehicle_boxes (list): Для каждого кадра массив bbox'ов ТС (M, 4) xyxy.
+
+        Returns:
+            list: Для каждого кадра список (по ТС) bbox'ов номеров в координатах
+                  кадра либо None, если номер не найден.
+        """
+        rois, owners = [], []
+        for i, (frame, boxes) in enumerate(zip(frames, vehicle_boxes)):
+            h, w = frame.shape[:2]
+            for j, (x1, y1, x2, y2) in enumerate(boxes):
+                mx = (x2 - x1) * PLATE_ROI_MARGIN
+                my = (y2 - y1) * PLATE_ROI_MARGIN
+                rx1, ry1 = max(int(x1 - mx), 0), max(int(y1 - my), 0)
+                rx2, ry2 = min(int(x2 + mx), w), min(int(y2 + my), h)
+                if rx2 - rx1 < 2 or ry2 - ry1 < 2:
+                    continue
+                rois.append(frame[ry1:ry2, rx1:rx2])
+                owners.append((i, j, rx1, ry1))
+
+        plates: List[List[Optional[np.ndarray]]] = [
+            [None] * len(boxes) for boxes in vehicle_boxes]
+        if not rois:
+            return plates
+
+        results = self.plate_model(rois, imgsz=PLATE_ROI_IMGSZ,
+                                   device=self.device, verbose=False)
+        for (i, j, ox, oy), r in zip(owners, results):
+            if len(r.boxes) == 0:
+                continue
+            best = int(r.boxes.conf.argmax())
+            box = r.boxes.xyxy[best].cpu().numpy()
+            plates[i][j] = box + np.array([ox, oy, ox, oy], dtype=box.dtype)
+        return plates
+
+    def recognize_plates(self, crops: List[np.ndarray]) -> List[Tuple[str, List[float]]]:
+        """
+        Распознаёт текст номеров на вырезанных областях одним пакетом.
+
+        Args:
+            crops (list): Изображения номерных знаков.
+
+        Returns:
+            list: [(номер, уверенность каждого символа)]; пустая строка при неудаче.
+        """
+        return self.plate_reader.recognize_batch(crops)
+
+
+_runtime: Optional[ModelRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_model_runtime(backend_settings: Optional[dict] = None,
+                      warmup_batch: int = 1) -> ModelRuntime:
+    """
+    Общий для процесса набор моделей: загружается и прогревается при первом
+    обращении, при перезапусках конвейера возвращается уже загруженным.
+
+    Args:
+        backend_settings (dict | None): Раздел "detector_backend" config.json
+            (учитывается только при первой загрузке).
+        warmup_batch (int): Размер пакета прогрева (по числу потоков).
+
+    Returns:
+        ModelRuntime: Загруженные модели.
+    """
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                runtime = ModelRuntime(backend_settings=backend_settings)
+                runtime.warmup(warmup_batch)
+                _runtime = runtime
+    return _runtime
@@ -0,0 +1,172 @@
+"""
+Модуль motion_gate.py
+
+Дешёвый детектор движения перед YOLO: кадр уменьшается, переводится
+в оттенки серого и сравнивается с предыдущим (или с моделью фона MOG2).
+Детекторы запускаются только при движении в кадре или при наличии
+живых треков.
+"""
+
+import time
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config import MOTION_GATE_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_AREA, MOTION_HOLD_TIME
+
+
+class MotionGate:
+    """
+    Фильтр кадров по наличию движения с необязательной маской зоны контроля.
+    """
+
+    def __init__(self,
+                 method: str = "diff",
+                 mask: Any = None,
+                 width: int = MOTION_GATE_WIDTH,
+                 pixel_threshold: int = MOTION_PIXEL_THRESHOLD,
+                 min_area: float = MOTION_MIN_AREA,
+                 hold_time: float = MOTION_HOLD_TIME):
+        """
+        Args:
+            method (str): "diff" — разность соседних кадров, "mog2" — вычитание фона.
+            mask (Any): Зона контроля: путь к изображению (белое — контролируется)
+                        или список полигонов в долях кадра [[[x, y], ...], ...].
+            width (int): Ширина уменьшенного кадра, px.
+            pixel_threshold (int): Порог изменения яркости пикселя (0–255).
+            min_area (float): Минимальная доля изменившихся пикселей зоны.
+            hold_time (float): Сколько секунд держать детекторы включёнными после движения.
+        """
+        self.method = method
+        self.mask_spec = mask
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.hold_time = hold_time
+
+        self._mask: Optional[np.ndarray] = None
+        self._mask_area = 0
+        self._prev: Optional[np.ndarray] = None
+        self._bg = cv2.createBackgroundSubtractorMOG2(
+            history=500, detectShadows=False) if method == "mog2" else None
+        self._hold_until = 0.0
+
+        self.checked = 0
+        self.triggered = 0
+        self.motion = 0
+        self.last_ratio = 0.0
+
+    def _build_mask(self, shape) -> None:
+        h, w = shape
+        mask = np.full((h, w), 255, dtype=np.uint8)
+
+        if isinstance(self.mask_spec, str):
+            image = cv2.imread(self.mask_spec, cv2.IMREAD_GRAYSCALE)
+            if image is not None:
+                mask = cv2.resize(image, (w, h), interpolation=cv2.INTER_NEAREST)
+                mask = np.where(mask > 127, 255, 0).astype(np.uint8)
+        elif self.mask_spec:
+            mask[:] = 0
+            polygons: List[np.ndarray] = [
+                np.array([[x * w, y * h] for x, y in polygon], dtype=np.int32)
+                for polygon in self.mask_spec]
+            cv2.fillPoly(mask, polygons, 255)
+
+        self._mask = mask
+        self._mask_area = max(int(np.count_nonzero(mask)), 1)
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(int(h * self.width / w), 1)),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, frame: np.ndarray) -> bool:
+        """
+        Проверяет наличие движения в зоне контроля.
+
+        Args:
+            frame (np.ndarray): BGR-кадр.
+
+        Returns:
+            bool: True, если доля изменившихся пикселей не меньше min_area.
+        """
+        gray = self._prepare(frame)
+        if self._mask is None or self._mask.shape != gray.shape:
+            self._build_mask(gray.shape)
+
+        if self._bg is not None:
+            changed = self._bg.apply(gray)
+        else:
+            prev, self._prev = self._prev, gray
+            if prev is None or prev.shape != gray.shape:
+                return True
+            _, changed = cv2.threshold(cv2.absdiff(gray, prev),
+                                       self.pixel_threshold, 255, cv2.THRESH_BINARY)
+
+        changed = cv2.bitwise_and(changed, self._mask)
+        self.last_ratio = cv2.countNonZero(changed) / self._mask_area
+        return self.last_ratio >= self.min_area
+
+    def check(self, frame: np.ndarray, has_live_tracks: bool,
+              now: Optional[float] = None) -> bool:
+        """
+        Решает, запускать ли детекторы на кадре.
+
+        Args:
+            frame (np.ndarray): BGR-кадр.
+            has_live_tracks (bool): В потоке есть треки, не истёкшие по SID_TTL.
+            now (float | None): Время кадра (по умолчанию — текущее).
+
+        Returns:
+            bool: True — кадр нужно обработать детекторами.
+        """
+        now = time.time() if now is None else now
+        self.checked += 1
+
+        # Разность кадров считается всегда, чтобы опорный кадр оставался свежим
+        motion = self.has_motion(frame)
+        if motion:
+            self.motion += 1
+            self._hold_until = now + self.hold_time
+
+        trigger = motion or has_live_tracks or now < self._hold_until
+        if trigger:
+            self.triggered += 1
+        return trigger
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Статистика фильтра.
+
+        Returns:
+            dict: checked, triggered, motion, hit_ratio (доля кадров,
+                  переданных детекторам), last_ratio (доля движения на последнем кадре).
+        """
+        return {
+            "checked": self.checked,
+            "triggered": self.triggered,
+            "motion": self.motion,
+            "hit_ratio": round(self.triggered / self.checked, 3) if self.checked else 0.0,
+            "last_ratio": round(self.last_ratio, 4),
+        }
+
+
+def create_motion_gate(settings: Optional[Dict], label: str) -> Optional[MotionGate]:
+    """
+    Создаёт фильтр движения потока по разделу "motion_gate" config.json.
+
+    Args:
+        settings (dict | None): {"enabled": bool, "method": "diff" | "mog2",
+                                 "masks": {метка потока: путь или полигоны}}.
+        label (str): Метка потока.
+
+    Returns:
+        MotionGate | None: Фильтр или None, если он выключен.
+    """
+    if not settings or not settings.get("enabled", False):
+        return None
+    return MotionGate(method=settings.get("method", "diff"),
+                      mask=(settings.get("masks") or {}).get(label))
@@ -0,0 +1,179 @@
+"""
+Модуль overlay_renderer.py
+
+Отрисовка подписей кириллицей (шрифт AutoNumber) без преобразования
+всего кадра в PIL: подпись один раз растеризуется в небольшой спрайт,
+кэшируется (LRU) и копируется в кадр срезом numpy.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from PIL import ImageFont, ImageDraw, Image
+
+from config import FONT_PATH, OVERLAY_CACHE_SIZE
+
+Color = Tuple[int, int, int]
+
+
+class OverlayRenderer:
+    """
+    Рендерер подписей с кэшем шрифтов и готовых спрайтов.
+    """
+
+    def __init__(self, font_path: str = FONT_PATH, cache_size: int = OVERLAY_CACHE_SIZE):
+        """
+        Args:
+            font_path (str): Путь к TTF-шрифту с поддержкой кириллицы.
+            cache_size (int): Максимальное количество спрайтов в кэше.
+        """
+        self.font_path = font_path
+        self.cache_size = cache_size
+
+        self._fonts: Dict[int, ImageFont.ImageFont] = {}
+        self._sprites: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def _font(self, font_size: int) -> ImageFont.ImageFont:
+        font = self._fonts.get(font_size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.font_path, font_size)
+            except OSError:
+                font = ImageFont.load_default()
+            self._fonts[font_size] = font
+        return font
+
+    def _render_sprite(self, text: str, font_size: int, text_color: Color,
+                       bg_color: Color, padding: int) -> np.ndarray:
+        font = self._font(font_size)
+        left, top, right, bottom = font.getbbox(text)
+        width = right - left + 2 * padding + 1
+        height = bottom - top + 2 * padding + 1
+
+        # Цвета задаются в RGB (как в PIL); спрайт переводится в BGR один раз
+        sprite = Image.new("RGB", (width, height), bg_color)
+        ImageDraw.Draw(sprite).text(
+            (padding - left, padding - top), text, font=font, fill=text_color)
+        return np.ascontiguousarray(np.asarray(sprite)[:, :, ::-1])
+
+    def sprite(self, text: str, font_size: int = 30,
+               text_color: Color = (0, 0, 0),
+               bg_color: Color = (255, 255, 255),
+               padding: int = 4) -> np.ndarray:
+        """
+        Возвращает BGR-спрайт подписи (с подложкой), используя кэш.
+
+        Args:
+            text (str): Текст подписи.
+            font_size (int): Размер шрифта.
+            text_color (tuple): Цвет текста (RGB).
+            bg_color (tuple): Цвет подложки (RGB).
+            padding (int): Отступ подложки вокруг текста, px.
+
+        Returns:
+            np.ndarray: Изображение подписи (H, W, 3).
+        """
+        key = (text, font_size, tuple(text_color), tuple(bg_color), padding)
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+                self.hits += 1
+                return sprite
+
+            self.misses += 1
+            sprite = self._render_sprite(
+                text, font_size, text_color, bg_color, padding)
+            self._sprites[key] = sprite
+            if len(self._sprites) > self.cache_size:
+                self._sprites.popitem(last=False)
+            return sprite
+
+    @staticmethod
+    def blit(frame: np.ndarray, sprite: np.ndarray, x: int, y: int) -> None:
+        """
+        Копирует спрайт в кадр с обрезкой по границам кадра.
+
+        Args:
+            frame (np.ndarray): BGR-кадр (изменяется на месте).
+            sprite (np.ndarray): BGR-спрайт.
+            x (int): Левая координата спрайта в кадре.
+            y (int): Верхняя координата спрайта в кадре.
+        """
+        fh, fw = frame.shape[:2]
+        sh, sw = sprite.shape[:2]
+        x1, y1 = max(x, 0), max(y, 0)
+        x2, y2 = min(x + sw, fw), min(y + sh, fh)
+        if x1 >= x2 or y1 >= y2:
+            return
+        frame[y1:y2, x1:x2] = sprite[y1 - y:y2 - y, x1 - x:x2 - x]
+
+    def draw_text(self, frame: np.ndarray, text: str, position: Tuple[int, int],
+                  font_size: int = 30,
+                  text_color: Color = (0, 0, 0),
+                  bg_color: Color = (255, 255, 255),
+                  padding: int = 4) -> np.ndarray:
+        """
+        Рисует подпись с подложкой; (x, y) — левый верхний угол текста.
+
+        Returns:
+            np.ndarray: Тот же кадр (изменён на месте).
+        """
+        sprite = self.sprite(text, font_size, text_color, bg_color, padding)
+        x, y = position
+        self.blit(frame, sprite, int(x) - padding, int(y) - padding)
+        return frame
+
+    def draw_labels(self, frame: np.ndarray,
+                    labels: Iterable[Tuple[str, Tuple[int, int]]],
+                    font_size: int = 30,
+                    text_color: Color = (0, 0, 0),
+                    bg_color: Color = (255, 255, 255),
+                    padding: int = 4) -> np.ndarray:
+        """
+        Рисует все подписи кадра за один проход.
+
+        Args:
+            frame (np.ndarray): BGR-кадр (изменяется на месте).
+            labels (Iterable): Пары (текст, (x, y)).
+
+        Returns:
+            np.ndarray: Тот же кадр.
+        """
+        for text, position in labels:
+            if text:
+                self.draw_text(frame, text, position, font_size,
+                               text_color, bg_color, padding)
+        return frame
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика кэша спрайтов.
+
+        Returns:
+            dict: hits, misses, size.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._sprites)}
+
+
+_renderer: Optional[OverlayRenderer] = None
+
+
+def get_overlay_renderer() -> OverlayRenderer:
+    """
+    Общий для процесса рендерер подписей (шрифт загружается один раз).
+
+    Returns:
+        OverlayRenderer: Рендерер подписей.
+    """
+    global _renderer
+    if _renderer is None:
+        _renderer = OverlayRenderer()
+    return _renderer
@@ -0,0 +1,365 @@
+"""
+Модуль pipeline.py
+
+Многопоточный конвейер обработки видео: поток захвата кадров, стадия
+инференса и стадия отрисовки/записи/сохранения, связанные ограниченными
+очередями.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FrameQueue:
+    """
+    Ограниченная очередь между стадиями конвейера.
+
+    Поддерживает две политики переполнения:
+    - drop_oldest=True — при заполнении выбрасывается самый старый элемент
+      (для живых источников: задержка не растёт, обрабатываются свежие кадры);
+      если задан droppable, сначала выбрасываются подходящие под него элементы;
+    - drop_oldest=False — производитель блокируется, пока потребитель
+      не освободит место (для видеофайлов: ни один кадр не теряется).
+    """
+
+    def __init__(self, name: str, maxsize: int, drop_oldest: bool = False,
+                 droppable: Optional[Callable[[Any], bool]] = None):
+        """
+        Args:
+            name (str): Имя очереди (для статистики и логов).
+            maxsize (int): Максимальная глубина очереди.
+            drop_oldest (bool): Политика переполнения (см. описание класса).
+            droppable (Callable | None): Элементы, которые выбрасываются
+                                         первыми (кадры без инференса).
+        """
+        self.name = name
+        self.maxsize = max(int(maxsize), 1)
+        self.drop_oldest = drop_oldest
+        self.droppable = droppable
+
+        self._items: deque = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.put_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    def put(self, item: Any) -> bool:
+        """
+        Помещает элемент в очередь согласно политике переполнения.
+
+        Args:
+            item (Any): Элемент для передачи следующей стадии.
+
+        Returns:
+            bool: False, если очередь закрыта и элемент не принят.
+        """
+        with self._cond:
+            if self.drop_oldest:
+                while len(self._items) >= self.maxsize:
+                    index = 0
+                    if self.droppable is not None:
+                        index = next((i for i, queued in enumerate(self._items)
+                                      if self.droppable(queued)), 0)
+                    del self._items[index]
+                    self.dropped += 1
+            else:
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._cond.wait()
+
+            if self._closed:
+                return False
+
+            self._items.append(item)
+            self.put_count += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """
+        Извлекает элемент из очереди.
+
+        Args:
+            timeout (float | None): Максимальное время ожидания в секундах.
+
+        Returns:
+            Any: Элемент очереди либо None, если истёк таймаут
+                 или очередь закрыта и опустошена.
+        """
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+
+            if not self._items:
+                return None
+
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self) -> None:
+        """Закрывает очередь: новые элементы не принимаются, ожидающие потоки просыпаются."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        """True, если очередь закрыта и в ней не осталось элементов."""
+        with self._cond:
+            return self._closed and not self._items
+
+    def depth(self) -> int:
+        """Текущее количество элементов в очереди."""
+        with self._cond:
+            return len(self._items)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Возвращает статистику очереди.
+
+        Returns:
+            dict: depth, max_depth, maxsize, put, dropped.
+        """
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "max_depth": self.max_depth,
+                "maxsize": self.maxsize,
+                "put": self.put_count,
+                "dropped": self.dropped,
+            }
+
+
+class BatchStageThread(threading.Thread):
+    """
+    Стадия конвейера, собирающая на каждом такте по одному элементу
+    из нескольких входных очередей и обрабатывающая их одним пакетом
+    (общий инференс для нескольких камер).
+    """
+
+    def __init__(self,
+                 name: str,
+                 func: Callable[[List[Any]], List[Any]],
+                 in_queues: List[FrameQueue],
+                 out_queue: Optional[FrameQueue],
+                 stop_event: threading.Event,
+                 tick: float = 0.02):
+        """
+        Args:
+            name (str): Имя стадии.
+            func (Callable): Обработчик пакета; возвращает список результатов.
+            in_queues (list): Входные очереди (по одной на поток).
+            out_queue (FrameQueue | None): Общая выходная очередь.
+            stop_event (threading.Event): Общий флаг остановки конвейера.
+            tick (float): Время ожидания кадров, если ни одна очередь не готова, сек.
+        """
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.in_queues = in_queues
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.tick = tick
+        self.error: Optional[BaseException] = None
+
+        self.processed = 0
+        self.batches = 0
+        self.busy_time = 0.0
+
+    def _collect(self) -> List[Any]:
+        batch = []
+        for q in self.in_queues:
+            item = q.get(timeout=0)
+            if item is not None:
+                batch.append(item)
+        return batch
+
+    def run(self) -> None:
+        try:
+            while not self.stop_event.is_set():
+                batch = self._collect()
+                if not batch:
+                    if all(q.closed for q in self.in_queues):
+                        break
+                    time.sleep(self.tick)
+                    continue
+
+                start = time.perf_counter()
+                results = self.func(batch)
+                self.busy_time += time.perf_counter() - start
+                self.processed += len(batch)
+                self.batches += 1
+
+                if self.out_queue is not None:
+                    for result in results:
+                        if result is not None:
+                            self.out_queue.put(result)
+        except BaseException as e:
+            self.error = e
+            logger.exception(f"❌ Ошибка в стадии '{self.name}'")
+            self.stop_event.set()
+        finally:
+            if self.out_queue is not None:
+                self.out_queue.close()
+
+
+class CaptureThread(threading.Thread):
+    """
+    Поток захвата кадров: читает источник, отбрасывает кадры согласно
+    frame_skip (или адаптивному шагу) и передаёт остальные в очередь инференса.
+    Отброшенные кадры только извлекаются из потока (grab) без декодирования
+    в BGR; при propagate=True они декодируются и передаются с флагом
+    "predicted" — на них рисуются перенесённые боксы треков без детекторов.
+    """
+
+    def __init__(self,
+                 capture: Any,
+                 out_queue: FrameQueue,
+                 stop_event: threading.Event,
+                 is_file_source: bool,
+                 frame_skip: int = 1,
+                 prepare: Optional[Callable[[Any], Any]] = None,
+                 reconnect_wait: float = 0.5,
+                 stream: Any = None,
+                 stride_controller: Any = None,
+                 propagate: bool = False,
+                 name: str = "capture"):
+        """
+        Args:
+            capture (CaptureSource): Открытый (или переподключающийся) источник кадров.
+            out_queue (FrameQueue): Очередь кадров для стадии инференса.
+            stop_event (threading.Event): Общий флаг остановки конвейера.
+            is_file_source (bool): Источник — видеофайл (конец файла завершает захват).
+            frame_skip (int): Обрабатывается каждый frame_skip-й кадр.
+            prepare (Callable | None): Предобработка кадра (например, штамп времени).
+            reconnect_wait (float): Период проверки флага остановки во время
+                                    фонового переподключения, сек.
+            stream (Any): Состояние потока, передаваемое в каждом пакете.
+            stride_controller (StrideController | None): Адаптивный шаг вместо frame_skip.
+            propagate (bool): Передавать пропущенные кадры для отрисовки треков.
+            name (str): Имя потока захвата.
+        """
+        super().__init__(name=name, daemon=True)
+        self.capture = capture
+        self.out_queue = out_queue
+        self.stop_event = stop_event
+        self.is_file_source = is_file_source
+        self.frame_skip = max(int(frame_skip), 1)
+        self.prepare = prepare
+        self.reconnect_wait = reconnect_wait
+        self.stream = stream
+        self.stride_controller = stride_controller
+        self.propagate = propagate
+        self.error: Optional[BaseException] = None
+
+        self.frame_count = 0
+
+    @property
+    def reconnects(self) -> int:
+        """Число обрывов потока."""
+        return self.capture.reconnects
+
+    @property
+    def source_fps(self) -> float:
+        """Частота кадров, заявленная источником (0 — неизвестна)."""
+        return self.capture.fps
+
+    def run(self) -> None:
+        cap = self.capture
+        try:
+            while not self.stop_event.is_set():
+                if not cap.grab():
+                    if self.is_file_source:
+                        logger.info("✅ Обработка файла завершена.")
+                        break
+                    # Переподключение идёт в фоне; остановка не ждёт его окончания
+                    cap.wait_connected(self.reconnect_wait)
+                    continue
+
+                self.frame_count += 1
+                if self.stride_controller is not None:
+                    self.stride_controller.on_frame()
+                    skipped = not self.stride_controller.should_process()
+                else:
+                    skipped = self.frame_count % self.frame_skip != 0
+                if skipped and not self.propagate:
+                    continue
+
+                frame = cap.retrieve()
+                if frame is None:
+                    continue
+                if self.prepare is not None:
+                    frame = self.prepare(frame)
+
+                packet = {
+                    "frame_id": self.frame_count,
+                    "frame": frame,
+                    # Время кадра по меткам потока, а не момент после декодирования
+                    "timestamp": cap.timestamp,
+                    "stream": self.stream,
+                    # Кадр без инференса: только перенос боксов треков
+                    "predicted": skipped,
+                }
+                if not self.out_queue.put(packet):
+                    break
+        except BaseException as e:
+            self.error = e
+            logger.exception("❌ Ошибка в потоке захвата")
+            self.stop_event.set()
+        finally:
+            cap.release()
+            self.out_queue.close()
+
+
+class Pipeline:
+    """
+    Набор потоков и очередей конвейера с общим флагом остановки.
+    """
+
+    def __init__(self, threads: List[threading.Thread], queues: List[FrameQueue],
+                 stop_event: threading.Event):
+        """
+        Args:
+            threads (list): Потоки стадий (CaptureThread, BatchStageThread).
+            queues (list): Очереди между стадиями.
+            stop_event (threading.Event): Общий флаг остановки.
+        """
+        self.threads = threads
+        self.queues = queues
+        self.stop_event = stop_event
+
+    def start(self) -> None:
+        """Запускает все потоки конвейера."""
+        for t in self.threads:
+            t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Останавливает конвейер и дожидается завершения потоков."""
+        self.stop_event.set()
+        for q in self.queues:
+            q.close()
+        for t in self.threads:
+            t.join(timeout)
+
+    def raise_if_failed(self) -> None:
+        """Пробрасывает исключение, возникшее в одном из потоков конвейера."""
+        for t in self.threads:
+            error = getattr(t, "error", None)
+            if error is not None:
+                raise RuntimeError(f"Стадия '{t.name}' завершилась с ошибкой") from error
+
+    def queue_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Подробная статистика всех очередей.
+
+        Returns:
+            dict: {имя очереди: FrameQueue.stats()}.
+        """
+        return {q.name: q.stats() for q in self.queues}
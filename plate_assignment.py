@@ -1,6 +1,12 @@
 import math
 from typing import List, Tuple, Dict, Any
 
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Стоимость недопустимой пары «номер — автомобиль»
+INFEASIBLE_COST = 1e6
+
 
 def box_center(box: Tuple[float, float, float, float]) -> Tuple[float, float]:
     """
@@ -24,59 +30,111 @@ def center_distance(c1: Tuple[float, float], c2: Tuple[float, float]) -> float:
     return math.hypot(c1[0] - c2[0], c1[1] - c2[1])
 
 
+def tracks_to_arrays(tracks: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Извлекает bbox'ы и SID треков в виде массивов.
+
+    :param tracks: Detections (ByteTrack) либо список [(bbox, ..., ..., ..., sid)]
+    :return: Кортеж (bbox'ы (T, 4), SID (T,))
+    """
+    if hasattr(tracks, "xyxy") and hasattr(tracks, "tracker_id"):
+        sids = tracks.tracker_id if tracks.tracker_id is not None else []
+        return (np.asarray(tracks.xyxy, dtype=np.float64).reshape(-1, 4),
+                np.asarray(sids, dtype=np.int64))
+
+    boxes = np.array([np.asarray(t[0], dtype=np.float64) for t in tracks]).reshape(-1, 4)
+    sids = np.array([int(t[4]) for t in tracks], dtype=np.int64)
+    return boxes, sids
+
+
+def plate_vehicle_cost(plate_boxes: np.ndarray, vehicle_boxes: np.ndarray) -> np.ndarray:
+    """
+    Матрица стоимостей привязки всех номеров ко всем автомобилям за один проход.
+
+    Пара допустима, если центр номера лежит внутри bbox автомобиля.
+    Стоимость — расстояние между центрами, нормированное на диагональ
+    автомобиля, плюс доля площади номера вне bbox автомобиля.
+
+    :param plate_boxes: bbox'ы номеров (P, 4)
+    :param vehicle_boxes: bbox'ы автомобилей (T, 4)
+    :return: Матрица (P, T); недопустимые пары — INFEASIBLE_COST
+    """
+    p = plate_boxes[:, None, :]
+    v = vehicle_boxes[None, :, :]
+
+    pcx = (p[..., 0] + p[..., 2]) / 2
+    pcy = (p[..., 1] + p[..., 3]) / 2
+    vcx = (v[..., 0] + v[..., 2]) / 2
+    vcy = (v[..., 1] + v[..., 3]) / 2
+
+    diag = np.hypot(v[..., 2] - v[..., 0], v[..., 3] - v[..., 1])
+    dist = np.hypot(pcx - vcx, pcy - vcy)
+
+    inside = (v[..., 0] <= pcx) & (pcx <= v[..., 2]) & \
+             (v[..., 1] <= pcy) & (pcy <= v[..., 3])
+
+    # Доля площади номера внутри bbox автомобиля
+    iw = np.clip(np.minimum(p[..., 2], v[..., 2]) - np.maximum(p[..., 0], v[..., 0]), 0, None)
+    ih = np.clip(np.minimum(p[..., 3], v[..., 3]) - np.maximum(p[..., 1], v[..., 1]), 0, None)
+    plate_area = (p[..., 2] - p[..., 0]) * (p[..., 3] - p[..., 1])
+    containment = np.divide(iw * ih, plate_area,
+                            out=np.zeros_like(iw), where=plate_area > 0)
+
+    cost = np.divide(dist, diag, out=np.full_like(dist, INFEASIBLE_COST),
+                     where=diag > 0) + (1.0 - containment)
+    cost[~inside] = INFEASIBLE_COST
+    return cost
+
+
+def match_plates_to_tracks(
+    plate_boxes: List[Tuple[float, float, float, float]],
+    tracks: List[Tuple[Any, Any, Any, Any, int]]
+) -> Dict[int, int]:
+    """
+    Связывает bbox'ы номеров с автомобилями только по геометрии
+    (до распознавания текста) оптимальным сопоставлением.
+
+    :param plate_boxes: Список bbox'ов номеров (x1, y1, x2, y2)
+    :param tracks: Список треков с bbox и SID [(bbox, ..., ..., ..., sid)]
+    :return: Словарь соответствий {SID: индекс номера в plate_boxes}
+    """
+    plates = np.asarray(plate_boxes, dtype=np.float64).reshape(-1, 4)
+    vehicles, sids = tracks_to_arrays(tracks)
+    if len(plates) == 0 or len(vehicles) == 0:
+        return {}
+
+    cost = plate_vehicle_cost(plates, vehicles)
+    rows, cols = linear_sum_assignment(cost)
+
+    return {int(sids[c]): int(r) for r, c in zip(rows, cols)
+            if cost[r, c] < INFEASIBLE_COST}
+
+
 def assign_plates_to_vehicles(
     plate_boxes: List[Tuple[float, float, float, float]],
     plate_texts: List[str],
     tracks: List[Tuple[Any, Any, Any, Any, int]]
 ) -> Dict[int, str]:
     """
-    Связывает распознанные номера с ближайшими автомобилями по координатам.
+    Связывает распознанные номера с автомобилями по координатам.
 
     :param plate_boxes: Список bbox'ов номеров (x1, y1, x2, y2)
     :param plate_texts: Список распознанных текстов номеров
     :param tracks: Список треков с bbox и SID [(bbox, ..., ..., ..., sid)]
     :return: Словарь соответствий {SID: plate_text}
     """
-    assignments: Dict[int, str] = {}
-    used_sids = set()
+    # Участвуют только непустые номера, каждый текст — один раз
     used_plates = set()
-
-    for i, plate_box in enumerate(plate_boxes):
-        plate_center = box_center(plate_box)
-        best_dist = float("inf")
-        best_sid = None
-        best_vbox = None
-
-        # Поиск ближайшего автомобиля
-        for track in tracks:
-            vehicle_box = track[0]
-            sid = int(track[4])
-
-            if sid in used_sids:
-                continue
-
-            vehicle_center = box_center(vehicle_box)
-            dist = center_distance(plate_center, vehicle_center)
-            diag = math.hypot(
-                vehicle_box[2] - vehicle_box[0], vehicle_box[3] - vehicle_box[1])
-
-            # Сравнение с допустимой дистанцией (в 5 раз меньше диагонали)
-            if dist < best_dist and dist < 5.0 * diag:
-                best_dist = dist
-                best_sid = sid
-                best_vbox = vehicle_box
-
-        # Проверка, что центр номера лежит внутри bbox машины
-        if best_sid is not None:
-            vx1, vy1, vx2, vy2 = best_vbox
-            in_box = (vx1 <= plate_center[0] <= vx2) and (
-                vy1 <= plate_center[1] <= vy2)
-
-            if in_box:
-                plate_text = plate_texts[i].strip()
-                if plate_text and plate_text not in used_plates:
-                    assignments[best_sid] = plate_text
-                    used_sids.add(best_sid)
-                    used_plates.add(plate_text)
-
-    return assignments
+    keep = []
+    for i, text in enumerate(plate_texts):
+        text = text.strip()
+        if text and text not in used_plates:
+            used_plates.add(text)
+            keep.append(i)
+
+    if not keep:
+        return {}
+
+    plates = np.asarray(plate_boxes, dtype=np.float64).reshape(-1, 4)[keep]
+    matches = match_plates_to_tracks(plates, tracks)
+    return {sid: plate_texts[keep[i]].strip() for sid, i in matches.items()}
@@ -0,0 +1,161 @@
+"""
+Модуль plate_consensus.py
+
+Накопление прочтений номера по каждому SID: голосование по кадрам,
+посимвольное слияние с учётом уверенности OCR и «фиксация» номера,
+после которой трек больше не отправляется на распознавание.
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import PLATE_LOCK_MIN_READS, PLATE_LOCK_RATIO
+
+
+class PlateConsensus:
+    """
+    Кэш распознаваний номеров по SID с временным голосованием.
+    """
+
+    def __init__(self,
+                 min_reads: int = PLATE_LOCK_MIN_READS,
+                 lock_ratio: float = PLATE_LOCK_RATIO,
+                 validator: Optional[Callable[[str], Tuple[bool, str]]] = None):
+        """
+        Args:
+            min_reads (int): Минимум прочтений одной длины для фиксации номера.
+            lock_ratio (float): Минимальная доля голосов за символ в каждой позиции.
+            validator (Callable | None): Проверка формата номера,
+                например PlateRecognizer.is_license_plate.
+        """
+        self.min_reads = min_reads
+        self.lock_ratio = lock_ratio
+        self.validator = validator
+
+        # {sid: {длина: [{символ: суммарная уверенность}, ...]}}
+        self._chars: Dict[int, Dict[int, List[Dict[str, float]]]] = {}
+        # {sid: {длина: количество прочтений}}
+        self._reads: Dict[int, Dict[int, int]] = {}
+        self._plates: Dict[int, str] = {}
+        self.locked: Dict[int, str] = {}
+
+        self.readings = 0
+        self.skipped = 0
+
+    def is_locked(self, sid: int) -> bool:
+        """
+        Проверяет, зафиксирован ли номер трека.
+
+        Args:
+            sid (int): Идентификатор трека.
+
+        Returns:
+            bool: True — OCR для трека больше не нужен.
+        """
+        return sid in self.locked
+
+    def plate(self, sid: int) -> str:
+        """
+        Текущий согласованный номер трека.
+
+        Args:
+            sid (int): Идентификатор трека.
+
+        Returns:
+            str: Номер или пустая строка.
+        """
+        return self._plates.get(sid, "")
+
+    def add_reading(self, sid: int, text: str, confidences: List[float]) -> str:
+        """
+        Добавляет прочтение номера и пересчитывает согласованный результат.
+
+        Args:
+            sid (int): Идентификатор трека.
+            text (str): Распознанный номер (пустые прочтения игнорируются).
+            confidences (list): Уверенность каждого символа.
+
+        Returns:
+            str: Согласованный номер трека.
+        """
+        if not text or sid in self.locked:
+            return self.plate(sid)
+
+        self.readings += 1
+        if len(confidences) != len(text):
+            confidences = [1.0] * len(text)
+
+        by_len = self._chars.setdefault(sid, {})
+        positions = by_len.setdefault(
+            len(text), [defaultdict(float) for _ in text])
+        for pos, (ch, conf) in enumerate(zip(text, confidences)):
+            positions[pos][ch] += conf
+
+        reads = self._reads.setdefault(sid, defaultdict(int))
+        reads[len(text)] += 1
+
+        fused, length, margin = self._fuse(sid)
+        valid = bool(fused)
+        if self.validator is not None and fused:
+            valid, fused_normalized = self.validator(fused)
+            if valid:
+                fused = fused_normalized
+        if valid:
+            self._plates[sid] = fused
+        else:
+            # Слияние не прошло проверку: последнее прочтение показывается
+            # временно и не фиксируется (голоса посчитаны для другой строки)
+            self._plates[sid] = text
+
+        if valid and reads[length] >= self.min_reads and margin >= self.lock_ratio:
+            self.locked[sid] = fused
+
+        return self.plate(sid)
+
+    def _fuse(self, sid: int) -> Tuple[str, int, float]:
+        """
+        Посимвольное слияние прочтений самой весомой длины.
+
+        Returns:
+            tuple: (номер, длина, минимальная доля голосов за выбранный символ).
+        """
+        by_len = self._chars.get(sid)
+        if not by_len:
+            return "", 0, 0.0
+
+        length = max(by_len, key=lambda n: sum(
+            sum(p.values()) for p in by_len[n]))
+
+        chars, margin = [], 1.0
+        for votes in by_len[length]:
+            ch, weight = max(votes.items(), key=lambda kv: kv[1])
+            total = sum(votes.values())
+            chars.append(ch)
+            margin = min(margin, weight / total if total else 0.0)
+        return "".join(chars), length, margin
+
+    def drop(self, sid: int) -> None:
+        """
+        Удаляет накопленные прочтения трека (при истечении SID_TTL).
+
+        Args:
+            sid (int): Идентификатор трека.
+        """
+        self._chars.pop(sid, None)
+        self._reads.pop(sid, None)
+        self._plates.pop(sid, None)
+        self.locked.pop(sid, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика кэша.
+
+        Returns:
+            dict: readings — прочтений OCR, skipped — пропущенных OCR,
+                  locked — зафиксированных треков.
+        """
+        return {
+            "readings": self.readings,
+            "skipped": self.skipped,
+            "locked": len(self.locked),
+        }
@@ -0,0 +1,260 @@
+"""
+Модуль plate_grammar.py
+
+Грамматика российских номерных знаков (ГОСТ Р 50577) в виде таблицы
+шаблонов: L — буква из 12 допустимых, D — цифра, R — код региона из
+2 или 3 цифр. Шаблоны компилируются один раз: в регулярное выражение
+для проверки готовой строки и в набор классов позиций для декодирования.
+
+Декодирование получает для каждого прочитанного символа несколько
+альтернатив OCR с вероятностями и лучевым поиском (Витерби с
+ограничением ширины луча) за один проход выбирает самый вероятный
+номер, подходящий под любой шаблон. Замены символов, которые путает OCR
+(О/0, В/8, V→У, ...), и пропуск лишнего символа допускаются со штрафом,
+поэтому почти верное прочтение исправляется сразу, а не отбрасывается
+до следующего кадра.
+"""
+
+import re
+import math
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from plate_text import CONFUSION_GROUPS, clean_plate_query, normalize_plate_text
+from config import PLATE_BEAM_WIDTH, PLATE_CONFUSION_PENALTY, PLATE_SKIP_PENALTY
+
+# Буквы, допустимые в номерах (совпадают по начертанию с латиницей)
+PLATE_LETTERS = "АВЕКМНОРСТУХ"
+PLATE_DIGITS = "0123456789"
+
+# Формат: (шаблон, априорная доля среди номеров). L — буква, D — цифра,
+# R — регион из 2–3 цифр. Доля решает неоднозначные прочтения в пользу
+# распространённых форматов (8402ТЕ750 → В402ТЕ750)
+PLATE_FORMATS: Dict[str, Tuple[str, float]] = {
+    "standard": ("LDDDLLR", 0.84),    # тип 1: А000АА77, А000АА777
+    "taxi": ("LLDDDR", 0.04),         # тип 1А: такси и общественный транспорт, АА00077
+    "trailer": ("LLDDDDR", 0.04),     # тип 2: прицепы, АА000077
+    "motorcycle": ("DDDDLLR", 0.04),  # типы 3, 4: тракторы, мотоциклы (двухстрочные), 0000АА77
+    "transit": ("LLDDDLR", 0.02),     # тип 15: транзитные, АА000А77
+    "police": ("LDDDDR", 0.02),       # тип 20: полиция, А000077
+}
+
+# Подпись страны справа от региона (с частыми ошибками OCR: S → 5, латиница ↔ кириллица)
+COUNTRY_SUFFIXES = ("RUS", "RU5", "РУС", "РУ5", "RU", "РУ")
+
+# Одна альтернатива OCR для позиции: (символ, вероятность)
+Alternative = Tuple[str, float]
+
+
+class PlateReading(NamedTuple):
+    """Результат декодирования номера."""
+    plate: str
+    confidences: List[float]
+    format: str
+    score: float
+
+
+def _strip_country(alternatives: Sequence[Sequence[Alternative]]) -> Sequence[Sequence[Alternative]]:
+    """Отбрасывает прочитанную подпись "RUS" после региона."""
+    tail = "".join(options[0][0] for options in alternatives[-3:] if options).upper()
+    for suffix in COUNTRY_SUFFIXES:
+        if tail.endswith(suffix) and len(alternatives) - len(suffix) >= 6:
+            return alternatives[:-len(suffix)]
+    return alternatives
+
+
+def _expand(template: str) -> List[str]:
+    """Разворачивает R в варианты с 2 и 3 цифрами."""
+    if "R" not in template:
+        return [template]
+    head, tail = template.split("R", 1)
+    return [v for n in (2, 3) for v in _expand(head + "D" * n + tail)]
+
+
+@lru_cache(maxsize=None)
+def _choices(char: str, slot: str, confusion_logp: float) -> Tuple[Tuple[str, float], ...]:
+    """
+    Символы номера, в которые может превратиться символ OCR в позиции
+    класса slot, со штрафом (лог-вероятность).
+    """
+    allowed = PLATE_LETTERS if slot == "L" else PLATE_DIGITS
+    direct = normalize_plate_text(char.upper())
+    result = {direct: 0.0} if direct in allowed else {}
+    for group in CONFUSION_GROUPS:
+        members = {normalize_plate_text(c) for c in group}
+        if direct in members:
+            for member in members:
+                if member in allowed and member not in result:
+                    result[member] = confusion_logp
+    return tuple(result.items())
+
+
+class PlateGrammar:
+    """
+    Проверка и декодирование номеров по таблице форматов.
+    """
+
+    def __init__(self,
+                 formats: Optional[Dict[str, str]] = None,
+                 beam_width: int = PLATE_BEAM_WIDTH,
+                 confusion_penalty: float = PLATE_CONFUSION_PENALTY,
+                 skip_penalty: float = PLATE_SKIP_PENALTY):
+        """
+        Args:
+            formats (dict | None): {имя: (шаблон, доля)}; по умолчанию PLATE_FORMATS.
+            beam_width (int): Число гипотез, сохраняемых после каждого символа.
+            confusion_penalty (float): Множитель вероятности для замены
+                                       символа из группы путаницы OCR (0–1).
+            skip_penalty (float): Множитель вероятности для пропуска лишнего символа.
+        """
+        self.formats = dict(formats or PLATE_FORMATS)
+        self.beam_width = beam_width
+        self.confusion_logp = math.log(confusion_penalty)
+        self.skip_logp = math.log(skip_penalty)
+
+        # Развёрнутые шаблоны: [(формат, классы позиций)] и их лог-доли
+        self.templates: List[Tuple[str, str]] = [
+            (name, expanded) for name, (template, _) in self.formats.items()
+            for expanded in _expand(template)]
+        self._priors = [math.log(self.formats[name][1]) for name, _ in self.templates]
+        # Шаблоны с регионом из 3 цифр: последняя цифра необязательна для номера
+        # в целом, поэтому не дописывается заменой символа, за которым ещё что-то прочитано
+        self._optional_last = [
+            self.formats[name][0].endswith("R") and len(expanded) == len(self.formats[name][0]) + 2
+            for name, expanded in self.templates]
+
+        letters = f"[{PLATE_LETTERS}]"
+        self._patterns = [
+            (name, re.compile("".join(letters if c == "L" else r"\d" for c in template)))
+            for name, template in self.templates]
+        self._pattern = re.compile("|".join(f"(?:{p.pattern})" for _, p in self._patterns))
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Формат номера или None, если строка не подходит ни под один шаблон.
+
+        Args:
+            text (str): Номер (регистр, пробелы и латиница не важны).
+
+        Returns:
+            str | None: Имя формата.
+        """
+        plate = clean_plate_query(text)
+        if not self._pattern.fullmatch(plate):
+            return None
+        return next(name for name, p in self._patterns if p.fullmatch(plate))
+
+    def validate(self, text: str) -> Tuple[bool, str]:
+        """
+        Проверяет строку номера.
+
+        Args:
+            text (str): Номер.
+
+        Returns:
+            tuple: (подходит ли под шаблон, номер кириллицей без разделителей).
+        """
+        plate = clean_plate_query(text)
+        return bool(self._pattern.fullmatch(plate)), plate
+
+    def decode(self, alternatives: Sequence[Sequence[Alternative]]) -> Optional[PlateReading]:
+        """
+        Выбирает самый вероятный номер, подходящий под шаблоны, по
+        альтернативам OCR для каждого прочитанного символа.
+
+        Args:
+            alternatives (Sequence): Для каждого символа [(символ, вероятность)],
+                                     лучший — первым.
+
+        Returns:
+            PlateReading | None: Номер, уверенность каждого символа, формат и
+                                 средняя лог-вероятность; None, если номер не найден.
+        """
+        read_count = len(alternatives)
+        alternatives = _strip_country(alternatives)
+        # Состояние — (шаблон, позиция в шаблоне) → (лог-вероятность, символы, уверенности)
+        states: Dict[Tuple[int, int], Tuple[float, Tuple[str, ...], Tuple[float, ...]]] = {
+            (t, 0): (prior, (), ()) for t, prior in enumerate(self._priors)}
+
+        for i, options in enumerate(alternatives):
+            followed = i < read_count - 1
+            # Лучший вариант каждого символа номера для позиций-букв и позиций-цифр;
+            # "exact" — только прочитанные символы, без замен из групп путаницы
+            slots: Dict[str, Dict[str, Tuple[float, float]]] = {"L": {}, "D": {}, "exact": {}}
+            for char, prob in options:
+                if prob <= 0:
+                    continue
+                for slot in ("L", "D"):
+                    best = slots[slot]
+                    for plate_char, char_logp in _choices(char, slot, self.confusion_logp):
+                        logp = math.log(prob) + char_logp
+                        if plate_char not in best or logp > best[plate_char][0]:
+                            best[plate_char] = (logp, prob * math.exp(char_logp))
+                        exact = slots["exact"]
+                        if slot == "D" and char_logp == 0.0 and (
+                                plate_char not in exact or logp > exact[plate_char][0]):
+                            exact[plate_char] = (logp, prob)
+
+            new_states: Dict[Tuple[int, int], Tuple[float, Tuple[str, ...], Tuple[float, ...]]] = {}
+            for (t, pos), (logp, chars, confs) in states.items():
+                # Лишний символ (рамка, флаг, разделитель) пропускается со штрафом
+                key, score = (t, pos), logp + self.skip_logp
+                if key not in new_states or score > new_states[key][0]:
+                    new_states[key] = (score, chars, confs)
+                template = self.templates[t][1]
+                if pos >= len(template):
+                    continue
+                key = (t, pos + 1)
+                slot = template[pos]
+                if followed and self._optional_last[t] and pos == len(template) - 1:
+                    slot = "exact"
+                for plate_char, (char_logp, conf) in slots[slot].items():
+                    score = logp + char_logp
+                    if key not in new_states or score > new_states[key][0]:
+                        new_states[key] = (score, chars + (plate_char,), confs + (conf,))
+
+            states = dict(sorted(new_states.items(), key=lambda kv: kv[1][0],
+                                 reverse=True)[:self.beam_width])
+
+        complete = [(logp, chars, confs, t) for (t, pos), (logp, chars, confs) in states.items()
+                    if pos == len(self.templates[t][1])]
+        if not complete:
+            return None
+        logp, chars, confs, t = max(complete, key=lambda c: c[0])
+        return PlateReading("".join(chars), list(confs), self.templates[t][0],
+                            logp / max(len(chars), 1))
+
+    def decode_text(self, text: str, confidences: Optional[Sequence[float]] = None) -> Optional[PlateReading]:
+        """
+        Декодирует строку OCR без альтернатив (одна альтернатива на символ).
+
+        Args:
+            text (str): Прочитанный текст.
+            confidences (Sequence | None): Уверенность каждого символа.
+
+        Returns:
+            PlateReading | None: Результат декодирования.
+        """
+        pairs = [(ch, conf) for ch, conf in zip(text, confidences or [1.0] * len(text))
+                 if ch.isalnum()]
+        return self.decode([[(ch, max(conf, 1e-6))] for ch, conf in pairs])
+
+
+_grammar: Optional[PlateGrammar] = None
+_grammar_lock = threading.Lock()
+
+
+def get_plate_grammar() -> PlateGrammar:
+    """
+    Общая для процесса грамматика номеров (компилируется при первом обращении).
+
+    Returns:
+        PlateGrammar: Грамматика номеров.
+    """
+    global _grammar
+    if _grammar is None:
+        with _grammar_lock:
+            if _grammar is None:
+                _grammar = PlateGrammar()
+    return _grammar
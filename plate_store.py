@@ -0,0 +1,420 @@
+"""
+Модуль plate_store.py
+
+Журнал распознанных номеров в SQLite (режим WAL) с пакетной записью
+из фонового потока. Запись только добавляет строки; индексы по номеру,
+ключу путаницы OCR, времени и источнику позволяют искать проезды за
+миллисекунды на журнале в десятки миллионов событий. Для операторов
+доступны поиск и выгрузка в Excel по запросу.
+"""
+
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from config import PLATE_DB_PATH, PLATE_STORE_BATCH_SIZE, PLATE_STORE_FLUSH_INTERVAL, \
+    PLATE_STORE_QUEUE_SIZE, PLATE_EXPORT_PATH, PLATE_SEARCH_LIMIT
+from plate_text import clean_plate_query, confusion_key
+from metrics import PLATE_STORE_WRITE_SECONDS, EXCEL_EXPORT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recognitions (
+    id        INTEGER PRIMARY KEY,
+    ts        REAL    NOT NULL,
+    timestamp TEXT    NOT NULL,
+    plate     TEXT    NOT NULL,
+    sid       INTEGER,
+    source    TEXT,
+    plate_key TEXT
+);
+"""
+
+# Индексы поиска: точный номер и префикс, ключ путаницы OCR, период, источник
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_recognitions_plate_ts ON recognitions (plate, ts);
+CREATE INDEX IF NOT EXISTS idx_recognitions_key_ts ON recognitions (plate_key, ts);
+CREATE INDEX IF NOT EXISTS idx_recognitions_ts ON recognitions (ts);
+CREATE INDEX IF NOT EXISTS idx_recognitions_source_ts ON recognitions (source, ts);
+"""
+
+EXPORT_COLUMNS = ["timestamp", "plate", "sid", "source"]
+
+# Excel-журнал прежних версий (рядом с базой); импортируется в базу один раз
+LEGACY_XLSX_NAME = "recognized_plates.xlsx"
+# PRAGMA user_version после импорта прежнего журнала
+_LEGACY_IMPORTED = 1
+SEARCH_COLUMNS = ["ts", "timestamp", "plate", "sid", "source"]
+SEARCH_MODES = ("exact", "prefix", "fuzzy")
+
+# Верхняя граница диапазона для поиска по префиксу (больше любого символа)
+_PREFIX_END = "\U0010FFFF"
+
+
+def connect(db_path: str = PLATE_DB_PATH) -> sqlite3.Connection:
+    """
+    Открывает соединение с журналом и создаёт схему при необходимости.
+
+    Args:
+        db_path (str): Путь к файлу базы SQLite.
+
+    Returns:
+        sqlite3.Connection: Соединение в режиме WAL.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    _migrate(conn)
+    conn.executescript(INDEXES)
+    _import_legacy_excel(conn, os.path.join(os.path.dirname(db_path), LEGACY_XLSX_NAME))
+    return conn
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Добавляет ключ путаницы OCR в журналы, созданные до появления поиска."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(recognitions)")}
+    if "plate_key" in columns:
+        return
+    logger.info("🔧 Журнал номеров: добавление ключа поиска к существующим записям...")
+    try:
+        conn.execute("ALTER TABLE recognitions ADD COLUMN plate_key TEXT")
+    except sqlite3.OperationalError as e:
+        # Столбец уже добавлен другим процессом
+        if "duplicate column" not in str(e):
+            raise
+    conn.create_function("confusion_key", 1, confusion_key, deterministic=True)
+    with conn:
+        conn.execute("UPDATE recognitions SET plate_key = confusion_key(plate) "
+                     "WHERE plate_key IS NULL")
+
+
+def _import_legacy_excel(conn: sqlite3.Connection, xlsx_path: str) -> None:
+    """
+    Однократно переносит записи Excel-журнала прежних версий в базу, чтобы
+    проезды до перехода на SQLite находились поиском и попадали в выгрузку.
+    Строки, уже имеющиеся в базе, не дублируются; файл не изменяется.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= _LEGACY_IMPORTED:
+        return
+
+    rows = []
+    if os.path.exists(xlsx_path):
+        try:
+            df = pd.read_excel(xlsx_path)
+        except Exception as e:
+            # Повторная попытка — при следующем запуске
+            logger.error(f"[ERROR] Не удалось прочитать {xlsx_path}: {e}")
+            return
+        for record in df.to_dict("records"):
+            try:
+                timestamp = str(record["timestamp"])[:19]
+                ts = time.mktime(time.strptime(timestamp, "%Y-%m-%d %H:%M:%S"))
+                plate = str(record["plate"])
+                sid = int(record["sid"]) if pd.notna(record.get("sid")) else None
+                source = str(record["source"]) if pd.notna(record.get("source")) else None
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append((ts, timestamp, plate, sid, source, confusion_key(plate)))
+
+    # Блокировка записи: журнал могут одновременно открыть несколько процессов
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < _LEGACY_IMPORTED:
+            imported = 0
+            for row in rows:
+                exists = conn.execute(
+                    "SELECT 1 FROM recognitions WHERE plate = ? AND ts = ? AND sid IS ? AND source IS ?",
+                    (row[2], row[0], row[3], row[4])).fetchone()
+                if exists is None:
+                    conn.execute(
+                        "INSERT INTO recognitions (ts, timestamp, plate, sid, source, plate_key) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", row)
+                    imported += 1
+            conn.execute(f"PRAGMA user_version = {_LEGACY_IMPORTED}")
+            if rows:
+                logger.info(f"📥 Импортировано {imported} записей из {xlsx_path}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+class PlateStore:
+    """
+    Журнал распознаваний с фоновым потоком пакетной записи.
+    """
+
+    def __init__(self,
+                 db_path: str = PLATE_DB_PATH,
+                 batch_size: int = PLATE_STORE_BATCH_SIZE,
+                 flush_interval: float = PLATE_STORE_FLUSH_INTERVAL,
+                 queue_size: int = PLATE_STORE_QUEUE_SIZE):
+        """
+        Args:
+            db_path (str): Путь к файлу базы SQLite.
+            batch_size (int): Максимальный размер пакета вставки.
+            flush_interval (float): Максимальная задержка записи события, сек.
+            queue_size (int): Ёмкость очереди событий.
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._flushed = threading.Condition()
+
+        self.written = 0
+        self.dropped = 0
+
+        # Схема создаётся сразу, чтобы читатели не ждали первой записи
+        connect(self.db_path).close()
+
+        self._thread = threading.Thread(
+            target=self._run, name="plate-store", daemon=True)
+        self._thread.start()
+
+    def add(self, ts: float, plate: str, sid: int, source: str) -> bool:
+        """
+        Ставит событие распознавания в очередь на запись (не блокирует).
+
+        Args:
+            ts (float): Время события (unix time).
+            plate (str): Номер.
+            sid (int): Идентификатор трека.
+            source (str): Источник видео.
+
+        Returns:
+            bool: False, если очередь переполнена и событие отброшено.
+        """
+        row = (ts, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts)),
+               plate, int(sid), str(source), confusion_key(plate))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(
+                f"[DROP] Очередь журнала переполнена, номер '{plate}' не записан")
+            return False
+
+    def _run(self) -> None:
+        conn = connect(self.db_path)
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                try:
+                    batch = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    self._notify_flushed()
+                    continue
+
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                started = time.perf_counter()
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO recognitions (ts, timestamp, plate, sid, source, plate_key) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", batch)
+                    self.written += len(batch)
+                    PLATE_STORE_WRITE_SECONDS.observe(time.perf_counter() - started)
+                    logger.debug(
+                        f"[SAVE] {len(batch)} номер(ов) записано в {self.db_path}")
+                except sqlite3.Error as e:
+                    logger.error(
+                        f"[ERROR] Не удалось записать в {self.db_path}: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                self._notify_flushed()
+        finally:
+            conn.close()
+            self._notify_flushed()
+
+    def _notify_flushed(self) -> None:
+        with self._flushed:
+            self._flushed.notify_all()
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Дожидается записи всех событий, поставленных в очередь.
+
+        Args:
+            timeout (float): Максимальное время ожидания, сек.
+        """
+        deadline = time.time() + timeout
+        with self._flushed:
+            while self._queue.unfinished_tasks and time.time() < deadline and self._thread.is_alive():
+                self._flushed.wait(0.1)
+
+    def close(self) -> None:
+        """Записывает оставшиеся события и останавливает фоновый поток."""
+        self._stop.set()
+        self._thread.join(timeout=10)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика журнала.
+
+        Returns:
+            dict: written — записано, pending — в очереди, dropped — отброшено.
+        """
+        return {
+            "written": self.written,
+            "pending": self._queue.qsize(),
+            "dropped": self.dropped,
+        }
+
+
+def export_to_excel(xlsx_path: Optional[str] = None,
+                    db_path: str = PLATE_DB_PATH,
+                    since: Optional[float] = None,
+                    until: Optional[float] = None) -> str:
+    """
+    Выгружает журнал распознаваний в Excel.
+
+    Args:
+        xlsx_path (str | None): Путь к файлу .xlsx (по умолчанию PLATE_EXPORT_PATH;
+                                Excel-журнал прежних версий не перезаписывается).
+        db_path (str): Путь к файлу базы SQLite.
+        since (float | None): Начало периода (unix time).
+        until (float | None): Конец периода (unix time).
+
+    Returns:
+        str: Путь к созданному файлу.
+    """
+    xlsx_path = xlsx_path or PLATE_EXPORT_PATH
+
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM recognitions WHERE 1=1"
+    params = []
+    if since is not None:
+        query += " AND ts >= ?"
+        params.append(since)
+    if until is not None:
+        query += " AND ts < ?"
+        params.append(until)
+    query += " ORDER BY id"
+
+    started = time.perf_counter()
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(query, conn, params=params)
+    finally:
+        conn.close()
+
+    os.makedirs(os.path.dirname(xlsx_path) or ".", exist_ok=True)
+    df.to_excel(xlsx_path, index=False)
+    EXCEL_EXPORT_SECONDS.observe(time.perf_counter() - started)
+    logger.info(f"[EXPORT] {len(df)} записей выгружено в {xlsx_path}")
+    return xlsx_path
+
+
+def search_plates(plate: str = "",
+                  mode: str = "exact",
+                  since: Optional[float] = None,
+                  until: Optional[float] = None,
+                  source: Optional[str] = None,
+                  limit: int = PLATE_SEARCH_LIMIT,
+                  db_path: str = PLATE_DB_PATH) -> List[Dict[str, Any]]:
+    """
+    Ищет проезды номера в журнале (последние — первыми).
+
+    Args:
+        plate (str): Номер или его начало; регистр, пробелы и латиница
+                     не важны. Пустая строка — все номера за период.
+        mode (str): "exact" — точное совпадение, "prefix" — по началу номера,
+                    "fuzzy" — с учётом путаницы OCR (О/0, В/8, У/V/Y, ...).
+        since (float | None): Начало периода (unix time).
+        until (float | None): Конец периода (unix time).
+        source (str | None): Источник видео.
+        limit (int): Максимальное число записей.
+        db_path (str): Путь к файлу базы SQLite.
+
+    Returns:
+        list: Записи {"ts", "timestamp", "plate", "sid", "source"}.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Неизвестный режим поиска: {mode} (допустимо: {SEARCH_MODES})")
+
+    query = f"SELECT {', '.join(SEARCH_COLUMNS)} FROM recognitions WHERE 1=1"
+    params: List[Any] = []
+    plate = clean_plate_query(plate)
+    if plate and mode == "exact":
+        query += " AND plate = ?"
+        params.append(plate)
+    elif plate and mode == "prefix":
+        # Диапазон вместо LIKE: LIKE без учёта регистра не использует индекс
+        query += " AND plate >= ? AND plate < ?"
+        params += [plate, plate + _PREFIX_END]
+    elif plate:
+        query += " AND plate_key = ?"
+        params.append(confusion_key(plate))
+    if since is not None:
+        query += " AND ts >= ?"
+        params.append(since)
+    if until is not None:
+        query += " AND ts < ?"
+        params.append(until)
+    if source:
+        query += " AND source = ?"
+        params.append(source)
+    query += " ORDER BY ts DESC LIMIT ?"
+    params.append(max(int(limit), 1))
+
+    conn = connect(db_path)
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return [dict(zip(SEARCH_COLUMNS, row)) for row in rows]
+
+
+_store: Optional[PlateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_plate_store() -> PlateStore:
+    """
+    Возвращает общий для процесса журнал распознаваний (создаётся при первом вызове).
+
+    Returns:
+        PlateStore: Журнал распознаваний.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PlateStore()
+            atexit.register(_store.close)
+        return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Выгрузка журнала распознанных номеров в Excel и поиск номеров")
+    parser.add_argument("--output", default=None,
+                        help=f"путь к .xlsx (по умолчанию {PLATE_EXPORT_PATH})")
+    parser.add_argument("--search", default=None, help="номер для поиска вместо выгрузки")
+    parser.add_argument("--mode", choices=SEARCH_MODES, default="exact")
+    parser.add_argument("--source", default=None)
+    parser.add_argument("--limit", type=int, default=PLATE_SEARCH_LIMIT)
+    args = parser.parse_args()
+    if args.search is not None:
+        for row in search_plates(args.search, args.mode, source=args.source, limit=args.limit):
+            print(f"{row['timestamp']}  {row['plate']:<10} SID {row['sid']:<6} {row['source']}")
+    else:
+        print(export_to_excel(args.output))
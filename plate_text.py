@@ -0,0 +1,69 @@
+"""
+Модуль plate_text.py
+
+Нормализация текста номеров без зависимостей от OCR: латинские буквы,
+совпадающие по начертанию с кириллическими, заменяются кириллицей, а
+ключ путаницы OCR сводит неразличимые для OCR символы (О/0, В/8, У/V/Y)
+к одному представителю, чтобы номер находился независимо от того, как
+именно он был прочитан.
+"""
+
+from typing import Dict
+
+# Латиница → кириллица (допустимые в номерах буквы)
+LATIN_TO_CYRILLIC: Dict[str, str] = {
+    "A": "А", "B": "В", "E": "Е", "K": "К", "M": "М",
+    "H": "Н", "O": "О", "P": "Р", "C": "С", "T": "Т",
+    "Y": "У", "X": "Х",
+    "a": "А", "b": "В", "e": "Е", "k": "К", "m": "М",
+    "h": "Н", "o": "О", "p": "Р", "c": "С", "t": "Т",
+    "y": "У", "x": "Х"
+}
+
+# Группы символов, которые OCR путает между собой; первый — представитель группы
+CONFUSION_GROUPS = ("0ОOQD", "1I", "8ВB", "5S", "2Z", "УYV")
+
+_LATIN_TABLE = str.maketrans(LATIN_TO_CYRILLIC)
+_CONFUSION_TABLE = str.maketrans(
+    {c: group[0] for group in CONFUSION_GROUPS for c in group[1:]})
+
+
+def normalize_plate_text(text: str) -> str:
+    """
+    Заменяет латинские буквы кириллическими.
+
+    Args:
+        text (str): Текст номера.
+
+    Returns:
+        str: Текст с кириллическими буквами.
+    """
+    return text.translate(_LATIN_TABLE)
+
+
+def clean_plate_query(text: str) -> str:
+    """
+    Приводит введённый номер к виду журнала: верхний регистр, без пробелов
+    и дефисов, кириллица.
+
+    Args:
+        text (str): Номер, введённый оператором.
+
+    Returns:
+        str: Номер в формате журнала.
+    """
+    return normalize_plate_text(text.upper().replace(" ", "").replace("-", ""))
+
+
+def confusion_key(plate: str) -> str:
+    """
+    Ключ номера, одинаковый для вариантов прочтения, различающихся
+    только символами из CONFUSION_GROUPS.
+
+    Args:
+        plate (str): Номер.
+
+    Returns:
+        str: Ключ путаницы OCR.
+    """
+    return clean_plate_query(plate).translate(_CONFUSION_TABLE)
@@ -0,0 +1,187 @@
+"""
+Модуль snapshot_saver.py
+
+Асинхронное сохранение снимков обнаруженных ТС: кодирование JPEG и запись
+на диск выполняются пулом фоновых потоков. Снимок сохраняется один раз
+на событие трека (появление SID) и повторно — только при более
+качественном прочтении номера.
+"""
+
+import os
+import cv2
+import queue
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from config import SAVE_DIR, SNAPSHOT_WORKERS, SNAPSHOT_QUEUE_SIZE, SNAPSHOT_JPEG_QUALITY
+from metrics import SNAPSHOT_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotSaver:
+    """
+    Пул потоков для кодирования и записи снимков с дедупликацией по SID.
+    """
+
+    def __init__(self,
+                 workers: int = SNAPSHOT_WORKERS,
+                 queue_size: int = SNAPSHOT_QUEUE_SIZE,
+                 jpeg_quality: int = SNAPSHOT_JPEG_QUALITY):
+        """
+        Args:
+            workers (int): Количество потоков кодирования/записи.
+            queue_size (int): Ёмкость очереди снимков.
+            jpeg_quality (int): Качество JPEG (0–100).
+        """
+        self.jpeg_quality = jpeg_quality
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+
+        # {(метка потока, SID): оценка прочтения последнего снимка}
+        self._emitted: Dict[Tuple[str, int], int] = {}
+
+        self.submitted = 0
+        self.written = 0
+        self.overflow = 0
+        self.deduplicated = 0
+
+        self._threads = [
+            threading.Thread(target=self._run, name=f"snapshot-{i}", daemon=True)
+            for i in range(max(int(workers), 1))]
+        for t in self._threads:
+            t.start()
+
+    @staticmethod
+    def plate_score(plate: str, locked: bool) -> int:
+        """
+        Оценка качества прочтения номера для выбора снимка.
+
+        Args:
+            plate (str): Номер (пустая строка — не распознан).
+            locked (bool): Номер зафиксирован согласованием прочтений.
+
+        Returns:
+            int: 0 — номера нет, 1 — номер прочитан, 2 — номер зафиксирован.
+        """
+        if not plate:
+            return 0
+        return 2 if locked else 1
+
+    def submit(self, frame: np.ndarray, stream_label: str, sid: int,
+               plate: str, score: int) -> bool:
+        """
+        Ставит снимок в очередь, если это новое событие трека или лучшее прочтение.
+
+        Кадр не копируется: после передачи его нельзя изменять.
+
+        Args:
+            frame (np.ndarray): Полный кадр с отрисовкой.
+            stream_label (str): Метка источника.
+            sid (int): Идентификатор трека.
+            plate (str): Номер (может быть пустым).
+            score (int): Оценка прочтения (см. plate_score).
+
+        Returns:
+            bool: True, если снимок поставлен в очередь.
+        """
+        key = (stream_label, sid)
+        prev_score = self._emitted.get(key)
+        # Смена текста при той же оценке (колебания прочтений) — не повод для снимка
+        if prev_score is not None and score <= prev_score:
+            self.deduplicated += 1
+            return False
+
+        try:
+            self._queue.put_nowait((frame, stream_label, sid, plate))
+        except queue.Full:
+            # Событие не сохранено — повторим попытку на следующем кадре
+            with self._lock:
+                self.overflow += 1
+            return False
+
+        self._emitted[key] = score
+        self.submitted += 1
+        return True
+
+    def forget(self, stream_label: str, sids) -> None:
+        """
+        Забывает треки с истёкшим SID_TTL (следующее появление — новое событие).
+
+        Args:
+            stream_label (str): Метка источника.
+            sids (Iterable[int]): Удалённые SID.
+        """
+        for sid in sids:
+            self._emitted.pop((stream_label, sid), None)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            try:
+                self._write(*item)
+            except Exception:
+                logger.exception("❌ Ошибка сохранения снимка")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, frame: np.ndarray, stream_label: str, sid: int, plate: str) -> None:
+        with SNAPSHOT_WRITE_SECONDS.time():
+            self._write_jpeg(frame, stream_label, sid, plate)
+
+    def _write_jpeg(self, frame: np.ndarray, stream_label: str, sid: int, plate: str) -> None:
+        now = datetime.now()
+        date_dir = Path(f"{SAVE_DIR}/images/{now:%Y-%m-%d}")
+        os.makedirs(date_dir, exist_ok=True)
+
+        # Миллисекунды и SID в имени исключают перезапись снимков
+        timestamp = now.strftime("%Y-%m-%d_%H-%M-%S-%f")[:-3]
+        image_path = date_dir / f"{timestamp}_{stream_label}_sid{sid}_{plate}.jpg"
+
+        ok, buffer = cv2.imencode(
+            ".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            logger.error(f"[ERROR] Не удалось закодировать снимок {image_path}")
+            return
+        buffer.tofile(str(image_path))
+
+        with self._lock:
+            self.written += 1
+        logger.info(f"Обнаружен объект: {plate} | Сохранено: {image_path}")
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Дожидается записи оставшихся снимков и останавливает потоки.
+
+        Args:
+            timeout (float): Максимальное время ожидания каждого потока, сек.
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика сохранения снимков.
+
+        Returns:
+            dict: submitted, written, pending, overflow (отброшено при
+                  переполнении очереди), deduplicated (пропущено как повтор).
+        """
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "pending": self._queue.qsize(),
+                "overflow": self.overflow,
+                "deduplicated": self.deduplicated,
+            }
@@ -0,0 +1,181 @@
+"""
+Модуль stream_state.py
+
+Состояние одного видеопотока: трекер ByteTrack, привязка номеров к SID
+и время последнего появления треков. В многокамерном режиме каждый
+поток имеет собственный экземпляр StreamState, а модели общие.
+"""
+
+from pathlib import Path
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from supervision import Detections, ByteTrack
+
+from plate_consensus import PlateConsensus
+from config import CONFIDENCE_THRESHOLD, PLATE_LOG_INTERVAL, SID_TTL
+
+VIDEO_FILE_EXTENSIONS = (".avi", ".mp4", ".mkv")
+
+
+def parse_video_source(value: Any) -> Tuple[Any, str, bool]:
+    """
+    Разбирает значение источника из config.json.
+
+    Args:
+        value (Any): "0" для веб-камеры, rtsp://... или путь к видеофайлу.
+
+    Returns:
+        tuple: (источник для cv2.VideoCapture, метка источника, признак видеофайла).
+    """
+    source = 0 if str(value) == "0" else value
+    label = "webcam" if str(source) == "0" else "ipcam" if str(
+        source).startswith("rtsp") else Path(str(source)).stem
+    is_file = isinstance(source, str) and source.lower().endswith(
+        VIDEO_FILE_EXTENSIONS)
+    return source, label, is_file
+
+
+class StreamState:
+    """
+    Состояние треков и номеров одного видеопотока.
+    """
+
+    def __init__(self, source: Any, label: str, is_file_source: bool,
+                 plate_validator=None, motion_gate=None, propagator=None):
+        """
+        Args:
+            source (Any): Источник видео (индекс камеры, RTSP URL или путь к файлу).
+            label (str): Метка источника для имён файлов и окон.
+            is_file_source (bool): Источник — видеофайл.
+            plate_validator (Callable | None): Проверка формата номера для
+                согласования прочтений (PlateRecognizer.is_license_plate).
+            motion_gate (MotionGate | None): Фильтр движения перед детекторами.
+            propagator (TrackPropagator | None): Перенос боксов треков на кадры без инференса.
+        """
+        self.source = source
+        self.label = label
+        self.is_file_source = is_file_source
+
+        self.tracker = ByteTrack()
+        self.consensus = PlateConsensus(validator=plate_validator)
+        self.motion_gate = motion_gate
+        self.propagator = propagator
+
+        self.stable_boxes: Dict[int, Any] = {}
+        self.sid_last_seen: Dict[int, float] = {}
+        self.plate_by_sid: Dict[int, str] = defaultdict(lambda: "")
+        self.plate_to_sid: Dict[str, int] = {}
+        self.sid_last_plate_time: Dict[int, float] = defaultdict(lambda: 0)
+        self.plate_last_log: Dict[str, int] = defaultdict(
+            lambda: 0)  # {plate_number: timestamp}
+
+    def update_tracks(self, detections: Detections) -> Detections:
+        """
+        Обновляет трекер потока детекциями текущего кадра.
+
+        Args:
+            detections (Detections): Детекции транспортных средств.
+
+        Returns:
+            Detections: Треки с присвоенными SID.
+        """
+        return self.tracker.update_with_detections(detections)
+
+    def resolve_assignments(self, plate_matches: Dict[int, int]) -> Dict[int, str]:
+        """
+        Формирует номера текущего кадра из согласованных прочтений.
+
+        Args:
+            plate_matches (dict): Соответствия {SID: индекс номера} текущего кадра.
+
+        Returns:
+            dict: Соответствия {SID: plate_text} (без пустых и повторяющихся номеров).
+        """
+        assignments: Dict[int, str] = {}
+        used_plates = set()
+        for sid in plate_matches:
+            plate_text = self.consensus.plate(sid)
+            if plate_text and plate_text not in used_plates:
+                assignments[sid] = plate_text
+                used_plates.add(plate_text)
+        return assignments
+
+    def apply_assignments(self, plate_assignments: Dict[int, str], current_time: float) -> None:
+        """
+        Обновляет номера, закреплённые за SID.
+
+        Args:
+            plate_assignments (dict): Соответствия {SID: plate_text} текущего кадра.
+            current_time (float): Время кадра.
+        """
+        timestamp = int(current_time)
+        for assigned_sid, plate_text in plate_assignments.items():
+            last_plate = self.plate_by_sid.get(assigned_sid)
+            if plate_text != last_plate:
+                self.plate_by_sid[assigned_sid] = plate_text
+                self.sid_last_plate_time[assigned_sid] = current_time
+                last_time = self.plate_last_log.get(plate_text, 0)
+                if timestamp - last_time >= PLATE_LOG_INTERVAL:
+                    # обновить время записи
+                    self.plate_last_log[plate_text] = timestamp
+
+    def collect_labels(self, tracks: Detections, current_time: float) -> List[Tuple[int, Tuple[int, int, int, int], str]]:
+        """
+        Отмечает видимые треки и формирует подписи для отрисовки.
+
+        Args:
+            tracks (Detections): Треки текущего кадра.
+            current_time (float): Время кадра.
+
+        Returns:
+            list: [(sid, (x1, y1, x2, y2), plate_text)].
+        """
+        labels = []
+        for track in tracks:
+            bbox, conf, sid = track[0], track[2], int(track[4])
+
+            if conf < CONFIDENCE_THRESHOLD:
+                continue
+
+            self.stable_boxes[sid] = bbox
+            self.sid_last_seen[sid] = current_time
+            labels.append((sid, tuple(map(int, bbox.tolist())),
+                           self.plate_by_sid.get(sid, "")))
+        return labels
+
+    def locked_plates(self, labels: List[Tuple[int, Tuple[int, int, int, int], str]]) -> Dict[int, str]:
+        """
+        Зафиксированные номера видимых треков.
+
+        Args:
+            labels (list): Подписи кадра [(sid, bbox, plate_text)].
+
+        Returns:
+            dict: {SID: зафиксированный номер} (только треки с фиксацией).
+        """
+        return {sid: self.consensus.locked[sid] for sid, _, _ in labels
+                if self.consensus.is_locked(sid)}
+
+    def expire(self, current_time: float) -> List[int]:
+        """
+        Удаляет SID, не появлявшиеся дольше SID_TTL.
+
+        Args:
+            current_time (float): Время кадра.
+
+        Returns:
+            list: Удалённые SID.
+        """
+        expired_sids = [sid for sid, last_seen in self.sid_last_seen.items()
+                        if current_time - last_seen > SID_TTL]
+        for sid in expired_sids:
+            self.stable_boxes.pop(sid, None)
+            self.sid_last_seen.pop(sid, None)
+            self.consensus.drop(sid)
+            if sid in self.plate_by_sid:
+                old_plate = self.plate_by_sid[sid]
+                if old_plate in self.plate_to_sid:
+                    del self.plate_to_sid[old_plate]
+                del self.plate_by_sid[sid]
+        return expired_sids
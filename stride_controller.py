@@ -0,0 +1,255 @@
+"""
+Модуль stride_controller.py
+
+Адаптивный шаг обработки кадров (frame_skip) для живых источников.
+Шаг пересчитывается после каждого пакета инференса по измеренному
+времени обработки кадра, фактической частоте кадров источника
+и количеству живых треков. Камеры одного узла делят общий бюджет
+времени инференса: занятые сцены получают большую долю, пустые —
+меньшую. Камера без живых треков обрабатывается с шагом не меньше
+idle_stride и при одной камере на узле.
+"""
+
+import math
+import time
+import threading
+from typing import Dict, List, Optional
+
+from config import (STRIDE_TARGET_LATENCY, STRIDE_CPU_BUDGET, STRIDE_MIN, STRIDE_MAX,
+                    STRIDE_EMA_ALPHA, STRIDE_ACTIVE_WEIGHT, STRIDE_IDLE)
+
+
+class StrideController:
+    """
+    Шаг обработки кадров одного потока.
+
+    Поток захвата вызывает on_frame() на каждом прочитанном кадре и
+    передаёт на инференс кадр, когда should_process() возвращает True.
+    """
+
+    def __init__(self, label: str, min_stride: int = STRIDE_MIN, max_stride: int = STRIDE_MAX,
+                 alpha: float = STRIDE_EMA_ALPHA, idle_stride: int = STRIDE_IDLE):
+        """
+        Args:
+            label (str): Метка потока.
+            min_stride (int): Минимальный шаг (1 — каждый кадр).
+            max_stride (int): Максимальный шаг.
+            alpha (float): Коэффициент экспоненциального сглаживания измерений.
+            idle_stride (int): Минимальный шаг при отсутствии живых треков.
+        """
+        self.label = label
+        self.min_stride = max(int(min_stride), 1)
+        self.max_stride = max(int(max_stride), self.min_stride)
+        self.idle_stride = min(max(int(idle_stride), self.min_stride), self.max_stride)
+        self.alpha = alpha
+
+        self.stride = self.min_stride
+        self.source_fps = 0.0
+        self.frame_cost = 0.0  # сек инференса на кадр
+        self.latency = 0.0  # сек от захвата до конца инференса
+        self.live_tracks = 0
+        # Множитель шага при превышении целевой задержки (>= 1)
+        self.pressure = 1.0
+
+        self._last_read: Optional[float] = None
+        self._since_emit = 0
+
+    def _ema(self, old: float, value: float) -> float:
+        return value if old <= 0 else old + self.alpha * (value - old)
+
+    def on_frame(self, now: Optional[float] = None) -> None:
+        """
+        Учитывает прочитанный кадр для оценки частоты кадров источника.
+
+        Args:
+            now (float | None): Момент чтения (по умолчанию — текущий).
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_read is not None:
+            interval = now - self._last_read
+            if interval > 0:
+                self.source_fps = self._ema(self.source_fps, 1.0 / interval)
+        self._last_read = now
+
+    def should_process(self) -> bool:
+        """
+        Решает, передавать ли очередной кадр на инференс.
+
+        Returns:
+            bool: True для каждого stride-го кадра.
+        """
+        self._since_emit += 1
+        if self._since_emit >= self.stride:
+            self._since_emit = 0
+            return True
+        return False
+
+    def observe(self, frame_cost: float, latency: float, live_tracks: int) -> None:
+        """
+        Учитывает результат инференса кадра потока.
+
+        Args:
+            frame_cost (float): Время инференса, приходящееся на кадр, сек.
+            latency (float): Задержка от захвата до конца инференса, сек.
+            live_tracks (int): Количество живых треков после кадра.
+        """
+        self.frame_cost = self._ema(self.frame_cost, frame_cost)
+        self.latency = self._ema(self.latency, latency)
+        self.live_tracks = live_tracks
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Состояние регулятора.
+
+        Returns:
+            dict: stride, source_fps, frame_cost_ms, latency_ms, live_tracks, pressure.
+        """
+        return {
+            "stride": self.stride,
+            "source_fps": round(self.source_fps, 1),
+            "frame_cost_ms": round(self.frame_cost * 1000, 1),
+            "latency_ms": round(self.latency * 1000, 1),
+            "live_tracks": self.live_tracks,
+            "pressure": round(self.pressure, 2),
+        }
+
+
+class StrideBudget:
+    """
+    Общий бюджет времени инференса для всех потоков узла.
+
+    Бюджет задаётся долей времени потока инференса (cpu_budget) и/или
+    целевой задержкой от захвата до результата (target_latency).
+    Доля потока пропорциональна весу 1 + STRIDE_ACTIVE_WEIGHT * min(треки, 4);
+    поток без живых треков, кроме того, не опускается ниже idle_stride.
+    """
+
+    def __init__(self,
+                 target_latency: Optional[float] = STRIDE_TARGET_LATENCY,
+                 cpu_budget: float = STRIDE_CPU_BUDGET,
+                 active_weight: float = STRIDE_ACTIVE_WEIGHT):
+        """
+        Args:
+            target_latency (float | None): Целевая задержка, сек (None — не учитывается).
+            cpu_budget (float): Доля времени потока инференса, отводимая всем камерам (0–1].
+            active_weight (float): Прибавка к весу потока за каждый живой трек.
+        """
+        self.target_latency = target_latency
+        self.cpu_budget = min(max(cpu_budget, 0.05), 1.0)
+        self.active_weight = active_weight
+
+        self._lock = threading.Lock()
+        self.controllers: Dict[str, StrideController] = {}
+
+    def register(self, controller: StrideController) -> StrideController:
+        """
+        Подключает регулятор потока к бюджету.
+
+        Returns:
+            StrideController: Тот же регулятор.
+        """
+        with self._lock:
+            self.controllers[controller.label] = controller
+        return controller
+
+    def _weight(self, controller: StrideController) -> float:
+        return 1.0 + self.active_weight * min(controller.live_tracks, 4)
+
+    def observe_batch(self, packets: List[dict], elapsed: float,
+                      now: Optional[float] = None) -> None:
+        """
+        Учитывает пакет инференса и пересчитывает шаги всех потоков.
+
+        Args:
+            packets (list): Обработанные пакеты (packet["stream"].label, packet["timestamp"]).
+            elapsed (float): Время обработки пакета, сек.
+            now (float | None): Текущее время в шкале packet["timestamp"].
+        """
+        if not packets:
+            return
+        now = time.time() if now is None else now
+        frame_cost = elapsed / len(packets)
+
+        with self._lock:
+            for packet in packets:
+                stream = packet["stream"]
+                controller = self.controllers.get(stream.label)
+                if controller is not None:
+                    controller.observe(frame_cost, now - packet["timestamp"],
+                                       len(stream.sid_last_seen))
+            self._rebalance()
+
+    def _rebalance(self) -> None:
+        controllers = list(self.controllers.values())
+        total_weight = sum(self._weight(c) for c in controllers) or 1.0
+
+        for c in controllers:
+            if c.frame_cost <= 0 or c.source_fps <= 0:
+                continue
+
+            # Шаг, при котором поток укладывается в свою долю бюджета
+            share = self.cpu_budget * self._weight(c) / total_weight
+            stride = c.source_fps * c.frame_cost / share
+
+            # Превышение целевой задержки — мультипликативное увеличение шага,
+            # запас по задержке — плавный возврат
+            if self.target_latency:
+                if c.latency > self.target_latency:
+                    c.pressure = min(c.pressure * 1.25, float(c.max_stride))
+                else:
+                    c.pressure = max(c.pressure * 0.95, 1.0)
+
+            # Пустая сцена обрабатывается только для появления новых ТС — не чаще
+            # idle_stride независимо от доли бюджета (в том числе у единственной камеры)
+            floor = c.idle_stride if c.live_tracks == 0 else c.min_stride
+            c.stride = min(max(math.ceil(stride * c.pressure), floor), c.max_stride)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Состояние регуляторов всех потоков.
+
+        Returns:
+            dict: {метка потока: StrideController.stats()}.
+        """
+        with self._lock:
+            return {label: c.stats() for label, c in self.controllers.items()}
+
+
+def create_stride_budget(settings: Optional[Dict]) -> Optional[StrideBudget]:
+    """
+    Создаёт общий бюджет по разделу "adaptive_stride" config.json.
+
+    Args:
+        settings (dict | None): {"enabled": bool, "target_latency": сек, "cpu_budget": доля,
+                                 "min_stride": int, "max_stride": int, "idle_stride": int}.
+
+    Returns:
+        StrideBudget | None: Бюджет или None, если адаптивный шаг выключен.
+    """
+    if not settings or not settings.get("enabled", False):
+        return None
+    return StrideBudget(target_latency=settings.get("target_latency", STRIDE_TARGET_LATENCY),
+                        cpu_budget=float(settings.get("cpu_budget", STRIDE_CPU_BUDGET)))
+
+
+def create_stride_controller(settings: Optional[Dict], budget: Optional[StrideBudget],
+                             label: str) -> Optional[StrideController]:
+    """
+    Создаёт регулятор шага потока и подключает его к бюджету.
+
+    Args:
+        settings (dict | None): Раздел "adaptive_stride" config.json.
+        budget (StrideBudget | None): Общий бюджет (None — шаг статический).
+        label (str): Метка потока.
+
+    Returns:
+        StrideController | None: Регулятор или None.
+    """
+    if budget is None:
+        return None
+    settings = settings or {}
+    return budget.register(StrideController(
+        label,
+        min_stride=settings.get("min_stride", STRIDE_MIN),
+        max_stride=settings.get("max_stride", STRIDE_MAX),
+        idle_stride=settings.get("idle_stride", STRIDE_IDLE)))
@@ -0,0 +1,40 @@
+"""
+Проверки привязки номеров к автомобилям (plate_assignment.py).
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+from plate_assignment import assign_plates_to_vehicles, match_plates_to_tracks
+
+
+def plate_at(cx, cy):
+    return (cx - 20, cy - 8, cx + 20, cy + 8)
+
+
+# Пересекающиеся автомобили: SID 1 — ближний, SID 2 частично закрыт им
+TRACKS = [((0, 0, 200, 200), None, 0.9, None, 1),
+          ((90, 90, 300, 300), None, 0.9, None, 2)]
+
+
+def test_overlapping_vehicles_optimal_assignment():
+    # Номер 0 лежит в обоих bbox и ближе к центру SID 1; жадный выбор отдал бы
+    # его SID 1, и номер 1 (только внутри SID 1) остался бы без автомобиля
+    plates = [plate_at(110, 110), plate_at(30, 30)]
+    assert match_plates_to_tracks(plates, TRACKS) == {1: 1, 2: 0}
+
+
+def test_plate_outside_vehicles_is_not_assigned():
+    plates = [plate_at(30, 30), plate_at(400, 400)]
+    assert match_plates_to_tracks(plates, TRACKS) == {1: 0}
+
+
+def test_empty_inputs():
+    assert match_plates_to_tracks([], TRACKS) == {}
+    assert match_plates_to_tracks([plate_at(30, 30)], []) == {}
+
+
+def test_assign_texts_skips_empty_and_repeated():
+    plates = [plate_at(110, 110), plate_at(30, 30), plate_at(250, 250)]
+    texts = ["А123ВС77", "", "А123ВС77"]
+    assert assign_plates_to_vehicles(plates, texts, TRACKS) == {1: "А123ВС77"}
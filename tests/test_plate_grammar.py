@@ -0,0 +1,64 @@
+"""
+Проверки грамматики номеров (plate_grammar.py).
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import pytest
+
+from plate_grammar import PlateGrammar
+
+
+@pytest.fixture(scope="module")
+def grammar():
+    return PlateGrammar()
+
+
+@pytest.mark.parametrize("text, plate, fmt", [
+    ("A123BC77", "А123ВС77", "standard"),
+    ("А123ВС777", "А123ВС777", "standard"),
+    ("АА12377", "АА12377", "taxi"),
+    ("АА0000777", "АА0000777", "trailer"),
+    ("1234AA77", "1234АА77", "motorcycle"),
+    ("АА000А77", "АА000А77", "transit"),
+    ("А000077", "А000077", "police"),
+])
+def test_formats(grammar, text, plate, fmt):
+    reading = grammar.decode_text(text)
+    assert (reading.plate, reading.format) == (plate, fmt)
+    assert grammar.validate(text) == (True, plate)
+
+
+@pytest.mark.parametrize("text, plate", [
+    # Подпись страны не превращается в третью цифру региона (S → 5)
+    ("A123BC77RUS", "А123ВС77"),
+    ("A123BC77RU5", "А123ВС77"),
+    ("A123BC77РУС", "А123ВС77"),
+    ("A123BC777RUS", "А123ВС777"),
+    ("АА12377RUS", "АА12377"),
+    # Мусор от флага перед подписью тоже не дописывается в регион
+    ("A123BC77IRUS", "А123ВС77"),
+    ("A123BC77IX", "А123ВС77"),
+])
+def test_country_suffix(grammar, text, plate):
+    assert grammar.decode_text(text).plate == plate
+
+
+def test_confusion_correction(grammar):
+    assert grammar.decode_text("8402ТЕ750").plate == "В402ТЕ750"
+    # Последний прочитанный символ региона исправляется как обычно
+    assert grammar.decode_text("A123BC77O").plate == "А123ВС770"
+
+
+def test_alternatives(grammar):
+    alternatives = [[("8", 0.6), ("В", 0.35)]] + [[(c, 0.9)] for c in "402ТЕ750"]
+    reading = grammar.decode(alternatives)
+    assert reading.plate == "В402ТЕ750"
+    assert reading.confidences[0] == pytest.approx(0.35)
+
+
+@pytest.mark.parametrize("text", ["", "RUS", "A12BC77", "ABCDEFGH", "12345678"])
+def test_rejected(grammar, text):
+    assert grammar.decode_text(text) is None
+    assert grammar.validate(text)[0] is False
@@ -0,0 +1,59 @@
+"""
+Проверки адаптивного шага кадров (stride_controller.py).
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from stride_controller import StrideBudget, StrideController
+
+
+def make_stream(label, live_tracks):
+    return SimpleNamespace(label=label, sid_last_seen={sid: 0.0 for sid in range(live_tracks)})
+
+
+def run_batches(budget, streams, frame_cost=0.005, batches=5):
+    now = 100.0
+    for _ in range(batches):
+        packets = [{"stream": stream, "timestamp": now - 0.05} for stream in streams]
+        budget.observe_batch(packets, frame_cost * len(packets), now)
+        now += 0.2
+
+
+@pytest.fixture
+def single():
+    budget = StrideBudget(target_latency=0.5, cpu_budget=0.9)
+    controller = budget.register(StrideController("cam", min_stride=1, max_stride=15, idle_stride=5))
+    for i in range(10):
+        controller.on_frame(i / 25)
+    return budget, controller
+
+
+def test_single_stream_empty_road(single):
+    budget, controller = single
+    run_batches(budget, [make_stream("cam", 0)])
+    assert controller.stride == 5
+
+
+def test_single_stream_rush_hour(single):
+    budget, controller = single
+    stream = make_stream("cam", 0)
+    run_batches(budget, [stream])
+    stream.sid_last_seen.update({1: 0.0, 2: 0.0, 3: 0.0})
+    run_batches(budget, [stream])
+    assert controller.stride == 1
+
+
+def test_budget_shared_by_activity():
+    budget = StrideBudget(target_latency=None, cpu_budget=0.5)
+    busy = budget.register(StrideController("busy", idle_stride=1))
+    quiet = budget.register(StrideController("quiet", idle_stride=1))
+    for i in range(10):
+        busy.on_frame(i / 25)
+        quiet.on_frame(i / 25)
+    run_batches(budget, [make_stream("busy", 4), make_stream("quiet", 0)], frame_cost=0.02)
+    assert busy.stride < quiet.stride
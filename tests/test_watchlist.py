@@ -0,0 +1,50 @@
+"""
+Проверки поиска номеров по спискам (watchlist.py).
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import pytest
+
+from watchlist import WatchEntry, WatchlistIndex, weighted_distance
+
+
+@pytest.fixture(scope="module")
+def index():
+    return WatchlistIndex([WatchEntry("А123ВС77", "stolen", ""),
+                           WatchEntry("Е555КХ199", "wanted", "")], max_edits=1)
+
+
+@pytest.mark.parametrize("a, b, cost", [
+    ("А123ВС77", "А123ВС77", 0.0),
+    ("А123ВС77", "А1238С77", 0.25),  # В/8 — путаница OCR
+    ("А123ВС77", "А1Z38С77", 0.5),  # две замены путаницы дешевле одной правки
+    ("А123ВС77", "А123ХС77", 1.0),
+    ("А123ВС77", "А123ВС777", 1.0),
+])
+def test_weighted_distance(a, b, cost):
+    assert weighted_distance(a, b, confusion_cost=0.25) == pytest.approx(cost)
+
+
+@pytest.mark.parametrize("plate, cost", [
+    ("A123BC77", 0.0),  # латиница приводится к кириллице
+    ("А1Z38С77", 0.5),
+    ("А123ХС77", 1.0),
+    ("А123ВС7", 1.0),
+])
+def test_match_hit(index, plate, cost):
+    matches = index.match(plate, confusion_cost=0.25)
+    assert [(m.entry.plate, m.entry.list_name) for m in matches] == [("А123ВС77", "stolen")]
+    assert matches[0].cost == pytest.approx(cost)
+
+
+@pytest.mark.parametrize("plate", ["А123ХК77", "А12ХВС7", "В777ОР77", ""])
+def test_match_miss(index, plate):
+    assert index.match(plate, confusion_cost=0.25) == []
+
+
+def test_max_cost_allows_only_confusions(index):
+    assert [m.entry.plate for m in index.match("А1238С77", max_cost=0.5, confusion_cost=0.25)] \
+        == ["А123ВС77"]
+    assert index.match("А123ХС77", max_cost=0.5, confusion_cost=0.25) == []
@@ -0,0 +1,213 @@
+"""
+Модуль track_propagator.py
+
+Отрисовка треков на кадрах, пропущенных детекторами (frame_skip,
+адаптивный шаг). Боксы треков с последнего обработанного кадра
+переносятся на промежуточные кадры:
+- "flow" — разреженный оптический поток Лукаса–Канаде по сетке точек
+  внутри бокса на уменьшенном кадре (сдвиг и масштаб — медианы по точкам);
+- "motion" — модель постоянной скорости по двум последним обработанным
+  кадрам (та же модель движения, что у фильтра Калмана ByteTrack).
+Детекторы по-прежнему запускаются раз в N кадров, а отображение и запись
+идут с частотой источника.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import TRACK_FLOW_WIDTH, TRACK_FLOW_GRID, TRACK_FLOW_MIN_POINTS, TRACK_OVERLAY_MAX_AGE
+
+# Подпись трека: (sid, (x1, y1, x2, y2), plate_text) — как в StreamState.collect_labels
+Label = Tuple[int, Tuple[int, int, int, int], str]
+
+_LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                  criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+class _Track:
+    __slots__ = ("box", "observed", "velocity", "plate", "seen", "updated")
+
+    def __init__(self, box: np.ndarray, plate: str, seen: float):
+        self.box = box  # x1, y1, x2, y2 в пикселях исходного кадра
+        self.observed = box.copy()  # бокс детектора на последнем обработанном кадре
+        self.velocity = np.zeros(4, dtype=np.float32)  # px/сек для каждой координаты
+        self.plate = plate
+        self.seen = seen  # время последнего обработанного кадра
+        self.updated = seen  # время последнего переноса бокса
+
+
+class TrackPropagator:
+    """
+    Перенос боксов треков одного потока на кадры без инференса.
+    """
+
+    def __init__(self,
+                 method: str = "flow",
+                 width: int = TRACK_FLOW_WIDTH,
+                 grid: int = TRACK_FLOW_GRID,
+                 min_points: int = TRACK_FLOW_MIN_POINTS,
+                 max_age: float = TRACK_OVERLAY_MAX_AGE):
+        """
+        Args:
+            method (str): "flow" — оптический поток, "motion" — постоянная скорость.
+            width (int): Ширина уменьшенного кадра для оптического потока, px.
+            grid (int): Сетка grid × grid точек внутри каждого бокса.
+            min_points (int): Меньше отслеженных точек — перенос по скорости.
+            max_age (float): Сколько секунд после обработанного кадра рисовать трек.
+        """
+        self.method = method
+        self.width = width
+        self.grid = max(int(grid), 2)
+        self.min_points = min_points
+        self.max_age = max_age
+
+        self._tracks: Dict[int, _Track] = {}
+        self._prev: Optional[np.ndarray] = None
+        self._scale = 1.0
+
+        self.observed = 0
+        self.predicted = 0
+        self.flow_fallbacks = 0
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        self._scale = min(self.width / w, 1.0)
+        small = cv2.resize(frame, (max(int(w * self._scale), 1), max(int(h * self._scale), 1)),
+                           interpolation=cv2.INTER_AREA) if self._scale < 1.0 else frame
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def observe(self, frame: np.ndarray, labels: List[Label], timestamp: float) -> None:
+        """
+        Запоминает треки обработанного детекторами кадра.
+
+        Args:
+            frame (np.ndarray): BGR-кадр (до отрисовки).
+            labels (list): Видимые треки кадра [(sid, bbox, plate)].
+            timestamp (float): Время кадра.
+        """
+        self.observed += 1
+        tracks: Dict[int, _Track] = {}
+        for sid, bbox, plate in labels:
+            box = np.array(bbox, dtype=np.float32)
+            track = _Track(box, plate, timestamp)
+            previous = self._tracks.get(sid)
+            if previous is not None and timestamp > previous.seen:
+                # Скорость по обработанным кадрам: перенесённые боксы в неё не входят
+                track.velocity = (box - previous.observed) / (timestamp - previous.seen)
+            tracks[sid] = track
+        self._tracks = tracks
+        self._prev = self._prepare(frame) if self.method == "flow" and tracks else None
+
+    def _flow(self, gray: np.ndarray) -> Dict[int, np.ndarray]:
+        # Сетка точек во внутренних 80% каждого бокса на уменьшенном кадре
+        sids, points = [], []
+        steps = np.linspace(0.1, 0.9, self.grid, dtype=np.float32)
+        fx, fy = np.meshgrid(steps, steps)
+        for sid, track in self._tracks.items():
+            x1, y1, x2, y2 = track.box * self._scale
+            grid = np.stack([x1 + fx.ravel() * (x2 - x1), y1 + fy.ravel() * (y2 - y1)], axis=1)
+            sids.append(sid)
+            points.append(grid)
+        if not points:
+            return {}
+
+        p0 = np.concatenate(points).reshape(-1, 1, 2).astype(np.float32)
+        p1, status, _ = cv2.calcOpticalFlowPyrLK(self._prev, gray, p0, None, **_LK_PARAMS)
+        if p1 is None:
+            return {}
+        p0, p1, status = p0.reshape(-1, 2), p1.reshape(-1, 2), status.ravel().astype(bool)
+
+        boxes = {}
+        n = self.grid * self.grid
+        for k, sid in enumerate(sids):
+            ok = status[k * n:(k + 1) * n]
+            if int(ok.sum()) < self.min_points:
+                continue
+            old, new = p0[k * n:(k + 1) * n][ok], p1[k * n:(k + 1) * n][ok]
+            shift = np.median(new - old, axis=0) / self._scale
+            # Масштаб — отношение разброса точек вокруг медианы (приближение ТС)
+            spread_old = np.median(np.abs(old - np.median(old, axis=0)))
+            spread_new = np.median(np.abs(new - np.median(new, axis=0)))
+            scale = float(np.clip(spread_new / spread_old, 0.8, 1.25)) if spread_old > 0 else 1.0
+
+            box = self._tracks[sid].box
+            cx, cy = (box[0] + box[2]) / 2 + shift[0], (box[1] + box[3]) / 2 + shift[1]
+            hw, hh = (box[2] - box[0]) * scale / 2, (box[3] - box[1]) * scale / 2
+            boxes[sid] = np.array([cx - hw, cy - hh, cx + hw, cy + hh], dtype=np.float32)
+        return boxes
+
+    def predict(self, frame: np.ndarray, timestamp: float) -> List[Label]:
+        """
+        Переносит боксы треков на кадр, пропущенный детекторами.
+
+        Args:
+            frame (np.ndarray): BGR-кадр (до отрисовки).
+            timestamp (float): Время кадра.
+
+        Returns:
+            list: Подписи [(sid, bbox, plate)] для отрисовки.
+        """
+        self.predicted += 1
+        # Треки, давно не подтверждённые детектором, не рисуются
+        self._tracks = {sid: t for sid, t in self._tracks.items()
+                        if timestamp - t.seen <= self.max_age}
+        if not self._tracks:
+            self._prev = None
+            return []
+
+        flow_boxes: Dict[int, np.ndarray] = {}
+        if self.method == "flow" and self._prev is not None:
+            gray = self._prepare(frame)
+            if gray.shape == self._prev.shape:
+                flow_boxes = self._flow(gray)
+            self._prev = gray
+
+        h, w = frame.shape[:2]
+        limits = np.array([w - 1, h - 1, w - 1, h - 1], dtype=np.float32)
+        labels = []
+        for sid, track in self._tracks.items():
+            box = flow_boxes.get(sid)
+            if box is None:
+                if self.method == "flow":
+                    self.flow_fallbacks += 1
+                box = track.box + track.velocity * max(timestamp - track.updated, 0.0)
+            track.box = np.clip(box, 0, limits)
+            track.updated = timestamp
+            x1, y1, x2, y2 = map(int, track.box.tolist())
+            if x2 > x1 and y2 > y1:
+                labels.append((sid, (x1, y1, x2, y2), track.plate))
+        return labels
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика переноса.
+
+        Returns:
+            dict: observed, predicted, tracks, flow_fallbacks.
+        """
+        return {
+            "observed": self.observed,
+            "predicted": self.predicted,
+            "tracks": len(self._tracks),
+            "flow_fallbacks": self.flow_fallbacks,
+        }
+
+
+def create_track_propagator(settings: Optional[Dict]) -> Optional[TrackPropagator]:
+    """
+    Создаёт перенос треков потока по разделу "track_overlay" config.json.
+
+    Args:
+        settings (dict | None): {"enabled": bool, "method": "flow" | "motion",
+                                 "width": px, "max_age": сек}.
+
+    Returns:
+        TrackPropagator | None: Перенос треков или None, если он выключен.
+    """
+    if not settings or not settings.get("enabled", False):
+        return None
+    return TrackPropagator(method=settings.get("method", "flow"),
+                           width=int(settings.get("width", TRACK_FLOW_WIDTH)),
+                           max_age=float(settings.get("max_age", TRACK_OVERLAY_MAX_AGE)))
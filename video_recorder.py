@@ -0,0 +1,214 @@
+"""
+Модуль video_recorder.py
+
+Асинхронная запись обработанного видео сегментами. Кадры передаются
+через очередь собственному потоку записи, поэтому кодирование и смена
+файла не задерживают отрисовку и инференс. Сегменты сменяются на
+границах локального времени (например, каждый час в :00), частота
+кадров файла равна фактической частоте поступления кадров, а кадры
+раскладываются по времени захвата, так что длительность записи
+совпадает с реальным временем.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from pipeline import FrameQueue
+from video_writer import create_video_writer
+from config import VIDEO_RECORDER_QUEUE_SIZE, VIDEO_FPS_WARMUP, VIDEO_DEFAULT_FPS
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentedRecorder:
+    """
+    Запись одного потока в файлы фиксированной длительности в фоновом потоке.
+    """
+
+    def __init__(self,
+                 label: str,
+                 segment_seconds: float,
+                 fps: Optional[float] = None,
+                 pace: bool = True,
+                 ext: str = ".avi",
+                 queue_size: int = VIDEO_RECORDER_QUEUE_SIZE):
+        """
+        Args:
+            label (str): Метка источника (часть имени файла).
+            segment_seconds (float): Длительность сегмента, сек; границы
+                                     выравниваются по локальному времени.
+            fps (float | None): Частота кадров файла; None — измеряется по
+                                времени захвата первых кадров.
+            pace (bool): Раскладывать кадры по времени захвата (живые источники):
+                         пропуски заполняются повтором кадра, лишние кадры
+                         отбрасываются. False — каждый кадр пишется один раз
+                         (видеофайлы).
+            ext (str): Расширение файлов ('.avi', '.mp4', '.mkv').
+            queue_size (int): Ёмкость очереди кадров.
+        """
+        self.label = label
+        self.segment_seconds = max(float(segment_seconds), 1.0)
+        self.fps = fps
+        self.pace = pace
+        self.ext = ext
+
+        # Живой источник: при отставании записи выбрасываются старые кадры,
+        # файл: отрисовка ждёт запись, кадры не теряются
+        self._queue = FrameQueue(f"recorder:{label}", queue_size, drop_oldest=pace)
+
+        self._writer: Optional[cv2.VideoWriter] = None
+        self._segment: Optional[int] = None
+        self._segment_start = 0.0
+        self._segment_fps = VIDEO_DEFAULT_FPS
+        self._slots = 0
+        self._last_frame: Optional[np.ndarray] = None
+        self._warmup: list = []
+
+        self.written = 0
+        self.duplicated = 0
+        self.skipped = 0
+        self.segments = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"recorder:{label}", daemon=True)
+        self._thread.start()
+
+    def write(self, frame: np.ndarray, timestamp: float) -> bool:
+        """
+        Ставит кадр в очередь записи.
+
+        Args:
+            frame (np.ndarray): BGR-кадр (не должен изменяться после передачи).
+            timestamp (float): Время захвата кадра (unix time).
+
+        Returns:
+            bool: False, если запись остановлена.
+        """
+        return self._queue.put((frame, timestamp))
+
+    def _segment_of(self, timestamp: float) -> int:
+        # Границы сегментов — по локальному времени, а не от момента запуска
+        offset = time.localtime(timestamp).tm_gmtoff
+        return int((timestamp + offset) // self.segment_seconds)
+
+    def _open(self, frame: np.ndarray, timestamp: float, fps: float) -> None:
+        if self._writer is not None:
+            self._writer.release()
+        segment = self._segment_of(timestamp)
+        offset = time.localtime(timestamp).tm_gmtoff
+
+        self._segment = segment
+        self._segment_start = segment * self.segment_seconds - offset if self.pace else timestamp
+        self._segment_fps = fps
+        self._slots = 0
+        self._writer = create_video_writer(frame.shape, self.label, fps, self.ext,
+                                           timestamp=timestamp)
+        self.segments += 1
+        logger.info(f"🎞 Новый сегмент записи [{self.label}]: {fps:.1f} кадр/с")
+
+    def _estimate_fps(self) -> float:
+        if self.fps:
+            return float(self.fps)
+        span = self._warmup[-1][1] - self._warmup[0][1] if len(self._warmup) > 1 else 0.0
+        if span <= 0:
+            return VIDEO_DEFAULT_FPS
+        return min(max((len(self._warmup) - 1) / span, 1.0), 60.0)
+
+    def _write_frame(self, frame: np.ndarray, timestamp: float) -> None:
+        if self._segment is None or self._segment_of(timestamp) != self._segment:
+            self._open(frame, timestamp, self._segment_fps if self._segment is not None
+                       else self._estimate_fps())
+
+        if not self.pace:
+            self._writer.write(frame)
+            self.written += 1
+            return
+
+        # Номер позиции кадра в сегменте по времени захвата
+        slot = int(round((timestamp - self._segment_start) * self._segment_fps))
+        if slot < self._slots:
+            # Кадры приходят чаще частоты файла
+            self.skipped += 1
+            return
+
+        # Пропуск (шаг кадров, переподключение) заполняется повтором предыдущего кадра
+        if self._last_frame is not None and self._last_frame.shape == frame.shape:
+            while self._slots < slot:
+                self._writer.write(self._last_frame)
+                self._slots += 1
+                self.duplicated += 1
+        else:
+            self._slots = slot
+
+        self._writer.write(frame)
+        self._slots += 1
+        self.written += 1
+        self._last_frame = frame
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get(timeout=0.5)
+                if item is None:
+                    if self._queue.closed:
+                        break
+                    continue
+
+                frame, timestamp = item
+                if self.fps is None and self._segment is None:
+                    # Частота кадров измеряется по первым кадрам
+                    self._warmup.append(item)
+                    if timestamp - self._warmup[0][1] < VIDEO_FPS_WARMUP:
+                        continue
+                    self.fps = self._estimate_fps()
+                    pending, self._warmup = self._warmup, []
+                    for f, ts in pending:
+                        self._write_frame(f, ts)
+                    continue
+
+                self._write_frame(frame, timestamp)
+
+            # Остановка до окончания измерения: записываем накопленное
+            if self._warmup and self._segment is None:
+                self.fps = self._estimate_fps()
+                for f, ts in self._warmup:
+                    self._write_frame(f, ts)
+        except Exception:
+            logger.exception(f"❌ Ошибка записи видео [{self.label}]")
+        finally:
+            if self._writer is not None:
+                self._writer.release()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Дописывает кадры из очереди и закрывает текущий сегмент.
+
+        Args:
+            timeout (float): Максимальное время ожидания, сек.
+        """
+        self._queue.close()
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Статистика записи.
+
+        Returns:
+            dict: written, duplicated (повторы для заполнения пропусков),
+                  skipped (лишние кадры), dropped (выброшено из очереди),
+                  segments, fps, queue.
+        """
+        return {
+            "written": self.written,
+            "duplicated": self.duplicated,
+            "skipped": self.skipped,
+            "dropped": self._queue.dropped,
+            "segments": self.segments,
+            "fps": round(self._segment_fps, 2),
+            "queue": self._queue.depth(),
+        }
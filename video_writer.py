@@ -1,7 +1,7 @@
 import cv2
 from pathlib import Path
 from datetime import datetime
-from typing import Tuple
+from typing import Optional, Tuple
 
 from config import SAVE_DIR
 
@@ -9,7 +9,8 @@ def create_video_writer(
     frame_shape: Tuple[int, int],
     source_label: str,
     fps: float = 25.0,
-    ext: str = ".avi"
+    ext: str = ".avi",
+    timestamp: Optional[float] = None
 ) -> cv2.VideoWriter:
     """
     Создаёт объект cv2.VideoWriter для записи видео.
@@ -18,6 +19,7 @@ def create_video_writer(
     :param source_label: Метка источника (например, 'webcam', 'ipcam', видеофайл).
     :param fps: Частота кадров (по умолчанию 25.0).
     :param ext: Расширение файла ('.avi', '.mp4', '.mkv').
+    :param timestamp: Время начала записи (unix time) для имени файла; по умолчанию — текущее.
     :return: Объект VideoWriter.
     """
     h = int(frame_shape[0])  # Высота кадра
@@ -34,7 +36,8 @@ def create_video_writer(
         ext = ".avi"  # гарантировать корректность
 
     # Имя файла с меткой времени
-    now = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    start = datetime.fromtimestamp(timestamp) if timestamp is not None else datetime.now()
+    now = start.strftime("%Y-%m-%d_%H-%M")
     filename = f"{now}_{source_label}{ext}"
 
     # Создание папки и объекта VideoWriter
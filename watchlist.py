@@ -0,0 +1,391 @@
+"""
+Модуль watchlist.py
+
+Проверка подтверждённых номеров по спискам (угон, розыск, жители и т.п.)
+на сотни тысяч записей. Списки компилируются в индекс удалений (symmetric
+deletion): ключи — номера со свёрнутыми символами путаницы OCR и все их
+варианты без k символов, поэтому поиск совпадений с k правками стоит
+несколько обращений к словарю, а не проход по списку. Кандидаты
+проверяются взвешенным расстоянием Левенштейна, в котором замена внутри
+группы путаницы (О/0, В/8, У/V/Y, ...) дешевле обычной правки.
+
+Изменённые файлы списков перечитываются в фоновом потоке; новый индекс
+подменяет прежний одним присваиванием, проверки номеров не ждут загрузки.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from plate_text import CONFUSION_GROUPS, clean_plate_query, confusion_key
+from metrics import WATCHLIST_ALERTS, WATCHLIST_MATCH_SECONDS, WATCHLIST_ENTRIES
+from config import WATCHLIST_MAX_EDITS, WATCHLIST_CONFUSION_COST, WATCHLIST_RELOAD_INTERVAL, \
+    WATCHLIST_ALERT_HISTORY
+
+logger = logging.getLogger(__name__)
+
+_GROUP_OF = {c: i for i, group in enumerate(CONFUSION_GROUPS)
+             for c in clean_plate_query(group) + group}
+
+
+class WatchEntry(NamedTuple):
+    """Запись списка."""
+    plate: str
+    list_name: str
+    note: str
+
+
+class WatchMatch(NamedTuple):
+    """Совпадение номера с записью списка."""
+    entry: WatchEntry
+    cost: float
+
+
+def substitution_cost(a: str, b: str, confusion_cost: float = WATCHLIST_CONFUSION_COST) -> float:
+    """
+    Стоимость замены символа: 0 — совпадают, confusion_cost — из одной
+    группы путаницы OCR, 1 — прочие.
+    """
+    if a == b:
+        return 0.0
+    group = _GROUP_OF.get(a)
+    return confusion_cost if group is not None and group == _GROUP_OF.get(b) else 1.0
+
+
+def weighted_distance(a: str, b: str, limit: float = float("inf"),
+                      confusion_cost: float = WATCHLIST_CONFUSION_COST) -> float:
+    """
+    Расстояние Левенштейна с удешевлённой заменой символов, которые путает OCR.
+
+    Args:
+        a (str): Первый номер.
+        b (str): Второй номер.
+        limit (float): Расчёт прекращается, как только расстояние заведомо больше.
+        confusion_cost (float): Стоимость замены внутри группы путаницы.
+
+    Returns:
+        float: Расстояние (больше limit, если расчёт прерван).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return float("inf")
+    prev = [float(j) for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        cur = [float(i)] + [0.0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1.0, cur[j - 1] + 1.0,
+                         prev[j - 1] + substitution_cost(ca, cb, confusion_cost))
+        if min(cur) > limit:
+            return float("inf")
+        prev = cur
+    return prev[-1]
+
+
+def _deletions(key: str, max_edits: int) -> Set[str]:
+    variants = {key}
+    frontier = {key}
+    for _ in range(max_edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+class WatchlistIndex:
+    """
+    Неизменяемый индекс удалений по записям всех списков.
+    """
+
+    def __init__(self, entries: List[WatchEntry], max_edits: int = WATCHLIST_MAX_EDITS):
+        """
+        Args:
+            entries (list): Записи списков.
+            max_edits (int): Максимальное число правок (вставка, удаление,
+                             замена вне группы путаницы) при поиске.
+        """
+        self.entries = entries
+        self.max_edits = max_edits
+        index: Dict[str, List[int]] = {}
+        for i, entry in enumerate(entries):
+            for variant in _deletions(confusion_key(entry.plate), max_edits):
+                index.setdefault(variant, []).append(i)
+        # Кортежи компактнее списков: индекс только читается
+        self._index: Dict[str, Tuple[int, ...]] = {k: tuple(v) for k, v in index.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match(self, plate: str, max_cost: Optional[float] = None,
+              confusion_cost: float = WATCHLIST_CONFUSION_COST) -> List[WatchMatch]:
+        """
+        Записи, отличающиеся от номера не более чем на max_cost.
+
+        Args:
+            plate (str): Распознанный номер.
+            max_cost (float | None): Порог взвешенного расстояния
+                                     (по умолчанию — max_edits).
+            confusion_cost (float): Стоимость замены внутри группы путаницы.
+
+        Returns:
+            list: Совпадения по возрастанию стоимости.
+        """
+        plate = clean_plate_query(plate)
+        if not plate or not self._index:
+            return []
+        max_cost = float(self.max_edits if max_cost is None else max_cost)
+
+        candidates: Set[int] = set()
+        for variant in _deletions(confusion_key(plate), self.max_edits):
+            candidates.update(self._index.get(variant, ()))
+
+        matches = []
+        for i in candidates:
+            entry = self.entries[i]
+            cost = weighted_distance(plate, entry.plate, max_cost, confusion_cost)
+            if cost <= max_cost:
+                matches.append(WatchMatch(entry, round(cost, 3)))
+        matches.sort(key=lambda m: m.cost)
+        return matches
+
+
+def load_watchlist(path: str, list_name: str) -> List[WatchEntry]:
+    """
+    Читает файл списка: по номеру в строке, после ";", "," или табуляции —
+    примечание; строки с "#" в начале пропускаются.
+
+    Args:
+        path (str): Путь к файлу (UTF-8).
+        list_name (str): Имя списка.
+
+    Returns:
+        list: Записи списка.
+    """
+    entries = []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            for sep in (";", "\t", ","):
+                if sep in line:
+                    plate, note = line.split(sep, 1)
+                    break
+            else:
+                plate, note = line, ""
+            plate = clean_plate_query(plate)
+            if plate:
+                entries.append(WatchEntry(plate, list_name, note.strip()))
+    return entries
+
+
+class WatchlistMatcher:
+    """
+    Проверка номеров по спискам с фоновой перезагрузкой изменённых файлов.
+    """
+
+    def __init__(self, alert_history: int = WATCHLIST_ALERT_HISTORY):
+        """
+        Args:
+            alert_history (int): Сколько последних срабатываний хранить.
+        """
+        self._index = WatchlistIndex([])
+        self._lists: Dict[str, str] = {}
+        self._stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.max_edits = WATCHLIST_MAX_EDITS
+        self.max_cost: Optional[float] = None
+        self.confusion_cost = WATCHLIST_CONFUSION_COST
+        self.reload_interval = WATCHLIST_RELOAD_INTERVAL
+
+        self._lock = threading.Lock()
+        self._alerts: Deque[Dict] = deque(maxlen=alert_history)
+        # {(метка потока, SID): номер}, уже проверенные по спискам
+        self._checked: Dict[Tuple[str, int], str] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.checks = 0
+        self.deduplicated = 0
+        self.alerts_total = 0
+        self.reloads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self._lists)
+
+    def configure(self, settings: Optional[Dict]) -> None:
+        """
+        Применяет раздел "watchlists" config.json. Первая загрузка выполняется
+        сразу, последующие — в фоновом потоке.
+
+        Args:
+            settings (dict | None): {"enabled": bool, "lists": {имя: путь},
+                                     "max_edits": int, "max_cost": float,
+                                     "confusion_cost": float, "reload_interval": сек}.
+        """
+        settings = settings or {}
+        lists = dict(settings.get("lists", {})) if settings.get("enabled", False) else {}
+        with self._lock:
+            self._lists = lists
+            self._stamps = {}
+            self.max_edits = int(settings.get("max_edits", WATCHLIST_MAX_EDITS))
+            self.max_cost = settings.get("max_cost")
+            self.confusion_cost = float(settings.get("confusion_cost", WATCHLIST_CONFUSION_COST))
+            self.reload_interval = float(settings.get("reload_interval", WATCHLIST_RELOAD_INTERVAL))
+
+        if self._thread is None:
+            self.reload()
+            if lists:
+                self._thread = threading.Thread(target=self._run, name="watchlist", daemon=True)
+                self._thread.start()
+        else:
+            self._wake.set()
+
+    def _file_stamp(self, path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, force: bool = True) -> bool:
+        """
+        Перечитывает списки и подменяет индекс.
+
+        Args:
+            force (bool): False — только если файлы изменились.
+
+        Returns:
+            bool: True, если индекс перестроен.
+        """
+        with self._lock:
+            lists = dict(self._lists)
+            max_edits = self.max_edits
+        stamps = {name: self._file_stamp(path) for name, path in lists.items()}
+        if not force and stamps == self._stamps and max_edits == self._index.max_edits:
+            return False
+
+        started = time.perf_counter()
+        entries: List[WatchEntry] = []
+        for name, path in lists.items():
+            try:
+                list_entries = load_watchlist(path, name)
+            except OSError as e:
+                logger.error(f"❌ Не удалось прочитать список {name} ({path}): {e}")
+                list_entries = [entry for entry in self._index.entries if entry.list_name == name]
+            entries.extend(list_entries)
+            WATCHLIST_ENTRIES.labels(name).set(len(list_entries))
+
+        # Индекс строится целиком, затем подменяется: проверки не ждут загрузки
+        index = WatchlistIndex(entries, max_edits)
+        self._index = index
+        self._stamps = stamps
+        self.reloads += 1
+        if lists:
+            logger.info(f"📋 Списки номеров загружены: {len(entries)} записей "
+                        f"за {time.perf_counter() - started:.2f} с")
+        return True
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.reload_interval)
+            forced = self._wake.is_set()
+            self._wake.clear()
+            try:
+                self.reload(force=forced)
+            except Exception:
+                logger.exception("❌ Ошибка перезагрузки списков номеров")
+
+    def check(self, plate: str, stream_label: str = "", sid: int = -1,
+              timestamp: Optional[float] = None) -> List[WatchMatch]:
+        """
+        Проверяет подтверждённый номер по всем спискам. Номер трека
+        проверяется (и вызывает срабатывание) один раз, пока он не изменится
+        или SID не будет забыт через forget().
+
+        Args:
+            plate (str): Номер.
+            stream_label (str): Метка источника.
+            sid (int): Идентификатор трека.
+            timestamp (float | None): Время кадра.
+
+        Returns:
+            list: Совпадения по возрастанию стоимости (пустой список для
+                  уже проверенного номера трека).
+        """
+        index = self._index
+        if not len(index):
+            return []
+        if sid >= 0:
+            key = (stream_label, sid)
+            with self._lock:
+                if self._checked.get(key) == plate:
+                    self.deduplicated += 1
+                    return []
+                self._checked[key] = plate
+        started = time.perf_counter()
+        matches = index.match(plate, self.max_cost, self.confusion_cost)
+        WATCHLIST_MATCH_SECONDS.observe(time.perf_counter() - started)
+        self.checks += 1
+
+        for match in matches:
+            entry = match.entry
+            alert = {"ts": timestamp or time.time(), "plate": plate, "list": entry.list_name,
+                     "entry": entry.plate, "note": entry.note, "cost": match.cost,
+                     "source": stream_label, "sid": sid}
+            with self._lock:
+                self._alerts.append(alert)
+                self.alerts_total += 1
+            WATCHLIST_ALERTS.labels(entry.list_name).inc()
+            logger.warning(f"🚨 [{entry.list_name}] {plate} ≈ {entry.plate} (стоимость {match.cost}) "
+                           f"[{stream_label}] SID {sid} {entry.note}")
+        return matches
+
+    def forget(self, stream_label: str, sids) -> None:
+        """
+        Забывает треки с истёкшим SID_TTL.
+
+        Args:
+            stream_label (str): Метка источника.
+            sids (Iterable[int]): Удалённые SID.
+        """
+        with self._lock:
+            for sid in sids:
+                self._checked.pop((stream_label, sid), None)
+
+    def alerts(self, limit: int = 50) -> List[Dict]:
+        """
+        Последние срабатывания (новые — первыми).
+
+        Args:
+            limit (int): Максимальное число записей.
+
+        Returns:
+            list: Срабатывания {"ts", "plate", "list", "entry", "note", "cost", "source", "sid"}.
+        """
+        with self._lock:
+            return list(self._alerts)[::-1][:limit]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Статистика проверок.
+
+        Returns:
+            dict: entries, checks, deduplicated, alerts, reloads.
+        """
+        return {"entries": len(self._index), "checks": self.checks,
+                "deduplicated": self.deduplicated,
+                "alerts": self.alerts_total, "reloads": self.reloads}
+
+
+_matcher = WatchlistMatcher()
+
+
+def get_watchlist_matcher() -> WatchlistMatcher:
+    """
+    Общая для процесса проверка номеров по спискам (пустая до configure()).
+
+    Returns:
+        WatchlistMatcher: Проверка по спискам.
+    """
+    return _matcher
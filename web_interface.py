@@ -1,7 +1,20 @@
-from fastapi import FastAPI, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Form, HTTPException
+from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse, StreamingResponse, \
+    Response
+from fastapi.concurrency import run_in_threadpool
+import os
 import json
+from datetime import datetime
+from html import escape
+import threading
+from urllib.parse import quote
+import uvicorn
 
+from plate_store import export_to_excel, search_plates, SEARCH_MODES
+from live_preview import get_preview_hub, BOUNDARY
+from metrics import get_registry, CONTENT_TYPE
+from watchlist import get_watchlist_matcher
+from config_watcher import get_config_watcher
 from config import CONFIG_PATH
 
 # Создаем приложение FastAPI
@@ -27,7 +40,7 @@ def load_config():
             "recording_interval_minutes": 60,
             "log_level": "INFO"
         }
-    with open(CONFIG_PATH, "r") as f:
+    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
@@ -54,15 +67,31 @@ def save_config(video_source, frame_skip, save_video, recording_interval_minutes
         log_level (str): выбор уровеня логирования ("INFO", "WARNING", "ERROR", "DEBUG").
 
     """
-    with open(CONFIG_PATH, "w") as f:
+    # Сохраняем остальные ключи (например, video_sources), которых нет в форме
+    try:
+        cfg = load_config()
+    except (OSError, json.JSONDecodeError):
+        cfg = {}
+
+    cfg.update({
+        "video_source": video_source,
+        "frame_skip": frame_skip,
+        "save_video": save_video,
+        "recording_interval_minutes": recording_interval_minutes,
+        "log_level": log_level
+    })
+
+    # Запись во временный файл и замена: конвейер никогда не прочитает
+    # config.json наполовину записанным
+    tmp_path = f"{CONFIG_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         # Сохраняем все параметры в JSON файл с отступами
-        json.dump({
-            "video_source": video_source,
-            "frame_skip": frame_skip,
-            "save_video": save_video,
-            "recording_interval_minutes": recording_interval_minutes,
-            "log_level": log_level
-        }, f, indent=2, ensure_ascii=False)
+        json.dump(cfg, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, CONFIG_PATH)
+
+    # Конвейер в том же процессе применяет настройки сразу; отдельно запущенный
+    # конвейер заметит изменение файла при очередном опросе
+    get_config_watcher().notify()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -146,6 +175,9 @@ def read_form():
 
       <input type="submit" value="Сохранить">
     </form>
+    <p><a href="/export">📥 Выгрузить распознанные номера в Excel</a></p>
+    <p><a href="/search">🔍 Поиск номера</a></p>
+    <p><a href="/preview">📺 Живой просмотр</a></p>
   </body>
 </html>
 """
@@ -182,3 +214,198 @@ def update_config(
     # Перенаправляем пользователя на страницу настроек
 
     return RedirectResponse("/", status_code=303)
+
+
+@app.get("/export")
+async def export_plates():
+    """
+    Выгружает журнал распознанных номеров в Excel по запросу оператора.
+
+    Returns:
+        FileResponse: файл recognized_plates_export.xlsx.
+    """
+    path = await run_in_threadpool(export_to_excel)
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=os.path.basename(path))
+
+
+def _parse_time(value: str | None) -> float | None:
+    """
+    Переводит дату из формы поиска ("2025-07-19", "2025-07-19T07:59") в unix time.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Неверная дата: {value}")
+
+
+def _search(plate: str, mode: str, since: str | None, until: str | None,
+            source: str | None, limit: int) -> list:
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный режим поиска: {mode}")
+    return search_plates(plate, mode, _parse_time(since), _parse_time(until),
+                         source or None, min(max(limit, 1), 1000))
+
+
+@app.get("/api/search")
+def search_api(plate: str = "", mode: str = "exact", since: str | None = None,
+               until: str | None = None, source: str | None = None, limit: int = 100):
+    """
+    Поиск проездов номера в журнале (JSON).
+
+    Args:
+        plate (str): Номер или его начало (регистр, пробелы, латиница не важны).
+        mode (str): "exact", "prefix" или "fuzzy" (с учётом путаницы OCR: О/0, В/8, ...).
+        since (str | None): Начало периода (ISO 8601).
+        until (str | None): Конец периода (ISO 8601).
+        source (str | None): Источник видео.
+        limit (int): Максимальное число записей (до 1000).
+
+    Returns:
+        list: Записи {"ts", "timestamp", "plate", "sid", "source"}, последние — первыми.
+    """
+    return _search(plate, mode, since, until, source, limit)
+
+
+@app.get("/search", response_class=HTMLResponse)
+def search_page(plate: str = "", mode: str = "exact", since: str | None = None,
+                until: str | None = None, source: str | None = None, limit: int = 100):
+    """
+    Страница поиска: когда и где проезжал номер.
+
+    Returns:
+        str: HTML-код страницы с формой и результатами.
+    """
+    searched = bool(plate or since or until or source)
+    rows = _search(plate, mode, since, until, source, limit) if searched else []
+
+    options = "".join(
+        f'<option value="{m}" {"selected" if m == mode else ""}>{label}</option>'
+        for m, label in (("exact", "Точно"), ("prefix", "Начало номера"),
+                         ("fuzzy", "С учётом ошибок OCR")))
+    table = "".join(
+        f"<tr><td>{escape(r['timestamp'])}</td><td>{escape(r['plate'])}</td>"
+        f"<td>{r['sid']}</td><td>{escape(str(r['source']))}</td></tr>"
+        for r in rows)
+    result = (f"<table border='1' cellpadding='4'><tr><th>Время</th><th>Номер</th>"
+              f"<th>SID</th><th>Источник</th></tr>{table}</table>" if rows
+              else "<p>Ничего не найдено</p>" if searched else "")
+
+    return f"""
+<html>
+  <body style="font-family: Arial, sans-serif; max-width: 800px; margin: 40px auto;">
+    <h2>Поиск номера</h2>
+    <form method="get" action="/search">
+      <input name="plate" value="{escape(plate)}" placeholder="А123ВС77">
+      <select name="mode">{options}</select>
+      <input type="datetime-local" name="since" value="{escape(since or '')}">
+      <input type="datetime-local" name="until" value="{escape(until or '')}">
+      <input name="source" value="{escape(source or '')}" placeholder="Источник">
+      <input type="submit" value="Найти">
+    </form>
+    {result}
+  </body>
+</html>
+"""
+
+
+@app.get("/api/alerts")
+def watchlist_alerts(limit: int = 50):
+    """
+    Последние срабатывания проверки номеров по спискам (новые — первыми).
+
+    Доступны, если веб-интерфейс запущен внутри main.py ("web_server": true).
+
+    Args:
+        limit (int): Максимальное число записей.
+
+    Returns:
+        list: Срабатывания {"ts", "plate", "list", "entry", "note", "cost", "source", "sid"}.
+    """
+    return get_watchlist_matcher().alerts(min(max(limit, 1), 1000))
+
+
+@app.get("/preview", response_class=HTMLResponse)
+def preview_page():
+    """
+    Страница живого просмотра всех потоков конвейера.
+
+    Доступна, когда веб-интерфейс запущен внутри main.py ("web_server": true).
+
+    Returns:
+        str: HTML-код страницы.
+    """
+    streams = get_preview_hub().streams()
+    if not streams:
+        return "<html><body><p>Конвейер не запущен в этом процессе: " \
+               "включите \"web_server\" в config.json и запустите main.py.</p></body></html>"
+
+    images = "\n".join(
+        f'<h3>{escape(label)}</h3>'
+        f'<img src="/preview.mjpg?stream={quote(label)}" style="max-width:100%">'
+        for label in streams)
+    return f"<html><body>{images}</body></html>"
+
+
+@app.get("/preview.mjpg")
+def preview_stream(stream: str | None = None):
+    """
+    MJPEG-поток обработанного видео.
+
+    Кадры кодируются только пока подключён хотя бы один клиент;
+    медленный клиент пропускает кадры и не задерживает конвейер.
+
+    Args:
+        stream (str | None): Метка потока (по умолчанию — первый поток).
+
+    Returns:
+        StreamingResponse: multipart/x-mixed-replace поток JPEG-кадров.
+    """
+    hub = get_preview_hub()
+    streams = hub.streams()
+    label = stream or (streams[0] if streams else None)
+    if label not in streams:
+        raise HTTPException(status_code=503, detail="Поток недоступен")
+
+    return StreamingResponse(
+        hub.mjpeg(label),
+        media_type=f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Метрики конвейера в текстовом формате Prometheus: частота кадров,
+    выброшенные кадры, вызовы OCR, длительности стадий, глубина очередей,
+    переподключения, запись снимков и журнала.
+
+    Метрики конвейера доступны, если веб-интерфейс запущен внутри main.py
+    ("web_server": true).
+
+    Returns:
+        Response: text/plain для Prometheus.
+    """
+    return Response(get_registry().render(), media_type=CONTENT_TYPE)
+
+
+def start_in_background(host: str = "0.0.0.0", port: int = 8000) -> threading.Thread:
+    """
+    Запускает веб-интерфейс в фоновом потоке процесса конвейера
+    (нужно для живого просмотра).
+
+    Args:
+        host (str): Адрес для прослушивания.
+        port (int): Порт.
+
+    Returns:
+        threading.Thread: Поток веб-сервера.
+    """
+    server = uvicorn.Server(uvicorn.Config(
+        app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="web", daemon=True)
+    thread.start()
+    return thread